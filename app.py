@@ -1,40 +1,93 @@
-import plotly.express as px
-from shiny import App, render, ui, reactive
-from shinywidgets import output_widget, render_plotly, render_widget
+from shiny import App, render, ui, reactive, req
+from shinywidgets import output_widget, reactive_read, render_plotly, render_widget
+import numpy as np
 import pandas as pd
 import faicons as fa
-import leafmap
-from ipyleaflet import Map, CircleMarker, LayerGroup
-import ipywidgets as widgets
-from ipywidgets import HTML  
-from ipyleaflet import AwesomeIcon
-import chatlas
+import asyncio
+import functools
 import sys
 import os
+from typing import TYPE_CHECKING
 sys.path.append(os.path.join(os.path.dirname(__file__), "querychat", "pkg-py"))
 from dotenv import load_dotenv
 import querychat as qc
+from querychat.datasource import DataFrameSource
+from water_quality import (
+    binning,
+    compliance,
+    correlation,
+    forecast,
+    memory,
+    offload,
+    payload,
+    queries,
+    reactivity,
+    risk_map,
+    sql,
+)
+from water_quality.data import DATA_PATH, compact, load_dataset
+from water_quality.lazy import Deferred
+from water_quality.shared import SHARED_DATA_PATH, load_shared
+from water_quality.versioning import DataVersion, DataVersionService, fingerprint
+
+# Heavy modules (plotly.express, ipyleaflet, chatlas, and duckdb/sqlalchemy via
+# querychat) are imported where they are first used, so the app starts fast.
+# `python -m benchmarks.startup --check` guards this.
+if TYPE_CHECKING:
+    import chatlas
 
 
 load_dotenv()
 # ------------------- Load the data ---------------------------------------------------------------------------------------------------------
 
-df = pd.read_csv("merged_water_quality_weather.csv")
-df["date"] = pd.to_datetime(df["date"])
-df["date"] = pd.to_datetime(df["date"])
-min_date = df["date"].min()
-max_date = df["date"].max()
+def load_data() -> pd.DataFrame:
+    # With WQ_SHARED_DATA set, all workers attach to one memory-mapped copy of the data.
+    # Either way the frame is kept compact: categorical names, float32 measurements
+    # and small-int calendar fields (`python -m water_quality.memory` reports the sizes)
+    return load_shared(SHARED_DATA_PATH) if SHARED_DATA_PATH else compact(load_dataset())
+
+
+# The data is a versioned snapshot: when DATA_PATH changes (checked every
+# WQ_RELOAD_INTERVAL seconds, 0 to disable) a new version is loaded in the
+# background and swapped in, and open sessions re-render with it. Nothing here
+# keeps a reference to the frame itself, so old versions can be freed.
+data_service = DataVersionService(
+    load_data,
+    lambda: fingerprint(DATA_PATH),
+    interval=float(os.environ.get("WQ_RELOAD_INTERVAL", 30)),
+)
+# Seconds between each session's checks for a new version
+DATA_POLL_INTERVAL = 2
+
+# The version the UI's initial choices are built from
+initial_version = data_service.current
+max_date = initial_version.max_date
+regions = initial_version.regions
+councils = initial_version.councils
 
 # ----------------------default values to reset filters -----------------------------------------------------------------------------------------
 
-DEFAULT_DATE_RANGE = (min_date, max_date)
+# Outputs computed from the selected samples, on the dashboard and FAQ tabs
+SELECTION_OUTPUTS = [
+    "total_beaches_box",
+    "most_polluted_beach_box",
+    "cleanest_beach_box",
+    "high_enterococci_chart",
+    "water_quality_by_season_chart",
+    "region_month_heatmap",
+    "water_quality_over_years_chart",
+    "forecast_df",
+    "beach_map",
+    "download_data",
+    "faq_high_risk_chart",
+    "faq_high_risk_df",
+    "faq_seasonal_variation_chart",
+    "faq_seasonal_variation_df",
+]
+
 DEFAULT_REGIONS = []        
 DEFAULT_COUNCILS = []
 
-
-regions = df["region"].unique().tolist()
-councils = df["council"].unique().tolist()
-
 ICONS = {
     "site": fa.icon_svg("person-swimming", "solid"),
     "virus": fa.icon_svg("disease"),
@@ -42,7 +95,8 @@ ICONS = {
 }
 # ----------------------------  define the LLM model ---------------------------------------------------------------------------------
 
-def use_anthropic_models(system_prompt: str) -> chatlas.Chat:
+def use_anthropic_models(system_prompt: str) -> "chatlas.Chat":
+    import chatlas
 
     api_key = os.getenv("ANTHROPIC_API_KEY")
     if not api_key:
@@ -56,7 +110,90 @@ def use_anthropic_models(system_prompt: str) -> chatlas.Chat:
 
 
 
-chat_config = qc.init(df, "df", create_chat_callback=use_anthropic_models)
+# One DuckDB connection over the current data, shared by the query chat and (with
+# WQ_QUERY_ENGINE=duckdb) the dashboard's aggregations
+# The chat's model also gets small summary tables of the samples, rebuilt with
+# each data version, for the aggregates it is asked for most
+# With WQ_QUERY_DATABASE, they are native tables persisted per data version instead
+query_source = Deferred(
+    lambda: DataFrameSource(
+        data_service.current.df,
+        "df",
+        summary_tables=sql.chat_summary_tables("df"),
+        database=sql.DATABASE,
+        version=data_service.current.id,
+        order_by="date",
+    ),
+    name="query_source",
+)
+dashboard_sql = Deferred(lambda: sql.DashboardSQL(query_source.get(), "df"), name="dashboard_sql")
+
+# Building the querychat config profiles the data for the system prompt, so it is
+# deferred: built in the background after startup (unless WQ_QUERYCHAT_WARMUP=0),
+# or on demand when the Query Chat tab is first opened.
+chat_config = Deferred(
+    lambda: qc.init(query_source.get(), "df", create_chat_callback=use_anthropic_models),
+    name="querychat",
+)
+
+
+def refresh_query_chat(version: DataVersion) -> None:
+    # Open chats and the dashboard query the new data from now on; new chats
+    # also get a system prompt describing it. Either one still being built
+    # is updated once it is
+    query_source.update(lambda source: source.replace_data(version.df, version.id))
+    chat_config.update(
+        lambda config: setattr(config, "system_prompt", qc.system_prompt(config.data_source))
+    )
+
+
+data_service.on_swap(refresh_query_chat)
+
+# Rows of the chat's results sent to the browser at a time; sorting and column
+# filters are applied by the chat's database, not in the browser
+CHAT_PAGE_SIZE = 100
+# The FAQ's high-risk map is a static page per data version; build the new
+# version's when it's swapped in
+data_service.on_swap(risk_map.build)
+
+# Rolling compliance windows per beach, built on first use; a new version that
+# appends samples only updates the windows of the beaches it touches. The
+# engine records the version it was synced to, and its grades are cached
+# under that version rather than the session's
+compliance_engine = Deferred(
+    lambda: compliance.ComplianceEngine.from_version(data_service.current), name="compliance"
+)
+
+
+def refresh_compliance(version: DataVersion) -> None:
+    # Listeners run after the swap, so `version` is already the current one
+    compliance_engine.update(lambda engine: engine.sync(version))
+
+
+data_service.on_swap(refresh_compliance)
+# With WQ_OFFLOAD=process, pool processes attach to each version's published copy
+data_service.on_swap(offload.discard_shared)
+
+# The enterococci model is loaded (or trained and saved, on first run) in the
+# background after startup unless WQ_FORECAST_WARMUP=0, or on first use. A
+# model trained on another data version is retrained, at startup and on swaps.
+FORECAST_DAYS = 3
+
+
+def load_forecaster() -> forecast.Forecaster:
+    version = data_service.current
+    return forecast.load_or_train(version.df, data_version=version.id)
+
+
+forecaster = Deferred(load_forecaster, name="forecast")
+
+
+def refresh_forecaster(version: DataVersion) -> None:
+    # Sessions keep forecasting with the old model until the new one is in
+    forecaster.update(lambda model: forecast.retrain_if_stale(model, version))
+
+
+data_service.on_swap(refresh_forecaster)
 
 # ------------------- Create the UI ----------------------------------------------------------------------------------------------------------
 
@@ -114,6 +251,10 @@ app_ui = ui.page_fluid(
                                     selected=[],
                                     multiple=True
                                                 ),
+                                    # With DuckDB, the Query Chat's filter can narrow the dashboard too
+                                    ui.input_switch("chat_filter", "Apply the Query Chat's filter", value=False)
+                                    if sql.ENGINE == "duckdb"
+                                    else None,
                                     ui.br(),
                                     ui.download_button("download_data", "Download Data", class_="btn-primary", style="width: 100%; margin-bottom: 10px;"),
                                     ui.br(),
@@ -142,10 +283,33 @@ app_ui = ui.page_fluid(
 
                                         width = 1/2), class_="graph-section"),
                                         
+                                        ui.layout_column_wrap(
+                                        ui.card(
+                                            ui.card_header('How does water temperature relate to enterococci levels?'),
+                                            output_widget("temperature_vs_enterococci_chart")
+                                            ),
+                                        ui.card(
+                                            ui.card_header('Which regions and months have the worst levels?'),
+                                            output_widget("region_month_heatmap")
+                                            ),
+                                        width = 1/2),
                                         ui.card(
                                             ui.card_header('Water quality over the years'),
                                             output_widget("water_quality_over_years_chart")
                                         ),
+                                        ui.card(
+                                            ui.card_header("Do temperature, conductivity or rainfall move with Enterococci?"),
+                                            ui.input_select(
+                                                "correlation_by",
+                                                None,
+                                                choices={"all": "All selected samples", "season": "By season", "beach": "By swim site"},
+                                            ),
+                                            ui.output_data_frame("correlation_df")
+                                        ),
+                                        ui.card(
+                                            ui.card_header(f"Observed levels and forecast risk for the next {FORECAST_DAYS} days"),
+                                            ui.output_data_frame("forecast_df")
+                                        ),
                                         ui.card(
                                             ui.card_header("Map of Beaches Colored by Enterococci Levels"),
                                             output_widget("beach_map", height="500px")
@@ -153,6 +317,18 @@ app_ui = ui.page_fluid(
 
 
             )),
+        ui.nav_panel(
+            "Compliance",
+            ui.p(
+                f"Current grade of each swim site from its last {compliance.WINDOW} samples: "
+                "the 95th percentile of Enterococci (A up to 40, B up to 200, C up to 500 and "
+                "D above 500 CFU/100mL) and the share of samples above 130 CFU/100mL."
+            ),
+            ui.card(
+                ui.card_header("Current compliance grade by swim site"),
+                ui.output_data_frame("compliance_df")
+            ),
+        ),
         ui.nav_panel(
             "FAQ", 
             ui.accordion(
@@ -192,7 +368,14 @@ app_ui = ui.page_fluid(
                     ui.layout_column_wrap(    
                         ui.card(
                             ui.card_header("Live Filtered Data"),
-                            ui.output_data_frame("chat_filtered_df")
+                            ui.output_data_frame("chat_filtered_df"),
+                            ui.card_footer(
+                                ui.layout_columns(
+                                    ui.input_numeric("chat_page", "Page", 1, min=1, step=1),
+                                    ui.output_text("chat_page_info"),
+                                    col_widths=(3, 9),
+                                )
+                            ),
                         ),
                         width=1)
                 )),
@@ -202,8 +385,36 @@ app_ui = ui.page_fluid(
 
 
 def server(input, output, session):
-    import numpy as np
-    
+
+    # ------------------- The current data version, re-read when a new one is swapped in ------------------------------------------------------------
+    @reactive.poll(data_service.version_id, DATA_POLL_INTERVAL)
+    def data() -> DataVersion:
+        return data_service.current
+
+    shown_version = initial_version
+
+    @reactive.effect
+    @reactive.event(data)
+    def sync_filters_with_data():
+        nonlocal shown_version
+        version = data()
+        if version.id == shown_version.id:
+            return
+
+        start_date, end_date = input.daterange()
+        # A range that ran to the latest sample keeps doing so
+        if end_date is not None and pd.Timestamp(end_date) >= shown_version.max_date:
+            end_date = version.max_date
+        ui.update_date_range("daterange", end=end_date, min=version.min_date, max=version.max_date)
+
+        selected_regions = [r for r in input.regions() if r in version.regions]
+        ui.update_checkbox_group("regions", choices=version.regions, selected=selected_regions)
+        if selected_regions:
+            choices = queries.councils_in_regions(version.df, selected_regions)
+            selected_councils = [c for c in input.councils() if c in choices]
+            ui.update_selectize("councils", choices=choices, selected=selected_councils)
+        shown_version = version
+
     # ------------------- Update Councils according to the selected regions ---------------------------------------------------------------------------
     @reactive.effect
     def update_councils():
@@ -213,27 +424,131 @@ def server(input, output, session):
             ui.update_selectize("councils", choices=[], selected=[])
             return
 
-        filtered_councils = df[df["region"].isin(selected_regions)]["council"].unique()
-        filtered_councils = sorted(np.unique(filtered_councils))
+        # Regions changing resets the councils; a new data version doesn't
+        with reactive.isolate():
+            samples = data().df
+        filtered_councils = queries.councils_in_regions(samples, selected_regions)
 
         ui.update_selectize("councils", choices=filtered_councils, selected=[])
 
 # ------------------- Update the first value box according to the selected date range, regions and councils ------------------------------------------------
-    @reactive.calc      # filtered_df is a reactive expression that filters the DataFrame based on user input
+    # Bursts of filter changes (ticking several councils in a row) update the
+    # dashboard once, after the filters have been still for WQ_DEBOUNCE_MS
+    @reactivity.debounce()
+    def selection():
+        return tuple(input.regions()), tuple(input.councils()), tuple(input.daterange())
+
+    # The selection's heavy calcs run as background jobs on a pool (WQ_OFFLOAD), so
+    # they don't hold up other sessions on this worker; their outputs show as busy
+    # until the jobs finish. Each starts only while one of its outputs is visible.
+    @reactivity.background(session, outputs=SELECTION_OUTPUTS)      # filtered_df filters the DataFrame based on user input
     def filtered_df():
-        selected_councils = input.councils()
-        selected_regions = input.regions()
-        start_date, end_date = input.daterange()
-        start_date, end_date = pd.to_datetime(start_date), pd.to_datetime(end_date)
+        version = data()
+        if sql.ENGINE == "duckdb":
+            return offload.Job(dashboard_sql.get().filter_samples, (selection(), chat_query()), threads=True)
+        return offload.Job(offload.selected, (version.id, version.df, selection()), threads=True)
+
+    @reactivity.background(session, outputs=SELECTION_OUTPUTS)
+    def rollup():
+        # With DuckDB, the selection's sums and counts per beach, region, year and
+        # month: the value boxes, most charts and the map are reduced from this one
+        # scan, which sessions share
+        req(sql.ENGINE == "duckdb")
+        return offload.Job(
+            sql.cached_rollup,
+            (data().id, selection_key(), dashboard_sql.get(), selection(), chat_query()),
+            threads=True,
+        )
+
+    def pandas_job(fn, *args, outputs=()):
+        # A background calc of `fn(version, frame, selection, *args)`, for the
+        # pandas engine, cached per data version and selection
+        @reactivity.background(session, outputs=outputs)
+        def job():
+            req(sql.ENGINE == "pandas")
+            version = data()
+            return offload.Job(
+                fn,
+                (version.id, offload.shared(version), selection(), *args),
+                version=version.id,
+                key=(selection_key(), *args),
+            )
+
+        return job
+
+    yearly_trends = pandas_job(offload.yearly_trends, outputs=["water_quality_over_years_chart"])
+    region_months = pandas_job(offload.region_months, outputs=["region_month_heatmap"])
+    map_sites = pandas_job(offload.site_clusters, outputs=["beach_map"])
+
+    def aggregate(name: str):
+        # One of the dashboard's aggregations of the selection, by name: reduced
+        # from the DuckDB rollup, or computed over the filtered frame in pandas
+        if sql.ENGINE == "duckdb":
+            return getattr(sql, name)(rollup())
+        return getattr(queries, name)(filtered_df())
+
+    # ------------------- compact figures, with their JavaScript loaded by URL -----------------------------------------------------------
+    def figure_widget_class():
+        # The browser fetches (and caches) the figure widget's 5 MB bundle from
+        # the app once, instead of receiving it inline with every figure
+        client = session.clientdata
+        try:
+            with reactive.isolate():
+                port = f":{client.url_port()}" if client.url_port() else ""
+                base = f"{client.url_protocol()}//{client.url_hostname()}{port}{client.url_pathname()}"
+        except ValueError:
+            from plotly.graph_objects import FigureWidget
+
+            return FigureWidget
+        return payload.figure_widget_class(f"{base.rstrip('/')}{payload.BUNDLE_URL}/widgetbundle.js")
+
+    def compact_figure(fn):
+        # Slims the figure a chart returns and records the bytes it sends
+        @functools.wraps(fn)
+        def wrapper():
+            widget = figure_widget_class()(payload.compact(fn()))
+            payload.meter.record(fn.__name__, payload.state_bytes(widget.get_state()))
+            return widget
+
+        return wrapper
+
+    @reactivity.background(session, outputs=["temperature_vs_enterococci_chart"])
+    def temperature_grid():
+        version = data()
+        if sql.ENGINE == "duckdb":
+            return offload.Job(
+                sql.cached_binned_scatter,
+                (version.id, selection_key(), dashboard_sql.get(), selection(), "water_temperature", chat_query()),
+                threads=True,
+            )
+        return offload.Job(
+            offload.scatter,
+            (version.id, offload.shared(version), selection(), "water_temperature"),
+            version=version.id,
+            key=(selection_key(), "water_temperature"),
+        )
 
-        if not selected_councils or not selected_regions or not start_date or not end_date:
-            return df.iloc[0:0]  # return empty dataframe
+    @reactivity.background(session, outputs=["correlation_df"])
+    def correlations():
+        by = None if input.correlation_by() == "all" else input.correlation_by()
+        version = data()
+        if chat_query():
+            # Drawn from the chat's rows, which only DuckDB has selected
+            return offload.Job(
+                correlation.cached_correlations, (version.id, selection_key(), filtered_df(), by), threads=True
+            )
+        return offload.Job(
+            offload.correlations,
+            (version.id, offload.shared(version), selection(), by),
+            version=version.id,
+            key=(selection_key(), by),
+        )
 
-        return df[
-            (df["region"].isin(selected_regions)) &
-            (df["council"].isin(selected_councils)) &
-            (df["date"].between(start_date, end_date))
-        ]
+    @reactive.calc
+    def selection_key():
+        # Identifies filtered_df() within a data version, for the shared caches
+        regions, councils, daterange = selection()
+        return (regions, councils, tuple(map(str, daterange)), chat_query())
     
     #--------------------------------- ----------------------------------------------------------------------------------------------------------------------
     # -------------------------------------------------------------------------------------------------------------------------------------------------------
@@ -246,7 +561,7 @@ def server(input, output, session):
 
     @reactive.calc
     def total_beaches():
-        return len(filtered_df()["beach"].unique())
+        return aggregate("total_beaches")
     
     # ------------------- render the total number of swim sites monitored as value box -----------------------------------------------------------------------------
 
@@ -271,10 +586,7 @@ def server(input, output, session):
     # ------------------- reactive calculation for getting the most polluted beach (or most frequently polluted beach?)-------------------------------------------------------------------------------------------------
     @reactive.calc
     def most_polluted_beach():
-        df_filtered = filtered_df()
-        if df_filtered.empty:
-            return "Please select"
-        return df_filtered.groupby("beach")["enterococci"].mean().idxmax()
+        return aggregate("most_polluted_beach")
     
     # @reactive.calc
     # def most_frequently_polluted_beach():
@@ -320,10 +632,7 @@ def server(input, output, session):
 # ------------------- reactive calc for getting the cleanest beach ------------------------------------------------------------
     @reactive.calc
     def cleanest_beach():
-        df_filtered = filtered_df()
-        if df_filtered.empty:
-            return "Please select"
-        return df_filtered.groupby("beach")["enterococci"].mean().idxmin()
+        return aggregate("cleanest_beach")
 
 # ------------------- render the cleanest beach as a value box ----------------------------------------------------------------------------------------
 
@@ -340,23 +649,16 @@ def server(input, output, session):
 
     @reactive.calc
     def high_enterococci_sites():
-        df_filtered = filtered_df()
-        if df_filtered.empty:
-            return pd.DataFrame()
-
-        # pollution threshold
-        threshold = 130
-
-        # Sort by count in descending order
-        high_enterococci_df = df_filtered[df_filtered['enterococci'] > threshold].groupby('beach').size().reset_index(name='count')
-        if high_enterococci_df.empty:
-            return pd.DataFrame()
-        return high_enterococci_df.sort_values(by='count', ascending=False)
+        # sites above the pollution threshold, sorted by count in descending order
+        return aggregate("high_enterococci_sites")
     
     # ------------------- render the bar chart for high enterococci sites ----------------------------------------------------------------------------------------
     
     @render_plotly
+    @compact_figure
     def high_enterococci_chart():
+        import plotly.express as px
+
         df_high = high_enterococci_sites()
         if df_high.empty:
             return px.bar(title="No swim sites with high enterococci levels found.")
@@ -372,42 +674,18 @@ def server(input, output, session):
         )
         fig.update_layout(xaxis_title='Swim Site', yaxis_title='Number of High Enterococci Records')
         return fig
-# -------------------- helper func for reactive calculation for determining how water quality changes by season ------------------------------------------------
-    def month_to_season(month):
-            if month in [12, 1, 2]:
-                return 'Summer'
-            elif month in [3, 4, 5]:
-                return 'Autumn'
-            elif month in [6, 7, 8]:
-                return 'Winter'
-            else:
-                return 'Spring'
-
 # --------------------  reactive calculation for determining how water quality changes by season ----------------------------------------------------------------
     @reactive.calc
     def water_quality_by_season():    
-        df_filtered = filtered_df()
-        if df_filtered.empty:
-            return pd.DataFrame()
-
-        # Extract season from date
-        df_filtered = df_filtered.copy()
-        df_filtered['month'] = df_filtered['date'].dt.month
-        # Apply the function to create a new column for season
-        df_filtered['season'] = df_filtered['month'].apply(month_to_season)
-
-        # Group by season and beach, calculating mean enterococci, water temperature, and conductivity
-        # Sort by enterococci levels in descending order        
-        seasonal_quality = df_filtered.groupby(['season']).agg({'enterococci': 'mean',
-                                                                      #'water_temperature': 'mean', 'conductivity': 'mean'
-                                                                      }).reset_index()
-        seasonal_quality = seasonal_quality.sort_values(by='enterococci', ascending=False)
-
-        return seasonal_quality
+        # mean enterococci per season, sorted by enterococci levels in descending order
+        return aggregate("water_quality_by_season")
 
 # ------------------- render the bar chart for water quality by season ----------------------------------------------------------------------------------------
     @render_plotly
+    @compact_figure
     def water_quality_by_season_chart():
+        import plotly.express as px
+
         df_season = water_quality_by_season()
         if df_season.empty:
             return px.bar(title="No data available for the selected filters.")
@@ -424,24 +702,71 @@ def server(input, output, session):
         fig.update_layout(xaxis_title='Season', yaxis_title='Average Enterococci Level')
         return fig
     
-# ------------------- water quality over the years --------------------------------------------------------------------------------------------------------
+# ------------------- binned scatter and heatmap, aggregated on the server ----------------------------------------------------------------
+    # Samples are binned into fixed-size grids before plotting, so these charts
+    # send the same amount of data however many samples are selected
     @render_plotly
-    def water_quality_over_years_chart():
-        df_filtered = filtered_df()
-        if df_filtered.empty:
+    @compact_figure
+    def temperature_vs_enterococci_chart():
+        import plotly.express as px
+
+        grid = temperature_grid()
+        if grid.total == 0:
             return px.bar(title="No data available for the selected filters.")
 
-        # Extract year from date
-        df_filtered['year'] = df_filtered['date'].dt.year
+        fig = px.imshow(
+            grid.counts,
+            x=grid.x.round(2),
+            y=grid.y.round(3),
+            origin="lower",
+            aspect="auto",
+            labels={"x": "Water Temperature (°C)", "y": "Enterococci (CFU/100mL)", "color": "Samples"},
+            color_continuous_scale=px.colors.sequential.Viridis,
+        )
+        # Empty bins are left blank
+        fig.update_traces(z=binning.heatmap_cells(np.where(grid.counts > 0, grid.counts, np.nan)))
+        fig.update_yaxes(
+            tickvals=binning.log_level(binning.ENTEROCOCCI_TICKS),
+            ticktext=[str(v) for v in binning.ENTEROCOCCI_TICKS],
+        )
+        fig.update_layout(title='Samples by Water Temperature and Enterococci Level')
+        return fig
 
-        # Group by year and calculate mean enterococci
-        yearly_trends = df_filtered.groupby(['year', 'beach']).agg({
-            'enterococci': 'mean',
-        }).reset_index()
-        yearly_trends = yearly_trends.sort_values(by=['year', 'enterococci'], ascending=[True, False])
+    @render_plotly
+    @compact_figure
+    def region_month_heatmap():
+        import plotly.express as px
+
+        if sql.ENGINE == "duckdb":
+            grid = sql.region_month(rollup())
+        else:
+            grid = region_months()
+        if grid.empty:
+            return px.bar(title="No data available for the selected filters.")
+
+        fig = px.imshow(
+            grid.round(1),
+            aspect="auto",
+            labels={"x": "Month", "y": "Region", "color": "Average Enterococci Level"},
+            color_continuous_scale=px.colors.sequential.Viridis,
+        )
+        fig.update_traces(z=binning.heatmap_cells(grid.round(1)))
+        fig.update_layout(title='Average Enterococci Levels by Region and Month')
+        return fig
+
+# ------------------- water quality over the years --------------------------------------------------------------------------------------------------------
+    @render_plotly
+    @compact_figure
+    def water_quality_over_years_chart():
+        import plotly.express as px
+
+        # Mean enterococci per year and beach
+        trends = sql.yearly_trends(rollup()) if sql.ENGINE == "duckdb" else yearly_trends()
+        if trends.empty:
+            return px.bar(title="No data available for the selected filters.")
 
         fig = px.line(
-            yearly_trends,
+            trends,
             x='year',
             y='enterococci',
             color='beach',
@@ -452,20 +777,88 @@ def server(input, output, session):
         fig.update_layout(xaxis_title='Year', yaxis_title='Average Enterococci Level')
         return fig
 
+# -------------------- correlations of the measurements with enterococci ------------------------------------------------
+    @render.data_frame
+    def correlation_df():
+        table = correlation.drivers(correlations()).round({"pearson": 3, "spearman": 3})
+        return table.rename(
+            columns={
+                "beach": "Swim Site",
+                "season": "Season",
+                "variable": "Measurement",
+                "samples": "Samples",
+                "pearson": "Pearson",
+                "spearman": "Spearman",
+            }
+        )
+
+# -------------------- forecast risk next to observed levels ------------------------------------------------
+    @render.data_frame
+    async def forecast_df():
+        # Predictions cover every site and are cached per data version; the
+        # selection only picks which sites are shown. Until the model has been
+        # loaded (or trained, on a first run) the table waits off the event loop
+        model = await forecaster.get_async()
+        predictions = forecast.cached_forecast(data(), model, days=FORECAST_DAYS)
+        return forecast.observed_vs_forecast(filtered_df(), predictions)
+
+# -------------------- current compliance grades ------------------------------------------------
+    @render.data_frame
+    async def compliance_df():
+        # Built (and, if a swap's sync hasn't caught up yet, synced) off the
+        # event loop
+        version = data()
+        engine = await compliance_engine.get_async()
+        if engine.version != version.id:
+            await asyncio.to_thread(engine.sync, data_service.current)
+        grades = compliance.current_grades(engine)
+        grades = grades.assign(last_sampled=grades["last_sampled"].dt.strftime("%Y-%m-%d")).rename(
+            columns={
+                "beach": "Swim Site",
+                "region": "Region",
+                "council": "Council",
+                "grade": "Grade",
+                "p95": "95th percentile",
+                "exceedance_rate": "Exceedance rate",
+                "window_samples": "Samples in window",
+                "samples": "Samples",
+                "last_sampled": "Sampled on",
+            }
+        )
+        return render.DataGrid(grades, filters=True)
+
 # # -------------------- add a map woth high risk areas ------------------------------------------------
+    # The map widget is built once per session; markers are clustered on the
+    # server per zoom level and only those in view are sent to the browser.
+    @reactive.calc
+    def beach_map_widget():
+        from ipyleaflet import LayerGroup, Map
+
+        m = Map(center=[-33.86, 151.20], zoom=10)
+        m.add_layer(LayerGroup(name="beaches"))
+        return m
+
     @render_widget
     def beach_map():
-        df_filtered = filtered_df()
-
-        # df_filtered["latitude"] = pd.to_numeric(df_filtered["latitude"], errors="coerce")
-        # df_filtered["longitude"] = pd.to_numeric(df_filtered["longitude"], errors="coerce")
+        return beach_map_widget()
 
-        # df_filtered = df_filtered.dropna(subset=["latitude", "longitude"])
+    @reactive.calc
+    def site_clusters():
+        if sql.ENGINE == "duckdb":
+            return sql.site_clusters(data().id, selection_key(), rollup())
+        return map_sites()
 
-        m = Map(center=[-33.86, 151.20], zoom=10)
+    @reactive.effect
+    def update_beach_markers():
+        from ipyleaflet import CircleMarker
+        from ipywidgets import HTML
 
-        if df_filtered.empty or not {'latitude', 'longitude', 'enterococci', 'beach'}.issubset(df_filtered.columns):
-            return m
+        # Shiny suspends hidden outputs but not effects; the markers are
+        # brought up to date when the map is next shown
+        req(reactivity.shown(session, "beach_map"))
+        m = beach_map_widget()
+        zoom, bounds = reactive_read(m, ["zoom", "bounds"])
+        clusters = site_clusters().in_view(round(zoom), bounds)
 
         def get_color(level):
             if level <= 40:
@@ -474,39 +867,37 @@ def server(input, output, session):
                 return "#440154FF"
             else:
                 return "#FDE725FF"
-          # Aggregate per beach: average enterococci, and take first lat/lon
-        df_grouped = (
-            df_filtered
-            .dropna(subset=["latitude", "longitude"])
-            .groupby("beach")
-            .agg({
-                "enterococci": "mean",
-                "latitude": "first",
-                "longitude": "first"
-            })
-            .reset_index()
-        )
+
         def make_marker(row):
-                return CircleMarker(
-                    location=(row["latitude"], row["longitude"]),
-                    radius=5,
-                    color=get_color(row["enterococci"]),
-                    fill_color=get_color(row["enterococci"]),
-                    fill_opacity=0.6,
-                    popup=HTML(f"<b>{row['beach']}</b><br>Avg Enterococci: {row['enterococci']:.1f}")
+            if row.sites == 1:
+                popup = f"<b>{row.worst_beach}</b><br>Avg Enterococci: {row.enterococci:.1f}"
+                radius = 5
+            else:
+                popup = (
+                    f"<b>{row.sites} swim sites</b><br>Avg Enterococci: {row.enterococci:.1f}"
+                    f"<br>Worst: {row.worst_beach} ({row.worst_enterococci:.1f})"
                 )
-        
-        markers = df_grouped.apply(make_marker, axis=1).tolist()
-        group = LayerGroup(layers=markers)
-        m.add_layer(group)
+                radius = 5 + 3 * np.log2(row.sites)
+            return CircleMarker(
+                location=(row.latitude, row.longitude),
+                radius=int(radius),
+                color=get_color(row.enterococci),
+                fill_color=get_color(row.enterococci),
+                fill_opacity=0.6,
+                popup=HTML(popup),
+            )
 
-        return m
+        group = next(layer for layer in m.layers if layer.name == "beaches")
+        group.layers = [make_marker(row) for row in clusters.itertuples()]
 
 
 # ----------- Server-side render logic for visual answers in FAQ ----------------------------------------------
 
     @render_plotly
+    @compact_figure
     def faq_high_risk_chart():
+        import plotly.express as px
+
         df_high = high_enterococci_sites()
         if df_high.empty:
             return px.bar(title="No swim sites with high enterococci levels found.")
@@ -529,7 +920,10 @@ def server(input, output, session):
 
 
     @render_plotly
+    @compact_figure
     def faq_seasonal_variation_chart():
+        import plotly.express as px
+
         df_season = water_quality_by_season()
         if df_season.empty:
             return px.bar(title="No data available for the selected filters.")
@@ -546,6 +940,16 @@ def server(input, output, session):
         fig.update_layout(xaxis_title='Season', yaxis_title='Average Enterococci Level')
         return fig
         
+    @render.ui
+    def faq_high_risk_map():
+        # Built once per data version and shared by every session
+        page = risk_map.build(data())
+        return ui.tags.iframe(
+            src=f"{risk_map.ASSET_URL.lstrip('/')}/{page}",
+            style="width: 100%; height: 450px; border: none;",
+            title="High-risk swim sites",
+        )
+
     @render.data_frame
     def faq_seasonal_variation_df():
         return water_quality_by_season().head(10)  # Display the top 10 seasonal variations
@@ -553,25 +957,123 @@ def server(input, output, session):
    
         
       
-    chat = qc.server("chat", chat_config)
+    # ------------------- start querychat when its tab is first opened -----------------------------------------------------
+    chat = reactive.value(None)
+
+    @reactive.effect
+    @reactive.event(input.page)
+    async def start_query_chat():
+        if input.page() == "Query Chat" and chat.get() is None:
+            # Profiling the data for the system prompt (unless warmed up) happens
+            # off the event loop; the tab's outputs wait for the chat meanwhile
+            config = await chat_config.get_async()
+            if chat.get() is None:
+                chat.set(qc.server("chat", config, data_version=data))
+
+    @reactive.calc
+    def chat_query():
+        # The chat's SQL, when the dashboard is set to apply it: DuckDB selects the
+        # dashboard's samples from its rows, as a subquery of every aggregate query
+        if sql.ENGINE != "duckdb" or chat.get() is None or not input.chat_filter():
+            return ""
+        return chat.get().sql()
+
+    # The chat's results are paged on the server: the grid gets one page at a
+    # time, and its sorting and column filters (by column position, mapped
+    # onto the page's columns) are pushed down into the chat's query
+    chat_columns: list[str] = []
+    chat_view = reactive.value(None)  # (sort, filters, page) shown
+    chat_rows = reactive.value(0)  # rows matching the filters
+
+    def grid_view(sort, filters, page: int) -> tuple:
+        return (
+            tuple((s["col"], s["desc"]) for s in sort),
+            tuple((f["col"], f["value"] if isinstance(f["value"], str) else tuple(f["value"])) for f in filters),
+            page,
+        )
+
+    def fetch_chat_page(sort=(), filters=(), page: int = 1) -> pd.DataFrame:
+        rows, total = chat.get().page(
+            sort=[(chat_columns[s["col"]], s["desc"]) for s in sort],
+            filters=[(chat_columns[f["col"]], f["value"]) for f in filters],
+            offset=(page - 1) * CHAT_PAGE_SIZE,
+            limit=CHAT_PAGE_SIZE,
+        )
+        chat_rows.set(total)
+        chat_view.set(grid_view(sort, filters, page))
+        ui.update_numeric("chat_page", max=max(1, -(-total // CHAT_PAGE_SIZE)))
+        return rows
 
     @render.data_frame
     def chat_filtered_df():
-        return chat.df()
+        # A new query (or data version) starts over from its first page
+        req(chat.get())
+        chat_columns.clear()
+        rows = fetch_chat_page()
+        chat_columns.extend(rows.columns)
+        with reactive.isolate():
+            if input.chat_page() != 1:
+                ui.update_numeric("chat_page", value=1)
+        return render.DataGrid(rows, filters=True)
+
+    @reactive.effect
+    @reactive.event(chat_filtered_df.sort, chat_filtered_df.filter, input.chat_page)
+    async def update_chat_page():
+        req(chat.get(), chat_columns)
+        sort, filters = chat_filtered_df.sort(), chat_filtered_df.filter()
+        page = max(int(input.chat_page() or 1), 1)
+        shown = chat_view.get()
+        view = grid_view(sort, filters, page)
+        if shown is not None and view[:2] != shown[:2] and page != 1:
+            # New sorting or filters start from the first page
+            ui.update_numeric("chat_page", value=1)
+            view = grid_view(sort, filters, 1)
+        if view != shown:
+            await chat_filtered_df.update_data(fetch_chat_page(sort, filters, view[2]))
+
+    @render.text
+    def chat_page_info():
+        req(chat.get(), chat_view.get())
+        total = chat_rows.get()
+        first = (chat_view.get()[2] - 1) * CHAT_PAGE_SIZE
+        if first >= total:
+            return f"No rows on this page ({total:,} matching)"
+        return f"Rows {first + 1:,}–{min(first + CHAT_PAGE_SIZE, total):,} of {total:,}"
 # ------------------------ render the download button -------------------------------------------------------------
 
     @render.download(filename="filtered_data.csv")
     def download_data():
         df_out = filtered_df()
-        return df_out.to_csv(index=False)
+        yield df_out.to_csv(index=False)
 
 #--------------------- reset the filters appliedd -----------------------------------------------------------------
     @reactive.effect
     @reactive.event(input.reset)
     def _():
-        ui.update_date_range("daterange", start=DEFAULT_DATE_RANGE[0], end=DEFAULT_DATE_RANGE[1])
+        version = data()
+        ui.update_date_range("daterange", start=version.min_date, end=version.max_date)
         ui.update_checkbox_group("regions",  selected=DEFAULT_REGIONS)
         ui.update_selectize("councils", selected=DEFAULT_COUNCILS)
 
     
-app = App(app_ui, server)
\ No newline at end of file
+risk_map.ASSET_DIR.mkdir(parents=True, exist_ok=True)
+app = App(
+    app_ui,
+    server,
+    static_assets={risk_map.ASSET_URL: risk_map.ASSET_DIR, payload.BUNDLE_URL: payload.bundle_dir()},
+)
+app.on_shutdown(offload.shutdown)
+
+data_service.start()
+
+if os.environ.get("WQ_QUERYCHAT_WARMUP", "1") != "0":
+    chat_config.warm_up()
+if os.environ.get("WQ_FORECAST_WARMUP", "1") != "0":
+    forecaster.warm_up()
+# Reloads build the new version's map when it's swapped in; the first
+# version's is built here, rather than by the first session to open the FAQ
+if os.environ.get("WQ_RISK_MAP_WARMUP", "1") != "0":
+    risk_map.warm_up(data_service.current)
+# Logs the data's and caches' bytes (`water_quality.memory`) every that many seconds
+if float(os.environ.get("WQ_MEMORY_LOG_INTERVAL", 0)) > 0:
+    memory.log_reports(lambda: data_service.current.df, float(os.environ["WQ_MEMORY_LOG_INTERVAL"]))
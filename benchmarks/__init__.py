@@ -0,0 +1,5 @@
+"""
+Performance benchmarks. Run each module with `python -m benchmarks.<name>`
+from the repository root; results are written as JSON under
+`benchmarks/results/` so runs from different commits can be compared.
+"""
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from water_quality.data import ROOT
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def timeit(fn: Callable[[], Any], *, repeat: int = 5, warmup: int = 1) -> dict:
+    """
+    Time a zero-argument callable.
+
+    Returns:
+        A dict with the best, median and mean wall time in milliseconds over
+        `repeat` runs, after `warmup` untimed runs
+
+    """
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        "best_ms": round(min(times), 3),
+        "median_ms": round(statistics.median(times), 3),
+        "mean_ms": round(statistics.fmean(times), 3),
+        "repeat": repeat,
+    }
+
+
+def percentiles(samples: list[float], points=(50, 95, 99)) -> dict:
+    """Nearest-rank percentiles of `samples`, keyed `p50`, `p95`, ..."""
+    if not samples:
+        return {f"p{p}": None for p in points}
+    ordered = sorted(samples)
+    return {
+        f"p{p}": round(ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))], 3)
+        for p in points
+    }
+
+
+def git_revision() -> Optional[str]:
+    """Short hash of the checked-out commit, with `-dirty` for local changes."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).resolve().parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(name: str, results: dict, out: Optional[Path] = None) -> Path:
+    """
+    Write benchmark results as JSON, tagged with the commit and machine.
+
+    Args:
+        name: Benchmark name, used for the default file name
+        results: The measurements
+        out: Output file; defaults to `benchmarks/results/<name>-<revision>.json`
+
+    Returns:
+        The path written to
+
+    """
+    revision = git_revision()
+    payload = {
+        "benchmark": name,
+        "revision": revision,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    out = out or RESULTS_DIR / f"{name}-{revision or 'unknown'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(payload, indent=2, default=str))
+    return out
+
+
+@contextmanager
+def workers(n: int, base_port: int, env: dict) -> Iterator[list[subprocess.Popen]]:
+    """Start `n` uvicorn workers serving `app:app` on consecutive ports."""
+    procs = [
+        subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "app:app",
+                "--host",
+                "127.0.0.1",
+                "--port",
+                str(base_port + i),
+                "--log-level",
+                "warning",
+            ],
+            cwd=ROOT,
+            env=env,
+        )
+        for i in range(n)
+    ]
+    try:
+        for i, proc in enumerate(procs):
+            _wait_until_up(base_port + i, proc)
+        yield procs
+    finally:
+        for proc in procs:
+            proc.terminate()
+        for proc in procs:
+            proc.wait(timeout=10)
+
+
+def _wait_until_up(port: int, proc: subprocess.Popen, timeout: float = 120) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"Worker on port {port} exited with {proc.returncode}")
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.25)
+    raise RuntimeError(f"Worker on port {port} did not start within {timeout}s")
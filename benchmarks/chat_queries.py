@@ -0,0 +1,163 @@
+"""
+Concurrent chat sessions' queries, blocking the event loop or awaited.
+
+The query chat's tools (`update_dashboard`, `query`) run on the app worker's
+event loop. Calling a data source's `execute_query` there blocks the loop
+for the whole query, so concurrent sessions' queries, and everything else
+the worker serves, wait in line; awaiting `execute_query_async` lets them
+overlap. This runs `--sessions` concurrent sessions, each sending
+`--queries` typical chat queries one after the other, both ways, against:
+
+- `duckdb`: a `DataFrameSource` (async: worker threads, a cursor each);
+- `sqlite`: a `SQLAlchemySource` over a SQLite file (async: worker threads);
+- `aiosqlite`: the same with an async engine (`sqlite+aiosqlite`), if
+  aiosqlite is installed.
+
+Meanwhile a probe wakes every millisecond and records how late it is: the
+event loop's lag, which every other session on the worker would see.
+Reported per source and way: wall time, per-query latency and loop lag
+percentiles. With `--check` it exits non-zero if awaiting doesn't cut the
+loop lag's p95.
+
+Usage:
+
+    python -m benchmarks.chat_queries --size 1m --sessions 8 --check
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib.util
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from querychat.datasource import DataFrameSource, DataSource, SQLAlchemySource
+from water_quality import synthetic
+from water_quality.data import compact, load_dataset
+
+from ._common import percentiles, save_results
+from .dashboard import dataset_path
+
+QUERIES = [
+    "SELECT beach, AVG(enterococci) AS mean FROM samples GROUP BY beach ORDER BY mean DESC LIMIT 10",
+    "SELECT * FROM samples WHERE precipitation_mm > 20 AND enterococci > 30",
+    "SELECT region, year, COUNT(*) AS n, MAX(enterococci) AS worst FROM samples GROUP BY region, year",
+    "SELECT council, AVG(water_temperature) AS temperature FROM samples GROUP BY council",
+]
+
+
+async def probe(lags: list[float], stop: asyncio.Event) -> None:
+    """Record how late the event loop wakes a 1 ms sleep."""
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append((time.perf_counter() - start - 0.001) * 1000)
+
+
+async def session(source: DataSource, awaited: bool, queries: int, seed: int, latencies: list[float]) -> None:
+    for i in range(queries):
+        query = QUERIES[(seed + i) % len(QUERIES)]
+        start = time.perf_counter()
+        if awaited:
+            await source.execute_query_async(query)
+        else:
+            # As the tools did: the query blocks the loop
+            source.execute_query(query)
+            await asyncio.sleep(0)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_way(source: DataSource, awaited: bool, sessions: int, queries: int) -> dict:
+    lags: list[float] = []
+    latencies: list[float] = []
+    stop = asyncio.Event()
+    prober = asyncio.create_task(probe(lags, stop))
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await asyncio.gather(*(session(source, awaited, queries, seed, latencies) for seed in range(sessions)))
+    wall = (time.perf_counter() - start) * 1000
+    stop.set()
+    await prober
+    return {
+        "wall_ms": round(wall, 1),
+        "query": percentiles(latencies),
+        "loop_lag": {**percentiles(lags), "max": round(max(lags), 3)},
+    }
+
+
+def sources(df: pd.DataFrame, directory: Path) -> dict[str, DataSource]:
+    import sqlalchemy
+
+    path = directory / "samples.db"
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+    # SQLite has no timestamp type; the dates are stored as text
+    df.assign(date=df["date"].dt.strftime("%Y-%m-%d")).to_sql("samples", engine, index=False, chunksize=100_000)
+    found: dict[str, DataSource] = {
+        "duckdb": DataFrameSource(df, "samples"),
+        "sqlite": SQLAlchemySource(engine, "samples"),
+    }
+    if importlib.util.find_spec("aiosqlite") is not None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        found["aiosqlite"] = SQLAlchemySource(
+            engine, "samples", async_engine=create_async_engine(f"sqlite+aiosqlite:///{path}")
+        )
+    else:
+        print("aiosqlite is not installed; skipping the async engine")
+    return found
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size", default="1m", choices=list(synthetic.SIZES), help="Synthetic dataset size")
+    parser.add_argument("--data", type=Path, default=None, help="Use an existing dataset file instead")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent chat sessions")
+    parser.add_argument("--queries", type=int, default=4, help="Queries per session")
+    parser.add_argument("--check", action="store_true", help="Fail if awaiting doesn't cut the loop lag")
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    path = args.data or dataset_path(args.size)
+    df = compact(load_dataset(path))
+    directory = Path(tempfile.mkdtemp(prefix="chat_queries-"))
+    results: dict = {"rows": len(df), "sessions": args.sessions, "queries": args.queries, "sources": {}}
+    try:
+        print(f"Loading {len(df):,} rows into each source ...")
+        for name, source in sources(df, directory).items():
+            results["sources"][name] = {
+                way: asyncio.run(run_way(source, way == "awaited", args.sessions, args.queries))
+                for way in ("blocking", "awaited")
+            }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"  {'source':<10} {'way':<9} {'wall ms':>9} {'query p50':>10} {'query p95':>10} {'lag p95':>9} {'lag max':>9}")
+    for name, ways in results["sources"].items():
+        for way, row in ways.items():
+            print(
+                f"  {name:<10} {way:<9} {row['wall_ms']:>9.1f} {row['query']['p50']:>10.1f} "
+                f"{row['query']['p95']:>10.1f} {row['loop_lag']['p95']:>9.1f} {row['loop_lag']['max']:>9.1f}"
+            )
+    print(f"Results written to {save_results('chat_queries', results, args.out)}")
+
+    if args.check:
+        failures = [
+            f"{name}: loop lag p95 {ways['awaited']['loop_lag']['p95']} ms awaited, "
+            f"not below {ways['blocking']['loop_lag']['p95']} ms blocking"
+            for name, ways in results["sources"].items()
+            if ways["awaited"]["loop_lag"]["p95"] >= ways["blocking"]["loop_lag"]["p95"]
+        ]
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Compare two benchmark result files and flag regressions.
+
+Usage:
+
+    python -m benchmarks.compare benchmarks/results/dashboard-abc123.json benchmarks/results/dashboard-def456.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Iterator, Optional
+
+
+def _timings(results: dict, prefix: str = "") -> Iterator[tuple[str, float]]:
+    """Yield `(name, median_ms)` for every timing in a (nested) result dict."""
+    for name, value in results.items():
+        if not isinstance(value, dict):
+            continue
+        if "median_ms" in value:
+            yield prefix + name, value["median_ms"]
+        else:
+            yield from _timings(value, f"{prefix}{name}.")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.2,
+        help="Slowdown ratio reported as a regression (default: 1.2)",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = json.loads(args.baseline.read_text())
+    candidate = json.loads(args.candidate.read_text())
+    before = dict(_timings(baseline["results"]))
+    after = dict(_timings(candidate["results"]))
+
+    print(f"{'timing':<48} {str(baseline['revision'] or '-'):>12} {str(candidate['revision'] or '-'):>12}  ratio")
+    regressions = 0
+    for name in before.keys() & after.keys():
+        ratio = after[name] / before[name] if before[name] else float("inf")
+        flag = "  REGRESSION" if ratio > args.threshold else ""
+        regressions += bool(flag)
+        print(f"{name:<48} {before[name]:>12.1f} {after[name]:>12.1f}  {ratio:5.2f}{flag}")
+
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
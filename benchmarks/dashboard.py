@@ -0,0 +1,304 @@
+"""
+Micro-benchmarks of the dashboard's data path at scale.
+
+Covers loading, `filtered_df`-style filtering, the per-beach aggregations
+behind the value boxes and charts, season/year rollups, the binned scatter
+and region-by-month grid, the map aggregation and clustering, correlations
+per site and season, the rolling compliance windows (built, and updated with
+the last month's samples), querychat's `DataFrameSource` (schema generation,
+query execution, its summary tables, and lazy relations), and the same
+dashboard aggregations as DuckDB SQL (`water_quality.sql`), with one pass
+over everything the dashboard computes per selection timed both ways
+(`dashboard_pandas`, `dashboard_duckdb`), also under a chat filter
+(`chat_dashboard_*_materialized`, `chat_dashboard_*_pushdown`).
+
+Usage:
+
+    python -m benchmarks.dashboard --sizes 1m 10m 50m
+    python -m benchmarks.dashboard --data data/cleaned_merged_water_quality_weather.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+from pathlib import Path
+from typing import Optional
+
+import narwhals as nw
+import pandas as pd
+
+from querychat.datasource import DataFrameSource
+from water_quality import queries, sql, synthetic
+from water_quality.binning import binned_scatter, region_month
+from water_quality.compliance import ComplianceEngine
+from water_quality.correlation import correlations
+from water_quality.data import ROOT, compact, load_dataset
+from water_quality.spatial import SiteClusters
+
+from ._common import save_results, timeit
+
+
+def dataset_path(size: str) -> Path:
+    """Generate (once) and return the Parquet file for a synthetic size."""
+    path = ROOT / "data" / f"synthetic_{size}.parquet"
+    if not path.exists():
+        print(f"Generating {size} rows into {path} ...")
+        synthetic.write(synthetic.generate(synthetic.SIZES[size]), path)
+    return path
+
+
+def selection(df: pd.DataFrame) -> dict:
+    """A typical sidebar selection: half the regions, their councils, five years."""
+    regions = sorted(df["region"].unique())
+    regions = regions[: max(1, len(regions) // 2)]
+    max_date = df["date"].max()
+    return {
+        "regions": regions,
+        "councils": queries.councils_in_regions(df, regions),
+        "start_date": max_date - pd.DateOffset(years=5),
+        "end_date": max_date,
+    }
+
+
+def sql_selection(sel: dict) -> sql.Selection:
+    """`selection` as the sidebar's (regions, councils, dates) that `water_quality.sql` takes."""
+    return (
+        tuple(sel["regions"]),
+        tuple(sel["councils"]),
+        (str(sel["start_date"].date()), str(sel["end_date"].date())),
+    )
+
+
+def pandas_pass(df: pd.DataFrame, sel: dict) -> None:
+    """Every aggregation on the dashboard tab, over the filtered frame."""
+    filtered = queries.filter_samples(df, **sel)
+    for fn in (
+        queries.total_beaches,
+        queries.most_polluted_beach,
+        queries.cleanest_beach,
+        queries.high_enterococci_sites,
+        queries.water_quality_by_season,
+        queries.yearly_trends,
+        region_month,
+        SiteClusters.from_samples,
+    ):
+        fn(filtered)
+    binned_scatter(filtered, "water_temperature")
+
+
+def duckdb_pass(dashboard: sql.DashboardSQL, selection: sql.Selection, query: str = "") -> None:
+    """Every aggregation on the dashboard tab, from DuckDB's rollup and binned scatter."""
+    rollup = dashboard.rollup(selection, query=query)
+    for fn in (
+        sql.total_beaches,
+        sql.most_polluted_beach,
+        sql.cleanest_beach,
+        sql.high_enterococci_sites,
+        sql.water_quality_by_season,
+        sql.yearly_trends,
+        sql.region_month,
+        sql.sites,
+    ):
+        fn(rollup)
+    dashboard.binned_scatter(selection, "water_temperature", query=query)
+
+
+def run(path: Path, repeat: int) -> dict:
+    results: dict = {"rows": None, "load": timeit(lambda: load_dataset(path), repeat=repeat)}
+
+    loaded = load_dataset(path)
+    results["compact"] = timeit(lambda frame=loaded: compact(frame), repeat=repeat)
+    # The app keeps the compact form; both sizes are recorded
+    df = compact(loaded)
+    results["rows"] = len(df)
+    results["memory_mb_loaded"] = round(loaded.memory_usage(deep=True).sum() / 1e6, 1)
+    results["memory_mb"] = round(df.memory_usage(deep=True).sum() / 1e6, 1)
+    del loaded
+
+    sel = selection(df)
+    results["filter"] = timeit(lambda: queries.filter_samples(df, **sel), repeat=repeat)
+    filtered = queries.filter_samples(df, **sel)
+    results["filtered_rows"] = len(filtered)
+
+    for name, fn in {
+        "total_beaches": queries.total_beaches,
+        "most_polluted_beach": queries.most_polluted_beach,
+        "cleanest_beach": queries.cleanest_beach,
+        "high_enterococci_sites": queries.high_enterococci_sites,
+        "water_quality_by_season": queries.water_quality_by_season,
+        "yearly_trends": queries.yearly_trends,
+        "beach_markers": queries.beach_markers,
+    }.items():
+        results[name] = timeit(lambda fn=fn: fn(filtered), repeat=repeat)
+
+    # Beach map: per-site aggregation, clustering per zoom (uncached), viewport query
+    results["site_clusters"] = timeit(lambda: SiteClusters.from_samples(filtered), repeat=repeat)
+    clusters = SiteClusters.from_samples(filtered)
+    results["clusters_per_zoom"] = timeit(
+        lambda: [SiteClusters(clusters.sites).clusters(z) for z in range(6, 16)], repeat=repeat
+    )
+    results["clusters_in_view"] = timeit(
+        lambda: clusters.in_view(10, ((-34.2, 150.8), (-33.6, 151.4))), repeat=repeat
+    )
+
+    # Binned charts, over the selection
+    results["binned_scatter"] = timeit(lambda: binned_scatter(filtered, "water_temperature"), repeat=repeat)
+    results["region_month"] = timeit(lambda: region_month(filtered), repeat=repeat)
+
+    # Correlation explorer, over the selection
+    for by in (None, "season", "beach"):
+        results[f"correlations_{by or 'all'}"] = timeit(
+            lambda by=by: correlations(filtered, by), repeat=repeat
+        )
+
+    # Compliance grades: full build, appending the last month, and the grades
+    cutoff = df["date"].max() - pd.Timedelta(days=30)
+    history, latest = df[df["date"] <= cutoff], df[df["date"] > cutoff]
+    results["compliance_build"] = timeit(lambda: ComplianceEngine.from_frame(df), repeat=repeat)
+    base = ComplianceEngine.from_frame(history)
+    # A shallow copy shares the (immutable) windows, which `append` replaces
+    results["compliance_append"] = timeit(lambda: copy.copy(base).append(latest), repeat=repeat)
+    engine = ComplianceEngine.from_frame(df)
+    results["compliance_grades"] = timeit(engine.current, repeat=repeat)
+
+    source = DataFrameSource(df, "df")
+    results["datasource_get_schema"] = timeit(
+        lambda: source.get_schema(categorical_threshold=10), repeat=repeat
+    )
+    region = sel["regions"][0].replace("'", "''")
+    for name, query in {
+        "datasource_filter_query": f"SELECT * FROM df WHERE region = '{region}' AND precipitation_mm > 10",
+        "datasource_aggregate_query": "SELECT beach, AVG(enterococci) AS mean FROM df GROUP BY beach ORDER BY mean DESC LIMIT 10",
+    }.items():
+        results[name] = timeit(lambda query=query: source.execute_query(query), repeat=repeat)
+
+    # The chat's summary tables: building them (once per data version), and a
+    # typical chat question answered from the samples and from a summary
+    results["datasource_summary_build"] = timeit(
+        lambda: DataFrameSource(df, "df", summary_tables=sql.chat_summary_tables("df")), repeat=repeat
+    )
+    summarized = DataFrameSource(df, "df", summary_tables=sql.chat_summary_tables("df"))
+    for name, query in {
+        "chat_worst_months_samples": "SELECT month(date) AS month, AVG(enterococci) AS mean FROM df "
+        "GROUP BY ALL ORDER BY mean DESC",
+        "chat_worst_months_summary": "SELECT month, SUM(mean_enterococci * samples) / SUM(samples) AS mean "
+        "FROM beach_month_stats GROUP BY ALL ORDER BY mean DESC",
+        "chat_council_ranking_samples": "SELECT council, AVG(enterococci) AS mean FROM df "
+        "GROUP BY ALL ORDER BY mean DESC",
+        "chat_council_ranking_summary": "SELECT council, mean_enterococci FROM council_stats "
+        "ORDER BY mean_enterococci DESC",
+    }.items():
+        results[name] = timeit(lambda query=query: summarized.execute_query(query), repeat=repeat)
+
+    # The chat's data grid: all rows, sorted and filtered in pandas, against one
+    # page sorted and filtered by DuckDB
+    results["chat_grid_all_rows"] = timeit(
+        lambda: source.execute_query("SELECT * FROM df")
+        .query("beach.str.contains('beach', case=False)", engine="python")
+        .sort_values("enterococci", ascending=False),
+        repeat=repeat,
+    )
+    results["chat_grid_page"] = timeit(
+        lambda: source.get_page(
+            sort=[("enterococci", True)], filters=[("beach", "beach")], offset=1000, limit=100
+        ),
+        repeat=repeat,
+    )
+
+    # Consumers of the chat's result that need a count or a few rows: the
+    # result materialized, against its lazy relation (`QueryChat.lazy()`)
+    chat_query = "SELECT * FROM df WHERE enterococci IS NOT NULL"
+    results["chat_count_materialized"] = timeit(lambda: len(source.execute_query(chat_query)), repeat=repeat)
+    results["chat_count_lazy"] = timeit(
+        lambda: source.get_relation(chat_query).select(nw.len()).collect().item(), repeat=repeat
+    )
+    results["chat_head_materialized"] = timeit(lambda: source.execute_query(chat_query).head(5), repeat=repeat)
+    results["chat_head_lazy"] = timeit(
+        lambda: source.get_relation(chat_query).head(5).collect("pandas"), repeat=repeat
+    )
+
+    # The dashboard's aggregations in DuckDB (WQ_QUERY_ENGINE=duckdb), on the
+    # chat's source; the selected rows themselves are still needed for the
+    # correlations, forecast table and download
+    dashboard = sql.DashboardSQL(source, "df")
+    key = sql_selection(sel)
+    results["sql_filter"] = timeit(lambda: dashboard.filter_samples(key), repeat=repeat)
+    results["sql_rollup"] = timeit(lambda: dashboard.rollup(key), repeat=repeat)
+    rollup = dashboard.rollup(key)
+    results["sql_rollup_rows"] = len(rollup)
+    results["sql_reduce_rollup"] = timeit(
+        lambda: [
+            fn(rollup)
+            for fn in (
+                sql.total_beaches,
+                sql.most_polluted_beach,
+                sql.cleanest_beach,
+                sql.high_enterococci_sites,
+                sql.water_quality_by_season,
+                sql.yearly_trends,
+                sql.region_month,
+                sql.sites,
+            )
+        ],
+        repeat=repeat,
+    )
+    results["sql_binned_scatter"] = timeit(
+        lambda: dashboard.binned_scatter(key, "water_temperature"), repeat=repeat
+    )
+    results["dashboard_pandas"] = timeit(lambda: pandas_pass(df, sel), repeat=repeat)
+    results["dashboard_duckdb"] = timeit(lambda: duckdb_pass(dashboard, key), repeat=repeat)
+
+    # The dashboard under a chat filter, narrow and broad: the chat's result
+    # materialized and aggregated in pandas, against the chat's query as a
+    # subquery of DuckDB's
+    for name, chat_query in {
+        "narrow": "SELECT * FROM df WHERE precipitation_mm > 5 ORDER BY date",
+        "broad": "SELECT * FROM df WHERE enterococci IS NOT NULL",
+    }.items():
+        results[f"chat_dashboard_{name}_materialized"] = timeit(
+            lambda chat_query=chat_query: pandas_pass(source.execute_query(chat_query), sel), repeat=repeat
+        )
+        results[f"chat_dashboard_{name}_pushdown"] = timeit(
+            lambda chat_query=chat_query: duckdb_pass(dashboard, key, chat_query), repeat=repeat
+        )
+
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="*",
+        default=["1m"],
+        choices=list(synthetic.SIZES),
+        help="Synthetic dataset sizes to benchmark (default: 1m)",
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        action="append",
+        default=[],
+        help="Benchmark an existing dataset file as well (repeatable)",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    targets = {path.stem: path for path in args.data}
+    targets.update({size: dataset_path(size) for size in args.sizes})
+
+    results = {}
+    for label, path in targets.items():
+        print(f"Benchmarking {label} ({path}) ...")
+        results[label] = run(path, args.repeat)
+        for name, value in results[label].items():
+            if isinstance(value, dict):
+                print(f"  {name:<28} {value['median_ms']:>10.1f} ms")
+
+    print(f"Results written to {save_results('dashboard', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
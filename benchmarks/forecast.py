@@ -0,0 +1,71 @@
+"""
+Benchmark of enterococci forecast training and batched inference.
+
+Trains the forecast model on synthetic data and times scoring every site for
+the coming days at increasing site counts, both uncached and from the
+per-data-version forecast cache.
+
+Usage:
+
+    python -m benchmarks.forecast --sites 1000 5000 10000 --days 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from water_quality import forecast, synthetic
+from water_quality.versioning import DataVersion
+
+from ._common import save_results, timeit
+
+
+def run(n_sites: int, days: int, repeat: int, forecaster: forecast.Forecaster) -> dict:
+    # ~50 samples per site: enough history for each site's recent conductivity
+    df = synthetic.generate(n_sites * 50, n_sites=n_sites)
+    version = DataVersion.from_frame(f"synthetic-{n_sites}", df)
+    results: dict = {"sites": df["beach"].nunique(), "days": days}
+    results["site_features"] = timeit(lambda: forecast.site_features(df), repeat=repeat)
+    results["forecast"] = timeit(lambda: forecast.forecast(forecaster, df, days=days), repeat=repeat)
+
+    # The model call alone, on a feature matrix of the same size
+    X = np.tile(forecast.features(df.head(1)), (results["sites"] * days, 1))
+    results["predict_only"] = timeit(lambda: forecaster.predict(X), repeat=repeat)
+    forecast.cached_forecast(version, forecaster, days)
+    results["cached_forecast"] = timeit(
+        lambda: forecast.cached_forecast(version, forecaster, days), repeat=repeat
+    )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sites", type=int, nargs="*", default=[1000, 5000, 10000])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--train-rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    forecaster = forecast.train(synthetic.generate(args.train_rows), max_rows=None)
+    results: dict = {"train_rows": args.train_rows, "train_s": round(time.perf_counter() - start, 2)}
+    print(f"Trained on {args.train_rows:,} synthetic rows in {results['train_s']:.1f}s")
+
+    for n_sites in args.sites:
+        print(f"Forecasting {n_sites:,} sites x {args.days} days ...")
+        results[str(n_sites)] = run(n_sites, args.days, args.repeat, forecaster)
+        for name, value in results[str(n_sites)].items():
+            if isinstance(value, dict):
+                print(f"  {name:<16} {value['median_ms']:>10.1f} ms")
+
+    print(f"Results written to {save_results('forecast', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,396 @@
+"""
+Headless multi-session load test of the Shiny dashboard.
+
+Starts `app.py` locally as one or more uvicorn workers (each on its own port,
+as behind a sticky-session load balancer) and drives simulated browser
+sessions over the Shiny websocket protocol. Each session repeatedly changes
+the date range, regions and councils, downloads the filtered data and asks
+the Query Chat a question, answered by a stub LLM (`benchmarks.stub_llm`).
+
+The number of concurrent sessions is ramped up stage by stage. For each stage
+the harness reports p50/p95/p99 latency per action, plus CPU and RSS per
+worker, and it reports the first session count at which the p95 update
+latency breaks the SLO.
+
+Requires `websockets` and `psutil` (see `benchmarks/requirements.txt`).
+
+Usage:
+
+    python -m benchmarks.loadtest --workers 2 --sessions 1 2 4 8 16 --duration 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+import urllib.request
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import psutil
+import websockets
+
+from water_quality import queries
+from water_quality.data import load_dataset
+
+from . import stub_llm
+from ._common import percentiles, save_results, workers
+
+# Outputs of each tab, so sessions report visibility the way a browser does
+DASHBOARD_OUTPUTS = [
+    "total_beaches_box",
+    "most_polluted_beach_box",
+    "cleanest_beach_box",
+    "high_enterococci_chart",
+    "water_quality_by_season_chart",
+    "temperature_vs_enterococci_chart",
+    "region_month_heatmap",
+    "water_quality_over_years_chart",
+    "correlation_df",
+    "forecast_df",
+    "beach_map",
+    "download_data",
+]
+FAQ_OUTPUTS = [
+    "faq_high_risk_chart",
+    "faq_high_risk_df",
+    "faq_seasonal_variation_chart",
+    "faq_seasonal_variation_df",
+    "faq_high_risk_map",
+]
+COMPLIANCE_OUTPUTS = ["compliance_df"]
+CHAT_OUTPUTS = ["chat_filtered_df", "chat_page_info"]
+
+DASHBOARD_TAB = "Sydney Beach Water Quality Dashboard"
+CHAT_TAB = "Query Chat"
+
+CHAT_QUESTIONS = [
+    "Which beaches have the worst average enterococci?",
+    "How does rainfall relate to bacteria levels?",
+    "Which council has the cleanest beaches?",
+]
+
+# Seconds to wait for the server to settle before counting a request as failed
+TIMEOUT = 60
+
+
+def _visibility(tab: str) -> dict:
+    """`.clientdata_output_*_hidden` values for the outputs when `tab` is shown."""
+    visible = DASHBOARD_OUTPUTS if tab == DASHBOARD_TAB else CHAT_OUTPUTS
+    return {
+        f".clientdata_output_{name}_hidden": name not in visible
+        for name in DASHBOARD_OUTPUTS + COMPLIANCE_OUTPUTS + FAQ_OUTPUTS + CHAT_OUTPUTS
+    }
+
+
+def client_data(port: int) -> dict:
+    """The `.clientdata_url_*` values a browser sends for the app at `port`."""
+    return {
+        ".clientdata_url_search": "",
+        ".clientdata_url_protocol": "http:",
+        ".clientdata_url_hostname": "127.0.0.1",
+        ".clientdata_url_port": str(port),
+        ".clientdata_url_pathname": "/",
+    }
+
+
+@dataclass
+class Workload:
+    """The choices a simulated user picks from, derived from the served dataset."""
+
+    regions: list[str]
+    councils: dict[str, list[str]]
+    min_date: str
+    max_date: str
+
+    @classmethod
+    def from_dataset(cls, path: Optional[Path]) -> "Workload":
+        df = load_dataset(path)
+        regions = sorted(df["region"].unique())
+        return cls(
+            regions=regions,
+            councils={r: queries.councils_in_regions(df, [r]) for r in regions},
+            min_date=df["date"].min().strftime("%Y-%m-%d"),
+            max_date=df["date"].max().strftime("%Y-%m-%d"),
+        )
+
+    def random_filters(self, rng: random.Random) -> dict:
+        regions = rng.sample(self.regions, rng.randint(1, len(self.regions)))
+        councils = [c for r in regions for c in self.councils[r]]
+        councils = rng.sample(councils, rng.randint(1, len(councils)))
+        start, end = sorted(
+            rng.choice([self.min_date, self.max_date, self._random_date(rng)])
+            for _ in range(2)
+        )
+        return {
+            "regions": regions,
+            "councils": councils,
+            "daterange:shiny.date": [start, end],
+        }
+
+    def _random_date(self, rng: random.Random) -> str:
+        year_lo, year_hi = int(self.min_date[:4]), int(self.max_date[:4])
+        return f"{rng.randint(year_lo, year_hi)}-{rng.randint(1, 12):02d}-01"
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, action: str, seconds: float) -> None:
+        self.latencies[action].append(seconds * 1000)
+
+    def summary(self) -> dict:
+        return {
+            action: {"count": len(samples), **percentiles(samples)}
+            for action, samples in self.latencies.items()
+        } | {"errors": dict(self.errors)}
+
+
+class Progress:
+    """
+    Whether a session has settled: the server is idle and no output is left
+    in progress. Outputs waiting on a background computation
+    (`reactivity.background`) are still in progress when the server goes
+    idle; they settle when their values arrive.
+    """
+
+    def __init__(self) -> None:
+        self.busy = False
+        self.pending: set[str] = set()
+
+    def feed(self, message: dict) -> bool:
+        """Track a message from the server; True if the session has just settled."""
+        binding = message.get("progress", {})
+        if binding.get("type") == "binding":
+            if binding["message"].get("persistent"):
+                self.pending.add(binding["message"]["id"])
+            else:
+                self.pending.discard(binding["message"]["id"])
+        settling = bool(self.pending) and not self.busy
+        for name in (*message.get("values", {}), *message.get("errors", {})):
+            self.pending.discard(name)
+        if "busy" in message:
+            self.busy = message["busy"] == "busy"
+            settling = not self.busy
+        return settling and not self.pending
+
+
+class Session:
+    """One simulated browser session against a worker."""
+
+    def __init__(self, port: int, workload: Workload, stats: Stats, seed: int):
+        self.port = port
+        self.workload = workload
+        self.stats = stats
+        self.rng = random.Random(seed)
+        self.session_id: Optional[str] = None
+        self._idle = asyncio.Event()
+        self._chat_done = asyncio.Event()
+        self._progress = Progress()
+
+    async def _reader(self, ws) -> None:
+        async for raw in ws:
+            message = json.loads(raw)
+            if "config" in message:
+                self.session_id = message["config"]["sessionId"]
+            if self._progress.feed(message):
+                self._idle.set()
+            custom = message.get("custom", {}).get("shinyChatMessage")
+            if custom and custom.get("action", {}).get("type") in ("chunk_end", "greeting_end"):
+                self._chat_done.set()
+
+    async def _send(self, ws, method: str, data: dict, done: asyncio.Event) -> float:
+        done.clear()
+        start = time.perf_counter()
+        await ws.send(json.dumps({"method": method, "data": data}))
+        await asyncio.wait_for(done.wait(), TIMEOUT)
+        return time.perf_counter() - start
+
+    async def _timed(self, action: str, coro) -> None:
+        try:
+            self.stats.record(action, await coro)
+        except (asyncio.TimeoutError, OSError, websockets.WebSocketException):
+            self.stats.errors[action] += 1
+
+    async def _download(self) -> float:
+        url = (
+            f"http://127.0.0.1:{self.port}/session/{self.session_id}"
+            "/download/download_data?w="
+        )
+        start = time.perf_counter()
+        await asyncio.to_thread(lambda: urllib.request.urlopen(url, timeout=TIMEOUT).read())
+        return time.perf_counter() - start
+
+    async def run(self, until: float) -> None:
+        async with websockets.connect(
+            f"ws://127.0.0.1:{self.port}/websocket/", max_size=None
+        ) as ws:
+            reader = asyncio.create_task(self._reader(ws))
+            try:
+                init = {
+                    **self.workload.random_filters(self.rng),
+                    "reset:shiny.action": 0,
+                    "correlation_by": "all",
+                    "chat_filter": False,
+                    "page": DASHBOARD_TAB,
+                    **client_data(self.port),
+                    **_visibility(DASHBOARD_TAB),
+                }
+                await self._timed("init", self._send(ws, "init", init, self._idle))
+
+                while time.perf_counter() < until:
+                    roll = self.rng.random()
+                    if roll < 0.8:
+                        await self._timed(
+                            "update",
+                            self._send(
+                                ws, "update", self.workload.random_filters(self.rng), self._idle
+                            ),
+                        )
+                    elif roll < 0.9:
+                        await self._timed("download", self._download())
+                    else:
+                        await self._send(
+                            ws, "update", {"page": CHAT_TAB, **_visibility(CHAT_TAB)}, self._idle
+                        )
+                        question = {
+                            "chat-chat_user_input:shinychat.userInput": self.rng.choice(
+                                CHAT_QUESTIONS
+                            )
+                        }
+                        await self._timed(
+                            "chat", self._send(ws, "update", question, self._chat_done)
+                        )
+                        await self._send(
+                            ws,
+                            "update",
+                            {"page": DASHBOARD_TAB, **_visibility(DASHBOARD_TAB)},
+                            self._idle,
+                        )
+                    # Think time between interactions
+                    await asyncio.sleep(self.rng.uniform(0.2, 1.0))
+            finally:
+                reader.cancel()
+
+
+async def _monitor(procs: list[subprocess.Popen], interval: float, out: dict) -> None:
+    """Sample CPU and RSS of each worker until cancelled."""
+    handles = [psutil.Process(p.pid) for p in procs]
+    for handle in handles:
+        handle.cpu_percent(None)
+    samples: dict[int, dict[str, list[float]]] = {
+        p.pid: {"cpu": [], "rss": []} for p in procs
+    }
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            for handle in handles:
+                samples[handle.pid]["cpu"].append(handle.cpu_percent(None))
+                samples[handle.pid]["rss"].append(handle.memory_info().rss / 2**20)
+    finally:
+        for pid, s in samples.items():
+            out[str(pid)] = {
+                "cpu_percent_mean": round(sum(s["cpu"]) / len(s["cpu"]), 1) if s["cpu"] else None,
+                "cpu_percent_max": max(s["cpu"], default=None),
+                "rss_mb_max": round(max(s["rss"], default=0), 1),
+            }
+
+
+async def run_stage(
+    n_sessions: int,
+    ports: list[int],
+    procs: list[subprocess.Popen],
+    workload: Workload,
+    duration: float,
+) -> dict:
+    stats = Stats()
+    resources: dict = {}
+    monitor = asyncio.create_task(_monitor(procs, 0.5, resources))
+    until = time.perf_counter() + duration
+    sessions = [
+        Session(ports[i % len(ports)], workload, stats, seed=i) for i in range(n_sessions)
+    ]
+    results = await asyncio.gather(*(s.run(until) for s in sessions), return_exceptions=True)
+    monitor.cancel()
+    await asyncio.gather(monitor, return_exceptions=True)
+
+    summary = stats.summary()
+    failures = [repr(r) for r in results if isinstance(r, BaseException)]
+    summary["failed_sessions"] = len(failures)
+    summary["failures"] = sorted(set(failures))
+    summary["workers"] = resources
+    return summary
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=1, help="Number of app workers")
+    parser.add_argument(
+        "--sessions",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32],
+        help="Concurrent session counts to ramp through",
+    )
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per stage")
+    parser.add_argument(
+        "--slo-ms", type=float, default=1000, help="p95 update latency SLO in milliseconds"
+    )
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM seconds per response")
+    parser.add_argument("--port", type=int, default=8100, help="Port of the first worker")
+    parser.add_argument("--data", type=Path, default=None, help="Dataset for the app to serve")
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    llm = stub_llm.serve(0, args.llm_latency)
+    env = {
+        # Sessions wait for the server to go idle after each update, which a
+        # debounced update does before rendering
+        "WQ_DEBOUNCE_MS": "0",
+        **os.environ,
+        "ANTHROPIC_API_KEY": "stub",
+        "ANTHROPIC_BASE_URL": f"http://127.0.0.1:{llm.server_port}",
+    }
+    if args.data:
+        env["WQ_DATA_PATH"] = str(args.data.resolve())
+
+    workload = Workload.from_dataset(args.data)
+    ports = [args.port + i for i in range(args.workers)]
+    stages = {}
+    slo_broken_at = None
+    with workers(args.workers, args.port, env) as procs:
+        for n_sessions in args.sessions:
+            print(f"Running {n_sessions} sessions for {args.duration:.0f}s ...")
+            stage = asyncio.run(run_stage(n_sessions, ports, procs, workload, args.duration))
+            stages[n_sessions] = stage
+            update_p95 = stage.get("update", {}).get("p95")
+            print(f"  update p95 {update_p95} ms, errors {stage['errors']}")
+            if slo_broken_at is None and (update_p95 is None or update_p95 > args.slo_ms):
+                slo_broken_at = n_sessions
+    llm.shutdown()
+
+    results = {
+        "workers": args.workers,
+        "duration_s": args.duration,
+        "slo_ms": args.slo_ms,
+        "slo_broken_at_sessions": slo_broken_at,
+        "stages": stages,
+    }
+    print(
+        f"p95 update latency SLO of {args.slo_ms:.0f} ms "
+        + (f"breaks at {slo_broken_at} sessions" if slo_broken_at else "held at every stage")
+    )
+    print(f"Results written to {save_results('loadtest', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
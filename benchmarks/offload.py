@@ -0,0 +1,204 @@
+"""
+Tail latency under concurrent sessions, with and without offloading.
+
+Starts `app.py` as one uvicorn worker per `WQ_OFFLOAD` mode (`off`, `thread`,
+`process`; see `water_quality.offload`) and drives the same load against
+each: dashboard sessions that keep changing the selection and wait for
+every output to settle, plus one probe session on the FAQ tab that sends an
+input nothing depends on every `--probe-ms` and times the server's answer.
+The probe measures how long the worker's event loop is unavailable to a
+session with nothing to compute; it is the latency offloading is meant to
+cut, while the dashboard sessions' own updates show what it costs them.
+
+For each mode the harness reports p50/p95/p99 of both. With `--check` it
+exits non-zero if a session fails, or if the probe's p95 with offloading is
+not below its p95 without.
+
+The pandas engine (`WQ_QUERY_ENGINE=pandas`) is the default here: its
+groupbys are the work that holds the loop the longest.
+
+Usage:
+
+    python -m benchmarks.offload --sessions 4 --duration 30 --check
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import websockets
+
+from ._common import save_results, workers
+from .loadtest import (
+    DASHBOARD_TAB,
+    TIMEOUT,
+    Progress,
+    Stats,
+    Workload,
+    _visibility,
+    client_data,
+)
+
+MODES = ["off", "thread", "process"]
+FAQ_TAB = "FAQ"
+
+
+async def dashboard_session(port: int, workload: Workload, stats: Stats, seed: int, until: float) -> None:
+    """Change the selection, wait for the dashboard to settle, repeat."""
+    rng = random.Random(seed)
+    progress = Progress()
+    async with websockets.connect(f"ws://127.0.0.1:{port}/websocket/", max_size=None) as ws:
+        await ws.recv()
+
+        async def send(method: str, data: dict) -> float:
+            start = time.perf_counter()
+            await ws.send(json.dumps({"method": method, "data": data}))
+            while not progress.feed(json.loads(await asyncio.wait_for(ws.recv(), TIMEOUT))):
+                pass
+            return time.perf_counter() - start
+
+        init = {
+            **workload.random_filters(rng),
+            "reset:shiny.action": 0,
+            "correlation_by": "all",
+            "page": DASHBOARD_TAB,
+            **client_data(port),
+            **_visibility(DASHBOARD_TAB),
+        }
+        stats.record("init", await send("init", init))
+        while time.perf_counter() < until:
+            try:
+                stats.record("update", await send("update", workload.random_filters(rng)))
+            except asyncio.TimeoutError:
+                stats.errors["update"] += 1
+                return
+            await asyncio.sleep(rng.uniform(0.1, 0.5))
+
+
+async def probe_session(port: int, workload: Workload, stats: Stats, interval: float, until: float) -> None:
+    """Time the server's answer to an input no output depends on."""
+    async with websockets.connect(f"ws://127.0.0.1:{port}/websocket/", max_size=None) as ws:
+        await ws.recv()
+        init = {
+            "daterange:shiny.date": [workload.min_date, workload.max_date],
+            "regions": [],
+            "councils": [],
+            "reset:shiny.action": 0,
+            "correlation_by": "all",
+            "page": FAQ_TAB,
+            **client_data(port),
+            **_visibility(FAQ_TAB),
+        }
+        await ws.send(json.dumps({"method": "init", "data": init}))
+        probe = 0
+        while time.perf_counter() < until:
+            await asyncio.sleep(interval)
+            # Drain whatever the server sent since: the data poll's busy/idle
+            while True:
+                try:
+                    await asyncio.wait_for(ws.recv(), 0.001)
+                except asyncio.TimeoutError:
+                    break
+            probe += 1
+            start = time.perf_counter()
+            await ws.send(json.dumps({"method": "update", "data": {"probe": probe}}))
+            # The server flushes after every input, even with nothing to render
+            while "values" not in json.loads(await asyncio.wait_for(ws.recv(), TIMEOUT)):
+                pass
+            stats.record("probe", time.perf_counter() - start)
+
+
+async def run_mode(port: int, workload: Workload, sessions: int, duration: float, probe_interval: float) -> dict:
+    stats = Stats()
+    until = time.perf_counter() + duration
+    results = await asyncio.gather(
+        probe_session(port, workload, stats, probe_interval, until),
+        *(dashboard_session(port, workload, stats, seed, until) for seed in range(sessions)),
+        return_exceptions=True,
+    )
+    summary = stats.summary()
+    failures = [repr(r) for r in results if isinstance(r, BaseException)]
+    summary["failed_sessions"] = len(failures)
+    summary["failures"] = sorted(set(failures))
+    return summary
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES, help="WQ_OFFLOAD modes to compare")
+    parser.add_argument("--sessions", type=int, default=4, help="Concurrent dashboard sessions")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds per mode")
+    parser.add_argument("--probe-ms", type=float, default=100, help="Milliseconds between probes")
+    parser.add_argument(
+        "--engine",
+        choices=["pandas", "duckdb"],
+        default="pandas",
+        help="WQ_QUERY_ENGINE of the workers",
+    )
+    parser.add_argument("--check", action="store_true", help="Fail if offloading doesn't cut probe latency")
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--data", type=Path, default=None, help="Dataset for the app to serve")
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    env = {
+        # Sessions wait for every output to settle, so render them at once
+        "WQ_DEBOUNCE_MS": "0",
+        **os.environ,
+        "WQ_QUERY_ENGINE": args.engine,
+        "WQ_QUERYCHAT_WARMUP": "0",
+        "WQ_FORECAST_WARMUP": "0",
+    }
+    if args.data:
+        env["WQ_DATA_PATH"] = str(args.data.resolve())
+    workload = Workload.from_dataset(args.data)
+
+    modes = {}
+    for i, mode in enumerate(args.modes):
+        print(f"Running {args.sessions} sessions for {args.duration:.0f}s with WQ_OFFLOAD={mode} ...")
+        with workers(1, args.port + i, {**env, "WQ_OFFLOAD": mode}):
+            modes[mode] = asyncio.run(
+                run_mode(args.port + i, workload, args.sessions, args.duration, args.probe_ms / 1000)
+            )
+
+    print(f"  {'mode':<8} {'action':<7} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for mode, summary in modes.items():
+        for action in ("probe", "update"):
+            row = summary.get(action, {"count": 0, "p50": None, "p95": None, "p99": None})
+            cells = [f"{row[p]:9.1f}" if row[p] is not None else f"{'-':>9}" for p in ("p50", "p95", "p99")]
+            print(f"  {mode:<8} {action:<7} {row['count']:>6} {' '.join(cells)}")
+    results = {
+        "sessions": args.sessions,
+        "duration_s": args.duration,
+        "probe_ms": args.probe_ms,
+        "engine": args.engine,
+        "modes": modes,
+    }
+    print(f"Results written to {save_results('offload', results, args.out)}")
+
+    if args.check:
+        failures = [
+            f"{mode}: {summary['failed_sessions']} sessions failed {summary['failures']}"
+            for mode, summary in modes.items()
+            if summary["failed_sessions"] or summary["errors"]
+        ]
+        baseline = modes.get("off", {}).get("probe", {}).get("p95")
+        for mode, summary in modes.items():
+            p95 = summary.get("probe", {}).get("p95")
+            if mode != "off" and baseline is not None and (p95 is None or p95 >= baseline):
+                failures.append(f"{mode}: probe p95 {p95} ms, not below {baseline} ms without offloading")
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
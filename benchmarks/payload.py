@@ -0,0 +1,142 @@
+"""
+Bytes the dashboard sends per render, per output.
+
+Starts `app.py` as a uvicorn worker, opens one session on the dashboard tab
+and applies a series of random filter changes. Everything the server sends
+is attributed to the output it belongs to: output values, and for widget
+outputs (the Plotly charts and the map) the widget messages of their model.
+Reports the median and maximum bytes per render of each output. With
+`--check` it doubles as a payload budget test: it exits non-zero if any chart
+render exceeds `--budget-kb`.
+
+Usage:
+
+    python -m benchmarks.payload --updates 20 --check
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+import websockets
+
+from water_quality import payload
+
+from ._common import save_results, workers
+from .loadtest import DASHBOARD_TAB, TIMEOUT, Workload, _visibility, client_data
+
+WIDGET_MESSAGES = ("shinywidgets_comm_open", "shinywidgets_comm_msg", "shinywidgets_comm_close")
+
+
+async def measure(port: int, workload: Workload, updates: int, seed: int) -> dict[str, list[int]]:
+    """Bytes of each output's renders over the initial render and `updates` filter changes."""
+    rng = random.Random(seed)
+    renders: dict[str, list[int]] = defaultdict(list)
+    async with websockets.connect(f"ws://127.0.0.1:{port}/websocket/", max_size=None) as ws:
+        await ws.recv()
+
+        async def round_trip(method: str, data: dict) -> None:
+            await ws.send(json.dumps({"method": method, "data": data}))
+            by_model: dict[str, int] = defaultdict(int)
+            models: dict[str, str] = {}
+            sizes: dict[str, int] = defaultdict(int)
+            while True:
+                message = json.loads(await asyncio.wait_for(ws.recv(), TIMEOUT))
+                for kind, text in message.get("custom", {}).items():
+                    if kind in WIDGET_MESSAGES:
+                        comm = json.loads(text)
+                        comm_id = comm.get("content", {}).get("comm_id") or comm.get("comm_id")
+                        by_model[comm_id] += len(text.encode())
+                for name, value in message.get("values", {}).items():
+                    sizes[name] += len(json.dumps(value).encode())
+                    if isinstance(value, dict) and "model_id" in value:
+                        models[value["model_id"]] = name
+                if message.get("busy") == "idle":
+                    break
+            for model, name in models.items():
+                sizes[name] += by_model.get(model, 0)
+            for name, size in sizes.items():
+                renders[name].append(size)
+
+        init = {
+            **workload.random_filters(rng),
+            "reset:shiny.action": 0,
+            "correlation_by": "all",
+            "page": DASHBOARD_TAB,
+            **client_data(port),
+            **_visibility(DASHBOARD_TAB),
+        }
+        await round_trip("init", init)
+        for _ in range(updates):
+            await round_trip("update", workload.random_filters(rng))
+    return renders
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=20, help="Random filter changes")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="Fail if a chart is over budget")
+    parser.add_argument(
+        "--budget-kb",
+        type=float,
+        default=payload.BUDGET_BYTES / 1024,
+        help="Bytes per chart render, in kB (default: $WQ_PAYLOAD_BUDGET_KB or 64)",
+    )
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--data", type=Path, default=None, help="Dataset for the app to serve")
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    # Updates are sent one at a time and counted until the server goes idle,
+    # which a debounced update does before rendering
+    env = {"WQ_DEBOUNCE_MS": "0", **os.environ, "WQ_QUERYCHAT_WARMUP": "0", "WQ_FORECAST_WARMUP": "0"}
+    if args.data:
+        env["WQ_DATA_PATH"] = str(args.data.resolve())
+    workload = Workload.from_dataset(args.data)
+    with workers(1, args.port, env):
+        renders = asyncio.run(measure(args.port, workload, args.updates, args.seed))
+
+    outputs = {
+        name: {
+            "renders": len(sizes),
+            "median_bytes": round(statistics.median(sizes)),
+            "max_bytes": max(sizes),
+        }
+        for name, sizes in sorted(renders.items())
+    }
+    results = {"updates": args.updates, "budget_kb": args.budget_kb, "outputs": outputs}
+    for name, stats in outputs.items():
+        print(
+            f"  {name:<34} {stats['renders']:>3} renders  "
+            f"median {stats['median_bytes'] / 1024:>8.1f} kB  max {stats['max_bytes'] / 1024:>8.1f} kB"
+        )
+    print(f"Results written to {save_results('payload', results, args.out)}")
+
+    if args.check:
+        # Only charts have a budget; tables grow with the selection by design
+        over = [
+            name
+            for name, stats in outputs.items()
+            if name.endswith(("_chart", "_heatmap")) and stats["max_bytes"] > args.budget_kb * 1024
+        ]
+        for name in over:
+            print(
+                f"FAIL: {name} sent {outputs[name]['max_bytes'] / 1024:.1f} kB, "
+                f"over the {args.budget_kb:.0f} kB budget",
+                file=sys.stderr,
+            )
+        sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+The query chat's data in place, against a persisted native DuckDB table.
+
+`DataFrameSource` either registers the frame on an in-memory connection,
+where every query scans it through DuckDB's pandas scan and every worker
+builds the summary tables again at startup, or (`WQ_QUERY_DATABASE`) copies
+it into a native table sorted by date, persisted per data version, that
+later workers open read-only. For each dataset this times:
+
+- startup: building the registered source (`registered_startup`), building
+  the database file the first time (`native_cold_startup`), and opening it
+  as a restarted worker does (`native_warm_startup`);
+- queries, both ways: the dashboard's rollup and selected samples over the
+  last year and over five years (date ranges, which the sorted table's zone
+  maps can prune), and typical chat questions over all of it.
+
+With `--check` it exits non-zero if the two ways' results differ, or if a
+warm restart doesn't start faster than building the registered source.
+
+Usage:
+
+    python -m benchmarks.query_store --sizes 1m 10m --check
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from querychat.datasource import DataFrameSource
+from water_quality import sql, synthetic
+from water_quality.data import compact, load_dataset
+
+from ._common import save_results, timeit
+from .dashboard import dataset_path, selection, sql_selection
+
+CHAT_QUERIES = {
+    "chat_worst_months": "SELECT month(date) AS month, AVG(enterococci) AS mean FROM df "
+    "GROUP BY ALL ORDER BY mean DESC",
+    "chat_last_summer": "SELECT beach, COUNT(*) AS samples, AVG(enterococci) AS mean FROM df "
+    "WHERE date >= (SELECT max(date) FROM df) - INTERVAL 90 DAY GROUP BY ALL ORDER BY mean DESC",
+    "chat_wet_days": "SELECT * FROM df WHERE precipitation_mm > 20",
+}
+
+
+def sources(df: pd.DataFrame, database: Path) -> dict[str, DataFrameSource]:
+    """The registered source, and the native one on `database` (built if needed)."""
+    summaries = sql.chat_summary_tables("df")
+    return {
+        "registered": DataFrameSource(df, "df", summary_tables=summaries),
+        "native": DataFrameSource(
+            df, "df", summary_tables=summaries, database=database, version="bench", order_by="date"
+        ),
+    }
+
+
+def run(path: Path, repeat: int) -> tuple[dict, list[str]]:
+    df = compact(load_dataset(path))
+    results: dict = {"rows": len(df)}
+    failures: list[str] = []
+    summaries = sql.chat_summary_tables("df")
+    directory = Path(tempfile.mkdtemp(prefix="query_store-"))
+    database = directory / "samples.duckdb"
+
+    def cold() -> None:
+        for file in directory.iterdir():
+            file.unlink()
+        DataFrameSource(df, "df", summary_tables=summaries, database=database, version="bench", order_by="date")
+
+    try:
+        results["registered_startup"] = timeit(
+            lambda: DataFrameSource(df, "df", summary_tables=summaries), repeat=repeat
+        )
+        results["native_cold_startup"] = timeit(cold, repeat=repeat)
+        results["native_warm_startup"] = timeit(
+            lambda: DataFrameSource(
+                df, "df", summary_tables=summaries, database=database, version="bench", order_by="date"
+            ),
+            repeat=repeat,
+        )
+        results["database_mb"] = round(database.with_name("samples-bench.duckdb").stat().st_size / 1e6, 1)
+
+        max_date = df["date"].max()
+        sel = selection(df)
+        selections = {
+            "last_year": sql_selection({**sel, "start_date": max_date - pd.DateOffset(years=1)}),
+            "five_years": sql_selection(sel),
+        }
+        outputs: dict[str, dict] = {}
+        for mode, source in sources(df, database).items():
+            dashboard = sql.DashboardSQL(source, "df")
+            outputs[mode] = {}
+            for name, key in selections.items():
+                results[f"{mode}_rollup_{name}"] = timeit(lambda key=key: dashboard.rollup(key), repeat=repeat)
+                results[f"{mode}_filter_{name}"] = timeit(
+                    lambda key=key: dashboard.filter_samples(key), repeat=repeat
+                )
+                outputs[mode][f"rollup_{name}"] = dashboard.rollup(key)
+                outputs[mode][f"filter_{name}"] = dashboard.filter_samples(key)
+            for name, query in CHAT_QUERIES.items():
+                results[f"{mode}_{name}"] = timeit(lambda query=query: source.execute_query(query), repeat=repeat)
+                outputs[mode][name] = source.execute_query(query)
+
+        # Row order differs (the native table is sorted by date), values must not
+        for name, expected in outputs["registered"].items():
+            actual = outputs["native"][name]
+            columns = list(expected.columns)
+            try:
+                pd.testing.assert_frame_equal(
+                    expected.sort_values(columns).reset_index(drop=True),
+                    actual.sort_values(columns).reset_index(drop=True),
+                    check_dtype=False,
+                    check_categorical=False,
+                )
+            except AssertionError as error:
+                failures.append(f"{path.stem} {name}: native result differs: {error}")
+        if results["native_warm_startup"]["median_ms"] >= results["registered_startup"]["median_ms"]:
+            failures.append(f"{path.stem}: warm restart is no faster than building the registered source")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return results, failures
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--sizes",
+        nargs="*",
+        default=["1m"],
+        choices=list(synthetic.SIZES),
+        help="Synthetic dataset sizes to benchmark (default: 1m)",
+    )
+    parser.add_argument(
+        "--data",
+        type=Path,
+        action="append",
+        default=[],
+        help="Benchmark an existing dataset file as well (repeatable)",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--check", action="store_true", help="Fail if results differ or warm starts aren't faster")
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    targets = {path.stem: path for path in args.data}
+    targets.update({size: dataset_path(size) for size in args.sizes})
+
+    results, failures = {}, []
+    for label, path in targets.items():
+        print(f"Benchmarking {label} ({path}) ...")
+        results[label], found = run(path, args.repeat)
+        failures += found
+        for name, value in results[label].items():
+            if isinstance(value, dict):
+                print(f"  {name:<32} {value['median_ms']:>10.1f} ms")
+
+    print(f"Results written to {save_results('query_store', results, args.out)}")
+
+    if args.check:
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
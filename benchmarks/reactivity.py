@@ -0,0 +1,223 @@
+"""
+Reactive executions the dashboard avoids by debouncing and visibility.
+
+Starts `app.py` as two uvicorn workers, one with filter debouncing off
+(`WQ_DEBOUNCE_MS=0`) and one with it on, and replays the same scripted
+session against them: bursts of councils ticked one after another a few
+tens of milliseconds apart, first on the dashboard tab and then on the FAQ
+tab with its first panel open. Every output render and every update of the
+map's markers is counted from what the server sends, in three modes:
+
+- `baseline`: no debouncing, and the session reports every output as
+  visible, so everything recomputes on every change
+- `visibility`: no debouncing, outputs on hidden tabs and closed panels
+  reported hidden as a browser would
+- `debounced`: visibility plus debouncing
+
+With `--check` it doubles as a test: it exits non-zero if, with both on,
+an output (or the map) updates while hidden, or a visible output renders
+more than once per burst.
+
+Usage:
+
+    python -m benchmarks.reactivity --bursts 5 --burst-size 5 --check
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+import websockets
+
+from water_quality import reactivity
+
+from ._common import save_results, workers
+from .loadtest import (
+    COMPLIANCE_OUTPUTS,
+    CHAT_OUTPUTS,
+    DASHBOARD_OUTPUTS,
+    DASHBOARD_TAB,
+    FAQ_OUTPUTS,
+    Progress,
+    Workload,
+    client_data,
+)
+
+FAQ_TAB = "FAQ"
+# Outputs of the FAQ panel the session opens
+FAQ_OPEN = ["faq_high_risk_chart", "faq_high_risk_df"]
+MAP_UPDATES = "beach_map (markers)"
+
+
+def _all_shown() -> dict:
+    return {
+        f".clientdata_output_{name}_hidden": False
+        for name in DASHBOARD_OUTPUTS + COMPLIANCE_OUTPUTS + FAQ_OUTPUTS + CHAT_OUTPUTS
+    }
+
+
+def _shown_outputs(tab: str) -> list[str]:
+    return DASHBOARD_OUTPUTS if tab == DASHBOARD_TAB else FAQ_OPEN
+
+
+def _tab_visibility(tab: str) -> dict:
+    return {
+        f".clientdata_output_{name}_hidden": name not in _shown_outputs(tab)
+        for name in DASHBOARD_OUTPUTS + COMPLIANCE_OUTPUTS + FAQ_OUTPUTS + CHAT_OUTPUTS
+    }
+
+
+def script(workload: Workload, bursts: int, burst_size: int, seed: int) -> list[list[dict]]:
+    """Bursts of council changes: each ticks councils of one region, one at a time."""
+    rng = random.Random(seed)
+    regions = [r for r in workload.regions if len(workload.councils[r]) > 1]
+    out = []
+    for _ in range(bursts):
+        region = rng.choice(regions)
+        councils = rng.sample(workload.councils[region], min(burst_size, len(workload.councils[region])))
+        out.append([{"regions": [region], "councils": councils[: i + 1]} for i in range(len(councils))])
+    return out
+
+
+async def replay(
+    port: int, workload: Workload, bursts: list[list[dict]], all_shown: bool, gap: float, quiet: float
+) -> dict[str, Counter]:
+    """Renders per output (and updates of the map's markers) on each tab over the script."""
+    counts = {DASHBOARD_TAB: Counter(), FAQ_TAB: Counter()}
+    progress = Progress()
+    tab = DASHBOARD_TAB
+    async with websockets.connect(f"ws://127.0.0.1:{port}/websocket/", max_size=None) as ws:
+        await ws.recv()
+
+        async def settle() -> None:
+            # Until the server has been silent for `quiet` seconds, with no
+            # output left waiting on a background computation
+            while True:
+                try:
+                    message = json.loads(await asyncio.wait_for(ws.recv(), quiet))
+                except asyncio.TimeoutError:
+                    if progress.busy or progress.pending:
+                        continue
+                    return
+                progress.feed(message)
+                for name in (*message.get("values", {}), *message.get("errors", {})):
+                    counts[tab][name] += 1
+                text = message.get("custom", {}).get("shinywidgets_comm_msg", "")
+                if '"method": "update", "state": {"layers"' in text:
+                    counts[tab][MAP_UPDATES] += 1
+
+        def shown(tab: str) -> dict:
+            return _all_shown() if all_shown else _tab_visibility(tab)
+
+        init = {
+            "daterange:shiny.date": [workload.min_date, workload.max_date],
+            "regions": [],
+            "councils": [],
+            "reset:shiny.action": 0,
+            "correlation_by": "all",
+            "page": DASHBOARD_TAB,
+            **client_data(port),
+            **shown(DASHBOARD_TAB),
+        }
+        await ws.send(json.dumps({"method": "init", "data": init}))
+        await settle()
+        counts[DASHBOARD_TAB].clear()
+
+        for tab in (DASHBOARD_TAB, FAQ_TAB):
+            await ws.send(json.dumps({"method": "update", "data": {"page": tab, **shown(tab)}}))
+            await settle()
+            for burst in bursts:
+                for update in burst:
+                    await ws.send(json.dumps({"method": "update", "data": update}))
+                    await asyncio.sleep(gap)
+                await settle()
+    return counts
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--bursts", type=int, default=5, help="Bursts per tab")
+    parser.add_argument("--burst-size", type=int, default=5, help="Council changes per burst")
+    parser.add_argument("--gap-ms", type=float, default=50, help="Milliseconds between changes in a burst")
+    parser.add_argument(
+        "--debounce-ms",
+        type=float,
+        default=reactivity.DEBOUNCE_SECONDS * 1000 or 300,
+        help="Debounce window of the debounced worker (default: $WQ_DEBOUNCE_MS or 300)",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--check", action="store_true", help="Fail if avoidable work happens")
+    parser.add_argument("--port", type=int, default=8300)
+    parser.add_argument("--data", type=Path, default=None, help="Dataset for the app to serve")
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    env = {**os.environ, "WQ_QUERYCHAT_WARMUP": "0", "WQ_FORECAST_WARMUP": "0"}
+    if args.data:
+        env["WQ_DATA_PATH"] = str(args.data.resolve())
+    workload = Workload.from_dataset(args.data)
+    bursts = script(workload, args.bursts, args.burst_size, args.seed)
+    gap = args.gap_ms / 1000
+    quiet = args.debounce_ms / 1000 + 1.5
+
+    with workers(1, args.port, {**env, "WQ_DEBOUNCE_MS": "0"}), workers(
+        1, args.port + 1, {**env, "WQ_DEBOUNCE_MS": str(args.debounce_ms)}
+    ):
+        modes = {
+            "baseline": asyncio.run(replay(args.port, workload, bursts, True, gap, quiet)),
+            "visibility": asyncio.run(replay(args.port, workload, bursts, False, gap, quiet)),
+            "debounced": asyncio.run(replay(args.port + 1, workload, bursts, False, gap, quiet)),
+        }
+
+    totals = {mode: sum(sum(c.values()) for c in tabs.values()) for mode, tabs in modes.items()}
+    results = {
+        "bursts_per_tab": args.bursts,
+        "changes": sum(map(len, bursts)) * 2,
+        "debounce_ms": args.debounce_ms,
+        "executions": {
+            mode: {tab: dict(sorted(c.items())) for tab, c in tabs.items()} for mode, tabs in modes.items()
+        },
+        "totals": totals,
+        "avoided": {
+            "visibility": totals["baseline"] - totals["visibility"],
+            "debounce": totals["visibility"] - totals["debounced"],
+        },
+    }
+    for tab in (DASHBOARD_TAB, FAQ_TAB):
+        print(f"{tab} tab:")
+        print(f"  {'output':<34} {'baseline':>9} {'visibility':>11} {'debounced':>10}")
+        for name in sorted(set().union(*(tabs[tab] for tabs in modes.values()))):
+            row = [modes[mode][tab][name] for mode in modes]
+            print(f"  {name:<34} {row[0]:>9} {row[1]:>11} {row[2]:>10}")
+    print(f"  {'total':<34} {totals['baseline']:>9} {totals['visibility']:>11} {totals['debounced']:>10}")
+    print(
+        f"Avoided: {results['avoided']['visibility']} executions by skipping hidden outputs, "
+        f"{results['avoided']['debounce']} more by debouncing"
+    )
+    print(f"Results written to {save_results('reactivity', results, args.out)}")
+
+    if args.check:
+        failures = []
+        for tab, counts in modes["debounced"].items():
+            shown = {*_shown_outputs(tab), MAP_UPDATES if tab == DASHBOARD_TAB else None}
+            for name, n in counts.items():
+                if name not in shown:
+                    failures.append(f"{name} updated {n} times while hidden on the {tab} tab")
+                # Showing a tab may render its outputs once more
+                elif n > len(bursts) + 1:
+                    failures.append(f"{name} rendered {n} times for {len(bursts)} bursts on the {tab} tab")
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
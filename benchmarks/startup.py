@@ -0,0 +1,132 @@
+"""
+Cold-start benchmark of `import app`, based on `python -X importtime`.
+
+Imports the app in fresh interpreters and reports the wall time, the
+cumulative import time of `app`, and the modules with the largest cumulative
+import times. With `--check` it doubles as a budget test: it exits non-zero
+if the median cold start exceeds `--budget-ms`, or if any module that the app
+is meant to import lazily (plotting, mapping, LLM and database clients) was
+imported at startup.
+
+Usage:
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --check --budget-ms 4000
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from water_quality.data import ROOT
+
+from ._common import save_results
+
+# Modules the app must not import until they're needed
+DEFERRED_MODULES = [
+    "plotly.express",
+    "ipyleaflet",
+    "leafmap",
+    "duckdb",
+    "sqlalchemy",
+    "sklearn",
+]
+
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def import_app() -> tuple[float, dict[str, tuple[int, int]]]:
+    """
+    Import the app in a fresh interpreter.
+
+    Returns:
+        The wall time in milliseconds and, per module, its
+        `(self, cumulative)` import time in microseconds
+
+    """
+    # Without warm-up, nothing is imported behind the measurement's back
+    env = {**os.environ, "WQ_QUERYCHAT_WARMUP": "0", "WQ_FORECAST_WARMUP": "0", "WQ_RISK_MAP_WARMUP": "0"}
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"`import app` failed:\n{proc.stderr[-2000:]}")
+
+    modules = {}
+    for match in _LINE.finditer(proc.stderr):
+        self_us, cumulative_us, _, name = match.groups()
+        modules[name] = (int(self_us), int(cumulative_us))
+    return wall_ms, modules
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15, help="Slowest modules to report")
+    parser.add_argument("--check", action="store_true", help="Fail if over budget")
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.environ.get("WQ_STARTUP_BUDGET_MS", 5000)),
+        help="Median cold-start budget in milliseconds (default: $WQ_STARTUP_BUDGET_MS or 5000)",
+    )
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    walls, app_ms = [], []
+    modules: dict[str, tuple[int, int]] = {}
+    for _ in range(args.runs):
+        wall_ms, modules = import_app()
+        walls.append(wall_ms)
+        app_ms.append(modules["app"][1] / 1000)
+
+    slowest = sorted(modules.items(), key=lambda item: item[1][1], reverse=True)
+    deferred_imported = [m for m in DEFERRED_MODULES if m in modules]
+    results = {
+        "runs": args.runs,
+        "wall_ms_median": round(statistics.median(walls), 1),
+        "import_app_ms_median": round(statistics.median(app_ms), 1),
+        "app_self_ms": round(modules["app"][0] / 1000, 1),
+        "slowest_modules_ms": {
+            name: round(cumulative / 1000, 1) for name, (_, cumulative) in slowest[: args.top]
+        },
+        "deferred_modules_imported": deferred_imported,
+        "budget_ms": args.budget_ms,
+    }
+
+    print(f"cold start (wall, median of {args.runs}): {results['wall_ms_median']:.0f} ms")
+    print(f"import app (cumulative):            {results['import_app_ms_median']:.0f} ms")
+    for name, ms in results["slowest_modules_ms"].items():
+        print(f"  {ms:>8.1f} ms  {name}")
+    print(f"Results written to {save_results('startup', results, args.out)}")
+
+    if args.check:
+        failures = []
+        if results["wall_ms_median"] > args.budget_ms:
+            failures.append(
+                f"cold start {results['wall_ms_median']:.0f} ms exceeds the "
+                f"{args.budget_ms:.0f} ms budget"
+            )
+        if deferred_imported:
+            failures.append(f"imported at startup: {', '.join(deferred_imported)}")
+        for failure in failures:
+            print(f"FAIL: {failure}", file=sys.stderr)
+        sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
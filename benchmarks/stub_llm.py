@@ -0,0 +1,199 @@
+"""
+A stub of the Anthropic Messages API for load testing.
+
+Serves `POST /v1/messages` with canned, streamed responses so chat sessions
+can be driven without a real model, cost or rate limits. Point the app at it
+with `ANTHROPIC_BASE_URL=http://127.0.0.1:<port>`.
+
+When the latest user turn is plain text, the stub calls the querychat `query`
+tool with an aggregate over the `df` table (so the data source does real
+work); once the tool result comes back it answers with a short text reply.
+Greeting requests are answered with text straight away.
+
+Usage:
+
+    python -m benchmarks.stub_llm --port 8765 --latency 0.5
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+STUB_QUERY = (
+    "SELECT beach, AVG(enterococci) AS mean_enterococci, COUNT(*) AS samples "
+    "FROM df GROUP BY beach ORDER BY mean_enterococci DESC LIMIT 10"
+)
+
+
+def _wants_tool_call(body: dict) -> bool:
+    """Whether the conversation is at a fresh user question (not a tool result or greeting)."""
+    if not body.get("tools"):
+        return False
+    last = body["messages"][-1]
+    content = last["content"]
+    if isinstance(content, str):
+        return "greeting" not in content
+    if any(block.get("type") == "tool_result" for block in content):
+        return False
+    text = " ".join(block.get("text", "") for block in content)
+    return "greeting" not in text
+
+
+def _events(body: dict) -> list[tuple[str, dict]]:
+    """The server-sent events of one streamed response."""
+    message_id = f"msg_{uuid.uuid4().hex[:24]}"
+    events: list[tuple[str, dict]] = [
+        (
+            "message_start",
+            {
+                "type": "message_start",
+                "message": {
+                    "id": message_id,
+                    "type": "message",
+                    "role": "assistant",
+                    "model": body.get("model", "stub"),
+                    "content": [],
+                    "stop_reason": None,
+                    "stop_sequence": None,
+                    "usage": {"input_tokens": 100, "output_tokens": 1},
+                },
+            },
+        )
+    ]
+
+    if _wants_tool_call(body):
+        stop_reason = "tool_use"
+        events += [
+            (
+                "content_block_start",
+                {
+                    "type": "content_block_start",
+                    "index": 0,
+                    "content_block": {
+                        "type": "tool_use",
+                        "id": f"toolu_{uuid.uuid4().hex[:24]}",
+                        "name": "query",
+                        "input": {},
+                    },
+                },
+            ),
+            (
+                "content_block_delta",
+                {
+                    "type": "content_block_delta",
+                    "index": 0,
+                    "delta": {
+                        "type": "input_json_delta",
+                        "partial_json": json.dumps({"query": STUB_QUERY}),
+                    },
+                },
+            ),
+        ]
+    else:
+        stop_reason = "end_turn"
+        events.append(
+            (
+                "content_block_start",
+                {
+                    "type": "content_block_start",
+                    "index": 0,
+                    "content_block": {"type": "text", "text": ""},
+                },
+            )
+        )
+        for word in "Here are the beaches with the highest average enterococci.".split():
+            events.append(
+                (
+                    "content_block_delta",
+                    {
+                        "type": "content_block_delta",
+                        "index": 0,
+                        "delta": {"type": "text_delta", "text": word + " "},
+                    },
+                )
+            )
+
+    events += [
+        ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+        (
+            "message_delta",
+            {
+                "type": "message_delta",
+                "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                "usage": {"output_tokens": 20},
+            },
+        ),
+        ("message_stop", {"type": "message_stop"}),
+    ]
+    return events
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latency: float = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self) -> None:  # noqa: N802
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip("/").endswith("/messages"):
+            self.send_error(404)
+            return
+
+        events = _events(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        # Spread the configured model latency over the stream, like a real model
+        delay = self.latency / len(events)
+        for event, data in events:
+            time.sleep(delay)
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+        self.close_connection = True
+
+    def log_message(self, format, *args) -> None:  # noqa: A002
+        pass
+
+
+def serve(port: int = 0, latency: float = 0.5) -> ThreadingHTTPServer:
+    """
+    Start the stub in a background thread.
+
+    Args:
+        port: Port to listen on; 0 picks a free one (see `server.server_port`)
+        latency: Seconds each response takes to stream
+
+    Returns:
+        The running server; call `.shutdown()` to stop it
+
+    """
+    handler = type("Handler", (_Handler,), {"latency": latency})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5)
+    args = parser.parse_args(argv)
+
+    server = serve(args.port, args.latency)
+    print(f"Stub LLM listening on http://127.0.0.1:{server.server_port}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark of the nearest-station weather join with antecedent rainfall.
+
+Joins synthetic samples to synthetic daily weather from many stations with
+`water_quality.weather_join.join_weather`, next to the notebook's date-only
+`merge` for reference.
+
+Usage:
+
+    python -m benchmarks.weather_join --sizes 1m 10m --stations 50
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Optional
+
+from water_quality import synthetic
+from water_quality.data import load_dataset
+from water_quality.weather_join import join_weather
+
+from ._common import save_results, timeit
+from .dashboard import dataset_path
+
+
+def run(path: Path, n_stations: int, repeat: int) -> dict:
+    samples = load_dataset(path).drop(columns="precipitation_mm")
+    weather = synthetic.generate_weather(n_stations, start_date=str(samples["date"].min().date()))
+    results: dict = {"rows": len(samples), "stations": n_stations, "weather_rows": len(weather)}
+    results["join_weather"] = timeit(lambda: join_weather(samples, weather), repeat=repeat)
+    # The notebook's join: on date only, against a single station
+    one_station = weather[weather["latitude"] == weather["latitude"].iloc[0]]
+    results["merge_on_date"] = timeit(
+        lambda: samples.merge(one_station[["date", "precipitation_mm"]], on="date", how="inner"),
+        repeat=repeat,
+    )
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="*", default=["1m"], choices=list(synthetic.SIZES))
+    parser.add_argument("--stations", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for size in args.sizes:
+        print(f"Benchmarking {size} samples x {args.stations} stations ...")
+        results[size] = run(dataset_path(size), args.stations, args.repeat)
+        for name, value in results[size].items():
+            if isinstance(value, dict):
+                print(f"  {name:<16} {value['median_ms']:>10.1f} ms")
+
+    print(f"Results written to {save_results('weather_join', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Memory of N app workers with private vs shared (memory-mapped) datasets.
+
+For each worker count, starts the app as that many uvicorn workers, once with
+every worker loading its own copy of the dataset and once with
+`WQ_SHARED_DATA` set so they attach to a single memory-mapped copy (see
+`water_quality.shared`). One session is opened per worker, then RSS, PSS and
+USS are summed across workers. RSS counts shared pages once per process; PSS
+splits them between the processes sharing them, so it is the figure that
+shows the saving.
+
+Requires `websockets` and `psutil` (see `benchmarks/requirements.txt`).
+
+Usage:
+
+    python -m benchmarks.worker_memory --workers 1 4 8 --data data/synthetic_1m.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import psutil
+
+from ._common import save_results, workers
+from .loadtest import Session, Stats, Workload
+
+
+def _memory(pids: list[int]) -> dict:
+    info = [psutil.Process(pid).memory_full_info() for pid in pids]
+    return {
+        metric: round(sum(getattr(i, metric) for i in info) / 2**20, 1)
+        for metric in ("rss", "pss", "uss")
+    }
+
+
+async def _open_sessions(ports: list[int], workload: Workload) -> None:
+    stats = Stats()
+    # `until=0` makes each session initialize, render once and disconnect
+    await asyncio.gather(*(Session(p, workload, stats, seed=i).run(0) for i, p in enumerate(ports)))
+
+
+def measure(n_workers: int, env: dict, port: int, workload: Workload) -> dict:
+    ports = [port + i for i in range(n_workers)]
+    with workers(n_workers, port, env) as procs:
+        pids = [p.pid for p in procs]
+        startup = _memory(pids)
+        asyncio.run(_open_sessions(ports, workload))
+        return {"after_startup_mb": startup, "after_session_mb": _memory(pids)}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--data", type=Path, default=None, help="Dataset for the app to serve")
+    parser.add_argument("--port", type=int, default=8100, help="Port of the first worker")
+    parser.add_argument("--out", type=Path, default=None, help="JSON output file")
+    args = parser.parse_args(argv)
+
+    base_env = {**os.environ, "ANTHROPIC_API_KEY": "unused"}
+    base_env.pop("WQ_SHARED_DATA", None)
+    if args.data:
+        base_env["WQ_DATA_PATH"] = str(args.data.resolve())
+    workload = Workload.from_dataset(args.data)
+
+    results: dict = {"data": str(args.data or "default")}
+    with tempfile.TemporaryDirectory(dir="/dev/shm" if Path("/dev/shm").is_dir() else None) as tmp:
+        modes = {
+            "private": base_env,
+            "shared": {**base_env, "WQ_SHARED_DATA": str(Path(tmp) / "water_quality.arrow")},
+        }
+        for n_workers in args.workers:
+            for mode, env in modes.items():
+                print(f"Measuring {n_workers} worker(s), {mode} data ...")
+                result = measure(n_workers, env, args.port, workload)
+                results[f"{mode}_{n_workers}"] = result
+                print(f"  {result['after_session_mb']}")
+
+    print(f"Results written to {save_results('worker_memory', results, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,228 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, ClassVar, Protocol
+import asyncio
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, ClassVar, Mapping, Optional, Protocol, Sequence, Union
 
-import duckdb
 import narwhals as nw
 import pandas as pd
-from sqlalchemy import inspect, text
-from sqlalchemy.sql import sqltypes
+
+# duckdb and sqlalchemy are imported by the data sources that use them, so
+# importing querychat stays cheap
 
 if TYPE_CHECKING:
+    import duckdb
     from sqlalchemy.engine import Connection, Engine
+    from sqlalchemy.ext.asyncio import AsyncEngine
+    from sqlalchemy.sql import Select, sqltypes
+
+
+# Rows per page of `get_page()`
+PAGE_SIZE = 100
+
+# Database files of this many of the latest data versions are kept
+KEEP_VERSIONS = 2
+
+# Column of the page query holding the number of matching rows
+_TOTAL_COLUMN = "__total_rows"
+
+# A column and whether to sort it descending
+ColumnSort = tuple[str, bool]
+# A column and a case-insensitive substring to match, or an inclusive
+# (min, max) range where either bound may be None
+ColumnFilter = tuple[str, Union[str, Sequence[Optional[float]]]]
+
+
+@dataclass(frozen=True)
+class SummaryTable:
+    """
+    A table materialized from the data for the chat model to query, so
+    common aggregates read a few thousand rows instead of every sample.
+
+    Attributes:
+        name: Table name in SQL queries
+        query: SELECT over the data source's table that builds it
+        description: What the table holds, for the system prompt
+
+    """
+
+    name: str
+    query: str
+    description: str
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+def _mtime(path: Path) -> float:
+    # Another process may have removed it since it was listed
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def _like_pattern(value: str) -> str:
+    escaped = value.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _split_total(
+    rows: pd.DataFrame, count: Callable[[], int], offset: int
+) -> tuple[pd.DataFrame, int]:
+    total = rows.pop(_TOTAL_COLUMN)
+    if len(total):
+        return rows, int(total.iloc[0])
+    return rows, int(count()) if offset > 0 else 0
+
+
+def page_queries(
+    query: str,
+    sort: Sequence[ColumnSort],
+    filters: Sequence[ColumnFilter],
+    offset: int,
+    limit: int,
+    placeholder: Callable[[str], str],
+) -> tuple[str, str, dict]:
+    """
+    SQL for one page of a query's results, and for their number.
+
+    The query becomes a subquery, and sorting, filtering and paging are
+    applied to it as `ORDER BY`, `WHERE` and `LIMIT`/`OFFSET`, with filter
+    values passed as parameters. The page query also counts the matching
+    rows, in a window column, so one scan serves both; the count query is
+    only needed for pages past the end.
+
+    Args:
+        query: A SELECT statement
+        sort: Columns to sort by, first one first
+        filters: Conditions on columns, all of which must hold
+        offset: Rows to skip
+        limit: Rows to return
+        placeholder: Formats a named parameter for the database driver
+
+    Returns:
+        The page query, the count query, and the parameters of both
+
+    """
+    conditions, params = [], {}
+    for column, value in filters:
+        name = f"p{len(params)}"
+        if isinstance(value, str):
+            params[name] = _like_pattern(value)
+            conditions.append(
+                f"LOWER(CAST({_quote(column)} AS VARCHAR)) LIKE {placeholder(name)} ESCAPE '\\'"
+            )
+            continue
+        low, high = value
+        if low is not None:
+            params[name] = low
+            conditions.append(f"{_quote(column)} >= {placeholder(name)}")
+        if high is not None:
+            name = f"p{len(params)}"
+            params[name] = high
+            conditions.append(f"{_quote(column)} <= {placeholder(name)}")
+
+    source = f"({query.strip().rstrip(';')}) AS page_source"
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = ", ".join(f"{_quote(column)} {'DESC' if desc else 'ASC'}" for column, desc in sort)
+    order = f" ORDER BY {order}" if order else ""
+    page = (
+        f"SELECT *, COUNT(*) OVER () AS {_TOTAL_COLUMN} FROM {source}{where}{order}"
+        f" LIMIT {int(limit)} OFFSET {int(offset)}"
+    )
+    count = f"SELECT COUNT(*) AS n FROM {source}{where}"
+    return page, count, params
+
+
+def page_statements(
+    query: str,
+    sort: Sequence[ColumnSort],
+    filters: Sequence[ColumnFilter],
+    offset: int,
+    limit: int,
+) -> tuple[Select, Select]:
+    """
+    `page_queries()` as SQLAlchemy statements, for any database.
+
+    The same page and count queries, built from SQLAlchemy constructs so
+    the engine's dialect renders the identifier quoting, the cast to text,
+    the `LIKE ... ESCAPE` and the paging, with filter values bound.
+
+    Returns:
+        The page statement and the count statement
+
+    """
+    from sqlalchemy import String, cast, column, func, literal_column, select, text
+
+    conditions = []
+    for name, value in filters:
+        if isinstance(value, str):
+            conditions.append(func.lower(cast(column(name), String)).like(_like_pattern(value), escape="\\"))
+            continue
+        low, high = value
+        if low is not None:
+            conditions.append(column(name) >= low)
+        if high is not None:
+            conditions.append(column(name) <= high)
+
+    source = text(query.strip().rstrip(";")).columns().subquery("page_source")
+    page = (
+        select(literal_column("*"), func.count().over().label(_TOTAL_COLUMN))
+        .select_from(source)
+        .where(*conditions)
+        .order_by(*(column(name).desc() if desc else column(name).asc() for name, desc in sort))
+        .limit(int(limit))
+        .offset(int(offset))
+    )
+    count = select(func.count().label("n")).select_from(source).where(*conditions)
+    return page, count
+
+
+def _describe_columns(ndf: nw.DataFrame, categorical_threshold: int) -> list[str]:
+    """Lines describing a frame's columns for the schema: type, and categories or range."""
+    schema = []
+    for column in ndf.columns:
+        # Map pandas dtypes to SQL-like types
+        dtype = ndf[column].dtype
+        if dtype.is_integer():
+            sql_type = "INTEGER"
+        elif dtype.is_float():
+            sql_type = "FLOAT"
+        elif dtype == nw.Boolean:
+            sql_type = "BOOLEAN"
+        elif dtype == nw.Datetime:
+            sql_type = "TIME"
+        elif dtype == nw.Date:
+            sql_type = "DATE"
+        else:
+            sql_type = "TEXT"
+
+        column_info = [f"- {column} ({sql_type})"]
+
+        # For TEXT columns, check if they're categorical
+        if sql_type == "TEXT":
+            unique_values = ndf[column].drop_nulls().unique()
+            if unique_values.len() <= categorical_threshold:
+                categories = unique_values.to_list()
+                categories_str = ", ".join([f"'{c}'" for c in categories])
+                column_info.append(f"  Categorical values: {categories_str}")
+
+        # For numeric columns, include range
+        elif sql_type in ["INTEGER", "FLOAT", "DATE", "TIME"]:
+            rng = ndf[column].min(), ndf[column].max()
+            if rng[0] is None and rng[1] is None:
+                column_info.append("  Range: NULL to NULL")
+            else:
+                column_info.append(f"  Range: {rng[0]} to {rng[1]}")
+
+        schema.extend(column_info)
+
+    return schema
 
 
 class DataSource(Protocol):
@@ -30,12 +243,13 @@ class DataSource(Protocol):
         """
         ...
 
-    def execute_query(self, query: str) -> pd.DataFrame:
+    def execute_query(self, query: str, params: Optional[Mapping] = None) -> pd.DataFrame:
         """
         Execute SQL query and return results as DataFrame.
 
         Args:
             query: SQL query to execute
+            params: Values of the query's named parameters
 
         Returns:
             Query results as a pandas DataFrame
@@ -53,29 +267,211 @@ class DataSource(Protocol):
         """
         ...
 
+    async def get_schema_async(self, *, categorical_threshold) -> str:
+        """`get_schema()`, without blocking the event loop."""
+        ...
+
+    async def execute_query_async(self, query: str, params: Optional[Mapping] = None) -> pd.DataFrame:
+        """
+        `execute_query()`, without blocking the event loop.
+
+        Queries of concurrent sessions overlap, rather than each blocking
+        the loop (and every other session) until it's done.
+        """
+        ...
+
+    async def get_data_async(self) -> pd.DataFrame:
+        """`get_data()`, without blocking the event loop."""
+        ...
+
+    def get_relation(self, query: str = "") -> nw.LazyFrame:
+        """
+        Return a query's results as a lazy frame, without running it yet.
+
+        Filters, aggregations and limits chained onto it run in the
+        database, as part of the query, when it is collected. Sources that
+        can't defer their queries (`SQLAlchemySource`) may run the query
+        here and the rest in memory.
+
+        Args:
+            query: SQL query, or `""` for the whole table
+
+        Returns:
+            The query's results as a narwhals LazyFrame
+
+        """
+        ...
+
+    def get_page(
+        self,
+        query: str = "",
+        *,
+        sort: Sequence[ColumnSort] = (),
+        filters: Sequence[ColumnFilter] = (),
+        offset: int = 0,
+        limit: int = PAGE_SIZE,
+    ) -> tuple[pd.DataFrame, int]:
+        """
+        Return one page of a query's results, sorted and filtered in the database.
+
+        Args:
+            query: SQL query, or `""` for the whole table
+            sort: Columns to sort by, first one first
+            filters: Conditions on columns (see `ColumnFilter`)
+            offset: Rows to skip
+            limit: Rows to return
+
+        Returns:
+            The page, and the number of rows matching the filters
+
+        """
+        ...
+
 
 class DataFrameSource:
-    """A DataSource implementation that wraps a pandas DataFrame using DuckDB."""
+    """
+    A DataSource implementation that wraps a pandas DataFrame using DuckDB.
+
+    By default DuckDB queries the frame in place, on an in-memory connection.
+    With a `database` file, the data is instead copied once into a native
+    DuckDB table, sorted by `order_by` so that DuckDB's per-block min/max
+    (zone maps) let range predicates on that column skip most of the table,
+    and persisted, one file per data version. Processes that start on a
+    version already persisted (a warm restart, or further app workers) open
+    its file read-only instead of building anything.
+    """
 
     db_engine: ClassVar[str] = "DuckDB"
 
-    def __init__(self, df: pd.DataFrame, table_name: str):
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        table_name: str,
+        summary_tables: Sequence[SummaryTable] = (),
+        *,
+        database: Optional[Union[str, Path]] = None,
+        version: Optional[str] = None,
+        order_by: Optional[str] = None,
+    ):
         """
         Initialize with a pandas DataFrame.
 
         Args:
             df: The DataFrame to wrap
             table_name: Name of the table in SQL queries
+            summary_tables: Tables to materialize from the data, alongside
+                it; they are rebuilt whenever the data is replaced and
+                described in the schema
+            database: Keep the data in a native table, persisted in a
+                DuckDB file named after this path and the data's `version`
+            version: Identifies the data, and so its database file; required
+                with `database`
+            order_by: Column to sort the native table by
 
         """
-        self._conn = duckdb.connect(database=":memory:")
+        if database is not None and version is None:
+            raise ValueError("A `database` needs the data's `version`, to tell its files apart")
+
         self._df = df
         self._table_name = table_name
-        self._conn.register(table_name, df)
+        self.summary_tables = tuple(summary_tables)
+        self._database = Path(database) if database is not None else None
+        self._order_by = order_by
+        # Guards the connection, which replace_data() may use from another thread
+        self._lock = threading.Lock()
+        self._conn = self._connect(df, version)
+
+    def replace_data(self, df: pd.DataFrame, version: Optional[str] = None) -> None:
+        """
+        Swap in a new version of the data under the same table name.
+
+        Queries already running finish on the old data; later queries and
+        `get_data()` calls see the new data, and summary tables built from
+        it.
+
+        Args:
+            df: The new DataFrame, with the same columns
+            version: Identifies the new data; required with a `database`
+
+        """
+        if self._database is None:
+            with self._lock:
+                self._conn.register(self._table_name, df)
+                self._df = df
+                self._build_summary_tables(self._conn)
+            return
+
+        if version is None:
+            raise ValueError("A `database` needs the data's `version`, to tell its files apart")
+        # Built (or opened) before taking the lock, so queries keep running meanwhile
+        conn = self._connect(df, version)
+        with self._lock:
+            self._conn, self._df = conn, df
+        # Keep the previous version's file for other workers that haven't
+        # switched (or are only now opening it); connections still open on
+        # older ones keep reading theirs
+        current = self.database_file(version)
+        files = sorted(self._database.parent.glob(f"{self._database.stem}-*{self._database.suffix}"), key=_mtime)
+        older = [f for f in files if f != current]
+        for path in older[: max(len(older) - (KEEP_VERSIONS - 1), 0)]:
+            path.unlink(missing_ok=True)
+
+    def database_file(self, version: str) -> Path:
+        """The database file holding a version of the data, with a `database`."""
+        if self._database is None:
+            raise ValueError("This data source has no database file")
+        return self._database.with_name(f"{self._database.stem}-{version}{self._database.suffix}")
+
+    def _connect(self, df: pd.DataFrame, version: Optional[str]) -> duckdb.DuckDBPyConnection:
+        import duckdb
+
+        if self._database is None:
+            conn = duckdb.connect(database=":memory:")
+            conn.register(self._table_name, df)
+            self._build_summary_tables(conn)
+            return conn
+
+        path = self.database_file(version)  # type: ignore[arg-type]
+        if not path.exists():
+            self._persist(df, path)
+        try:
+            return duckdb.connect(str(path), read_only=True)
+        except duckdb.IOException:
+            if path.exists():
+                raise
+            # Pruned by another process since: write it again
+            self._persist(df, path)
+            return duckdb.connect(str(path), read_only=True)
+
+    def _persist(self, df: pd.DataFrame, path: Path) -> None:
+        # Written next to `path` and renamed into place, so no process opens a
+        # partially written file; processes racing to write it write the same
+        import duckdb
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp.unlink(missing_ok=True)
+        conn = duckdb.connect(str(tmp))
+        try:
+            conn.register("__querychat_source", df)
+            order = f" ORDER BY {_quote(self._order_by)}" if self._order_by else ""
+            conn.execute(
+                f"CREATE TABLE {_quote(self._table_name)} AS SELECT * FROM __querychat_source{order}"
+            )
+            conn.unregister("__querychat_source")
+            self._build_summary_tables(conn)
+        finally:
+            conn.close()
+        os.replace(tmp, path)
+
+    def _build_summary_tables(self, conn: duckdb.DuckDBPyConnection) -> None:
+        # Native DuckDB tables, so cursors see them as well
+        for table in self.summary_tables:
+            conn.execute(f"CREATE OR REPLACE TABLE {_quote(table.name)} AS {table.query}")
 
     def get_schema(self, *, categorical_threshold: int) -> str:
         """
-        Generate schema information from DataFrame.
+        Generate schema information from DataFrame, and from its summary tables.
 
         Args:
             table_name: Name to use for the table in schema description
@@ -86,60 +482,77 @@ class DataFrameSource:
             String describing the schema
 
         """
-        ndf = nw.from_native(self._df)
-
         schema = [f"Table: {self._table_name}", "Columns:"]
+        schema.extend(_describe_columns(nw.from_native(self._df), categorical_threshold))
 
-        for column in ndf.columns:
-            # Map pandas dtypes to SQL-like types
-            dtype = ndf[column].dtype
-            if dtype.is_integer():
-                sql_type = "INTEGER"
-            elif dtype.is_float():
-                sql_type = "FLOAT"
-            elif dtype == nw.Boolean:
-                sql_type = "BOOLEAN"
-            elif dtype == nw.Datetime:
-                sql_type = "TIME"
-            elif dtype == nw.Date:
-                sql_type = "DATE"
-            else:
-                sql_type = "TEXT"
-
-            column_info = [f"- {column} ({sql_type})"]
-
-            # For TEXT columns, check if they're categorical
-            if sql_type == "TEXT":
-                unique_values = ndf[column].drop_nulls().unique()
-                if unique_values.len() <= categorical_threshold:
-                    categories = unique_values.to_list()
-                    categories_str = ", ".join([f"'{c}'" for c in categories])
-                    column_info.append(f"  Categorical values: {categories_str}")
-
-            # For numeric columns, include range
-            elif sql_type in ["INTEGER", "FLOAT", "DATE", "TIME"]:
-                rng = ndf[column].min(), ndf[column].max()
-                if rng[0] is None and rng[1] is None:
-                    column_info.append("  Range: NULL to NULL")
-                else:
-                    column_info.append(f"  Range: {rng[0]} to {rng[1]}")
-
-            schema.extend(column_info)
+        for table in self.summary_tables:
+            with self._lock:
+                rows = self._conn.execute(f"SELECT * FROM {_quote(table.name)}").df()
+            schema.extend(["", f"Summary table: {table.name}", table.description, "Columns:"])
+            schema.extend(_describe_columns(nw.from_native(rows), categorical_threshold))
 
         return "\n".join(schema)
 
-    def execute_query(self, query: str) -> pd.DataFrame:
+
+    def cursor(self) -> duckdb.DuckDBPyConnection:
+        """
+        A new cursor on the DuckDB connection, for running queries alongside
+        other threads'.
+
+        `execute_query()` and `get_page()` take turns on the shared
+        connection; queries on separate cursors of it run in parallel. The
+        cursor queries the data current when it was made: the frame,
+        registered under the same table name without copying it, or the
+        native table of a `database`.
+        """
+        with self._lock:
+            cursor = self._conn.cursor()
+            if self._database is None:
+                cursor.register(self._table_name, self._df)
+            return cursor
+
+    def execute_query(self, query: str, params: Optional[Mapping] = None) -> pd.DataFrame:
         """
         Execute query using DuckDB.
 
         Args:
             query: SQL query to execute
+            params: Values of the query's `$name` parameters
 
         Returns:
             Query results as pandas DataFrame
 
         """
-        return self._conn.execute(query).df()
+        with self._lock:
+            return self._conn.execute(query, params).df()
+
+    def get_page(
+        self,
+        query: str = "",
+        *,
+        sort: Sequence[ColumnSort] = (),
+        filters: Sequence[ColumnFilter] = (),
+        offset: int = 0,
+        limit: int = PAGE_SIZE,
+    ) -> tuple[pd.DataFrame, int]:
+        """
+        Return one page of a query's results, sorted and filtered by DuckDB.
+
+        Returns:
+            The page, and the number of rows matching the filters
+
+        """
+        page, count, params = page_queries(
+            query or f"SELECT * FROM {_quote(self._table_name)}",
+            sort,
+            filters,
+            offset,
+            limit,
+            lambda name: f"${name}",
+        )
+        with self._lock:
+            rows = self._conn.execute(page, params).df()
+            return _split_total(rows, lambda: self._conn.execute(count, params).fetchone()[0], offset)
 
     def get_data(self) -> pd.DataFrame:
         """
@@ -149,7 +562,61 @@ class DataFrameSource:
             The complete dataset as a pandas DataFrame
 
         """
-        return self._df.copy()
+        # A shallow copy: with copy-on-write, callers that modify it get their
+        # own data, without every session paying for a full copy up front (or
+        # breaking sharing when the frame is a view on shared memory).
+        return self._df.copy(deep=False)
+
+    async def get_schema_async(self, *, categorical_threshold: int) -> str:
+        """`get_schema()`, in a worker thread."""
+        return await asyncio.to_thread(self.get_schema, categorical_threshold=categorical_threshold)
+
+    async def execute_query_async(self, query: str, params: Optional[Mapping] = None) -> pd.DataFrame:
+        """
+        `execute_query()`, in a worker thread, on a cursor of its own.
+
+        DuckDB releases the GIL while it runs a query, so queries of
+        concurrent sessions run in parallel, and meanwhile the event loop
+        keeps serving everyone else.
+        """
+        cursor = self.cursor()
+
+        def execute() -> pd.DataFrame:
+            try:
+                return cursor.execute(query, params).df()
+            finally:
+                cursor.close()
+
+        return await asyncio.to_thread(execute)
+
+    async def get_data_async(self) -> pd.DataFrame:
+        """`get_data()`, which doesn't block: the data is already in memory."""
+        return self.get_data()
+
+    def get_relation(self, query: str = "") -> nw.LazyFrame:
+        """
+        Return a query's results as a lazy DuckDB relation, on a cursor of its own.
+
+        Nothing runs until it is collected, and then only the query with
+        whatever was chained onto it, so `.select(nw.len())` counts the rows
+        and `.head(n)` fetches `n` of them. Like `cursor()`, it queries the
+        data current when it was made. (A cursor can't be shared: DuckDB
+        fails relations collected on one from several threads at once.)
+
+        The cursor is never closed here. The relation and every relation
+        chained onto it hold it, and DuckDB frees it when the last of them is
+        dropped, so a reader still collecting one (a background job, say)
+        is never cut off by a newer query.
+
+        Args:
+            query: SQL query, or `""` for the whole table
+
+        Returns:
+            The query's results as a narwhals LazyFrame
+
+        """
+        relation = self.cursor().sql(query or f"SELECT * FROM {_quote(self._table_name)}")
+        return nw.from_native(relation)
 
 
 class SQLAlchemySource:
@@ -161,16 +628,23 @@ class SQLAlchemySource:
 
     db_engine: ClassVar[str] = "SQLAlchemy"
 
-    def __init__(self, engine: Engine, table_name: str):
+    def __init__(self, engine: Engine, table_name: str, *, async_engine: Optional[AsyncEngine] = None):
         """
         Initialize with a SQLAlchemy engine.
 
         Args:
             engine: SQLAlchemy engine
             table_name: Name of the table to query
+            async_engine: An async engine on the same database (for example
+                `create_async_engine("sqlite+aiosqlite:///...")`), which the
+                async methods then use; without one, they run the blocking
+                methods in worker threads
 
         """
+        from sqlalchemy import inspect
+
         self._engine = engine
+        self._async_engine = async_engine
         self._table_name = table_name
 
         # Validate table exists
@@ -186,7 +660,16 @@ class SQLAlchemySource:
             String describing the schema
 
         """
-        inspector = inspect(self._engine)
+        with self._get_connection() as conn:
+            return self._schema(conn, categorical_threshold)
+
+    def _schema(self, conn: Connection, categorical_threshold: int) -> str:
+        # `get_schema()` on one connection, sync or an async one's sync facade.
+        # A failed query is rolled back, so the next one can run
+        from sqlalchemy import inspect, text
+        from sqlalchemy.sql import sqltypes
+
+        inspector = inspect(conn)
         columns = inspector.get_columns(self._table_name)
 
         schema = [f"Table: {self._table_name}", "Columns:"]
@@ -215,12 +698,11 @@ class SQLAlchemySource:
                     query = text(
                         f"SELECT MIN({col['name']}), MAX({col['name']}) FROM {self._table_name}",
                     )
-                    with self._get_connection() as conn:
-                        result = conn.execute(query).fetchone()
-                        if result and result[0] is not None and result[1] is not None:
-                            column_info.append(f"  Range: {result[0]} to {result[1]}")
-                except Exception:  # noqa: S110
-                    pass  # Silently skip range info if query fails
+                    result = conn.execute(query).fetchone()
+                    if result and result[0] is not None and result[1] is not None:
+                        column_info.append(f"  Range: {result[0]} to {result[1]}")
+                except Exception:
+                    conn.rollback()  # Silently skip range info if query fails
 
             # For string/text columns, check if categorical
             elif isinstance(
@@ -231,39 +713,96 @@ class SQLAlchemySource:
                     count_query = text(
                         f"SELECT COUNT(DISTINCT {col['name']}) FROM {self._table_name}",
                     )
-                    with self._get_connection() as conn:
-                        distinct_count = conn.execute(count_query).scalar()
-                        if distinct_count and distinct_count <= categorical_threshold:
-                            values_query = text(
-                                f"SELECT DISTINCT {col['name']} FROM {self._table_name} "
-                                f"WHERE {col['name']} IS NOT NULL",
-                            )
-                            values = [
-                                str(row[0])
-                                for row in conn.execute(values_query).fetchall()
-                            ]
-                            values_str = ", ".join([f"'{v}'" for v in values])
-                            column_info.append(f"  Categorical values: {values_str}")
-                except Exception:  # noqa: S110
-                    pass  # Silently skip categorical info if query fails
+                    distinct_count = conn.execute(count_query).scalar()
+                    if distinct_count and distinct_count <= categorical_threshold:
+                        values_query = text(
+                            f"SELECT DISTINCT {col['name']} FROM {self._table_name} "
+                            f"WHERE {col['name']} IS NOT NULL",
+                        )
+                        values = [
+                            str(row[0])
+                            for row in conn.execute(values_query).fetchall()
+                        ]
+                        values_str = ", ".join([f"'{v}'" for v in values])
+                        column_info.append(f"  Categorical values: {values_str}")
+                except Exception:
+                    conn.rollback()  # Silently skip categorical info if query fails
 
             schema.extend(column_info)
 
         return "\n".join(schema)
 
-    def execute_query(self, query: str) -> pd.DataFrame:
+    def execute_query(self, query: str, params: Optional[Mapping] = None) -> pd.DataFrame:
         """
         Execute SQL query and return results as DataFrame.
 
         Args:
             query: SQL query to execute
+            params: Values of the query's `:name` parameters
 
         Returns:
             Query results as pandas DataFrame
 
         """
+        from sqlalchemy import text
+
         with self._get_connection() as conn:
-            return pd.read_sql_query(text(query), conn)
+            return pd.read_sql_query(text(query), conn, params=params)
+
+    async def get_schema_async(self, *, categorical_threshold: int) -> str:
+        """
+        `get_schema()`, inspecting the table and querying its columns on the
+        async engine; without one, in a worker thread.
+        """
+        if self._async_engine is None:
+            return await asyncio.to_thread(self.get_schema, categorical_threshold=categorical_threshold)
+        async with self._async_engine.connect() as conn:
+            # The inspector and queries use the sync facade, whose I/O is awaited
+            return await conn.run_sync(self._schema, categorical_threshold)
+
+    async def execute_query_async(self, query: str, params: Optional[Mapping] = None) -> pd.DataFrame:
+        """
+        `execute_query()`, awaiting the database on the async engine.
+
+        While one session waits on the database, the event loop serves the
+        others; without an async engine, the query runs in a worker thread.
+        """
+        from sqlalchemy import text
+
+        if self._async_engine is None:
+            return await asyncio.to_thread(self.execute_query, query, params)
+        async with self._async_engine.connect() as conn:
+            # pandas reads through the sync facade, whose I/O is awaited
+            return await conn.run_sync(
+                lambda sync_conn: pd.read_sql_query(text(query), sync_conn, params=params)
+            )
+
+    async def get_data_async(self) -> pd.DataFrame:
+        """`get_data()`, without blocking the event loop."""
+        return await self.execute_query_async(f"SELECT * FROM {self._table_name}")
+
+    def get_page(
+        self,
+        query: str = "",
+        *,
+        sort: Sequence[ColumnSort] = (),
+        filters: Sequence[ColumnFilter] = (),
+        offset: int = 0,
+        limit: int = PAGE_SIZE,
+    ) -> tuple[pd.DataFrame, int]:
+        """
+        Return one page of a query's results, sorted and filtered by the database.
+
+        Returns:
+            The page, and the number of rows matching the filters
+
+        """
+        page, count = page_statements(
+            query or f"SELECT * FROM {self._table_name}", sort, filters, offset, limit
+        )
+        with self._get_connection() as conn:
+            rows = pd.read_sql_query(page, conn)
+            return _split_total(rows, lambda: conn.execute(count).scalar(), offset)
 
     def get_data(self) -> pd.DataFrame:
         """
@@ -275,8 +814,24 @@ class SQLAlchemySource:
         """
         return self.execute_query(f"SELECT * FROM {self._table_name}")
 
+    def get_relation(self, query: str = "") -> nw.LazyFrame:
+        """
+        Return a query's results as a lazy frame, running the query now.
+
+        Unlike `DataFrameSource`'s, this is eager: narwhals can't defer
+        SQLAlchemy queries, so the whole result is read when this is called
+        and what is chained onto it runs in pandas.
+
+        Returns:
+            The query's results as a narwhals LazyFrame
+
+        """
+        return nw.from_native(self.execute_query(query or f"SELECT * FROM {self._table_name}")).lazy()
+
     def _get_sql_type_name(self, type_: sqltypes.TypeEngine) -> str:  # noqa: PLR0911
         """Convert SQLAlchemy type to SQL type name."""
+        from sqlalchemy.sql import sqltypes
+
         if isinstance(type_, sqltypes.Integer):
             return "INTEGER"
         elif isinstance(type_, sqltypes.Float):
@@ -5,19 +5,26 @@ import sys
 from dataclasses import dataclass
 from functools import partial
 from pathlib import Path
-from typing import TYPE_CHECKING, Any, Callable, Optional, Protocol, Union
+from typing import TYPE_CHECKING, Any, Callable, Optional, Protocol, Sequence, Union
 
-import chatlas
 import chevron
 import narwhals as nw
-import sqlalchemy
 from shiny import Inputs, Outputs, Session, module, reactive, ui
 
 if TYPE_CHECKING:
+    import chatlas
     import pandas as pd
+    import sqlalchemy
     from narwhals.typing import IntoFrame
 
-from .datasource import DataFrameSource, DataSource, SQLAlchemySource
+from .datasource import (
+    PAGE_SIZE,
+    ColumnFilter,
+    ColumnSort,
+    DataFrameSource,
+    DataSource,
+    SQLAlchemySource,
+)
 
 
 class CreateChatCallback(Protocol):
@@ -50,6 +57,8 @@ class QueryChat:
         sql: Callable[[], str],
         title: Callable[[], Union[str, None]],
         df: Callable[[], pd.DataFrame],
+        page: Callable[..., tuple[pd.DataFrame, int]],
+        lazy: Callable[[], nw.LazyFrame],
     ):
         """
         Initialize a QueryChat object.
@@ -59,12 +68,16 @@ class QueryChat:
             sql: Reactive that returns the current SQL query
             title: Reactive that returns the current title
             df: Reactive that returns the filtered data frame
+            page: Reactive that returns one page of the filtered data frame
+            lazy: Reactive that returns the filtered data as a lazy frame
 
         """
         self._chat = chat
         self._sql = sql
         self._title = title
         self._df = df
+        self._page = page
+        self._lazy = lazy
 
     def chat(self) -> chatlas.Chat:
         """
@@ -112,6 +125,51 @@ class QueryChat:
         """
         return self._df()
 
+    def lazy(self) -> nw.LazyFrame:
+        """
+        Reactively read the current filtered data, as a lazy frame.
+
+        Unlike `df()`, this doesn't run the current SQL query. Filters,
+        aggregations and limits chained onto the frame are added to the
+        query, and the data source's database runs it all when the frame is
+        collected; so a row count, say, fetches one row rather than all of
+        the query's. With a `SQLAlchemySource`, the query does run here,
+        in full, and only what is chained onto it is deferred.
+
+        Returns:
+            The current filtered data as a narwhals LazyFrame. If no query has
+            been set, this is the unfiltered data from the data source.
+
+        """
+        return self._lazy()
+
+    def page(
+        self,
+        *,
+        sort: Sequence[ColumnSort] = (),
+        filters: Sequence[ColumnFilter] = (),
+        offset: int = 0,
+        limit: int = PAGE_SIZE,
+    ) -> tuple[pd.DataFrame, int]:
+        """
+        Reactively read one page of the current filtered data frame.
+
+        Sorting, column filters and paging are applied by the data source's
+        database on top of the current SQL query, so only the page's rows are
+        fetched, however many rows the query returns.
+
+        Args:
+            sort: Columns to sort by, first one first
+            filters: Conditions on columns (see `ColumnFilter`)
+            offset: Rows to skip
+            limit: Rows to return
+
+        Returns:
+            The page, and the number of rows matching the filters
+
+        """
+        return self._page(sort=sort, filters=filters, offset=offset, limit=limit)
+
     def __getitem__(self, key: str) -> Any:
         """
         Allow access to configuration parameters like a dictionary. For
@@ -199,6 +257,7 @@ def system_prompt(
             ),
             "data_description": data_description_str,
             "extra_instructions": extra_instructions_str,
+            "summary_tables": bool(getattr(data_source, "summary_tables", ())),
         },
     )
 
@@ -241,7 +300,7 @@ def df_to_html(df: IntoFrame, maxrows: int = 5) -> str:
 
 
 def init(
-    data_source: IntoFrame | sqlalchemy.Engine,
+    data_source: IntoFrame | sqlalchemy.Engine | DataSource,
     table_name: str,
     *,
     greeting: Optional[str | Path] = None,
@@ -256,14 +315,16 @@ def init(
 
     Parameters
     ----------
-    data_source : IntoFrame | sqlalchemy.Engine
-        Either a Narwhals-compatible data frame (e.g., Polars or Pandas) or a
-        SQLAlchemy engine containing the table to query against.
+    data_source : IntoFrame | sqlalchemy.Engine | DataSource
+        Either a Narwhals-compatible data frame (e.g., Polars or Pandas), a
+        SQLAlchemy engine containing the table to query against, or a data
+        source already wrapping one (to share it with other parts of the app).
     table_name : str
         If a data_source is a data frame, a name to use to refer to the table in
         SQL queries (usually the variable name of the data frame, but it doesn't
         have to be). If a data_source is a SQLAlchemy engine, the table_name is
-        the name of the table in the database to query against.
+        the name of the table in the database to query against. If a
+        data_source is a data source, the table_name it was created with.
     greeting : str | Path, optional
         A string in Markdown format, containing the initial message.
         If a pathlib.Path object is passed,
@@ -286,6 +347,8 @@ def init(
           `data_source.get_schema()`
         - `{{data_description}}`: The optional data description provided
         - `{{extra_instructions}}`: Any additional instructions provided
+        - `{{summary_tables}}`: Whether the data source has summary tables
+          (see `DataFrameSource`), described in `{{schema}}`
     system_prompt_override : str, optional
         A custom system prompt to use instead of the default. If provided,
         `data_description`, `extra_instructions`, and `prompt_template` will be
@@ -305,8 +368,14 @@ def init(
             "Table name must begin with a letter and contain only letters, numbers, and underscores",
         )
 
+    # sqlalchemy is slow to import; if it hasn't been imported, data_source
+    # can't be an Engine
+    sqlalchemy = sys.modules.get("sqlalchemy")
+
     data_source_obj: DataSource
-    if isinstance(data_source, sqlalchemy.Engine):
+    if isinstance(data_source, (DataFrameSource, SQLAlchemySource)):
+        data_source_obj = data_source
+    elif sqlalchemy is not None and isinstance(data_source, sqlalchemy.Engine):
         data_source_obj = SQLAlchemySource(data_source, table_name)
     else:
         data_source_obj = DataFrameSource(
@@ -338,10 +407,10 @@ def init(
         )
 
     # Default chat function if none provided
-    create_chat_callback = create_chat_callback or partial(
-        chatlas.ChatOpenAI,
-        model="gpt-4.1",
-    )
+    if create_chat_callback is None:
+        import chatlas
+
+        create_chat_callback = partial(chatlas.ChatOpenAI, model="gpt-4.1")
 
     return QueryChatConfig(
         data_source=data_source_obj,
@@ -418,6 +487,8 @@ def mod_server(  # noqa: D417
     output: Outputs,
     session: Session,
     querychat_config: QueryChatConfig,
+    *,
+    data_version: Optional[Callable[[], object]] = None,
 ) -> QueryChat:
     """
     Initialize the querychat server.
@@ -426,6 +497,10 @@ def mod_server(  # noqa: D417
     ----------
     querychat_config : QueryChatConfig
         Configuration object from init().
+    data_version : Callable, optional
+        A reactive read of the data's version. When the app swaps new data
+        into the data source, reading this makes the filtered data frame
+        re-run its query.
 
     Returns
     -------
@@ -434,6 +509,8 @@ def mod_server(  # noqa: D417
             - sql: A reactive that returns the current SQL query.
             - title: A reactive that returns the current title.
             - df: A reactive that returns the filtered data frame.
+            - page: A reactive that returns one page of the filtered data frame.
+            - lazy: A reactive that returns the filtered data as a lazy frame.
             - chat: The chat object.
 
     """
@@ -456,11 +533,25 @@ def mod_server(  # noqa: D417
 
     @reactive.calc
     def filtered_df():
+        if data_version is not None:
+            data_version()
         if current_query.get() == "":
             return data_source.get_data()
         else:
             return data_source.execute_query(current_query.get())
 
+    @reactive.calc
+    def filtered_relation():
+        # The previous relation's cursor is freed once its last reader drops it
+        if data_version is not None:
+            data_version()
+        return data_source.get_relation(current_query.get())
+
+    def page(**kwargs) -> tuple[pd.DataFrame, int]:
+        if data_version is not None:
+            data_version()
+        return data_source.get_page(current_query.get(), **kwargs)
+
     # This would handle appending messages to the chat UI
     async def append_output(text):
         async with chat_ui.message_stream_context() as msgstream:
@@ -484,7 +575,7 @@ def mod_server(  # noqa: D417
 
         try:
             # Try the query to see if it errors
-            data_source.execute_query(query)
+            await data_source.execute_query_async(query)
         except Exception as e:
             error_msg = str(e)
             await append_output(f"> Error: {error_msg}\n\n")
@@ -509,7 +600,7 @@ def mod_server(  # noqa: D417
         await append_output(f"\n```sql\n{query}\n```\n\n")
 
         try:
-            result_df = data_source.execute_query(query)
+            result_df = await data_source.execute_query_async(query)
         except Exception as e:
             error_msg = str(e)
             await append_output(f"> Error: {error_msg}\n\n")
@@ -559,4 +650,4 @@ def mod_server(  # noqa: D417
             await chat_ui.append_message_stream(stream)
 
     # Return the interface for other components to use
-    return QueryChat(chat, current_query.get, current_title.get, filtered_df)
+    return QueryChat(chat, current_query.get, current_title.get, filtered_df, page, filtered_relation)
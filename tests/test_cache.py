@@ -0,0 +1,40 @@
+"""
+Versioned caches don't keep values computed from data swapped out meanwhile.
+"""
+
+from __future__ import annotations
+
+import threading
+
+from water_quality.cache import VersionedCache
+
+
+def _compute_across_invalidation(cache: VersionedCache, version: str, keep_version: str) -> str:
+    started, release = threading.Event(), threading.Event()
+
+    def compute() -> str:
+        started.set()
+        release.wait(5)
+        return "value"
+
+    result: list[str] = []
+    thread = threading.Thread(target=lambda: result.append(cache.get_or_compute(version, "key", compute)))
+    thread.start()
+    started.wait(5)
+    cache.invalidate(keep_version)
+    release.set()
+    thread.join(5)
+    return result[0]
+
+
+def test_value_of_invalidated_version_is_returned_not_cached():
+    cache: VersionedCache[str] = VersionedCache("test_stale", maxsize=4)
+    assert _compute_across_invalidation(cache, "old", keep_version="new") == "value"
+    assert cache.get("old", "key") is None
+    assert len(cache) == 0
+
+
+def test_value_of_kept_version_is_cached():
+    cache: VersionedCache[str] = VersionedCache("test_kept", maxsize=4)
+    _compute_across_invalidation(cache, "new", keep_version="new")
+    assert cache.get("new", "key") == "value"
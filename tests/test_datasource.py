@@ -0,0 +1,31 @@
+"""
+Lazy relations stay readable for as long as anything holds them.
+"""
+
+from __future__ import annotations
+
+import gc
+import threading
+
+import narwhals as nw
+import pandas as pd
+
+from querychat.datasource import DataFrameSource
+
+
+def test_relation_outlives_newer_ones():
+    source = DataFrameSource(
+        pd.DataFrame({"beach": ["Bondi", "Coogee", "Manly", "Manly"], "enterococci": [4, 40, 12, 130]}),
+        "samples",
+    )
+    # A reader that chained onto the current relation, and collects it later
+    counted = source.get_relation("SELECT * FROM samples WHERE enterococci > 5").select(nw.len())
+    gc.collect()
+    newer = source.get_relation("SELECT * FROM samples WHERE beach = 'Manly'")
+
+    result: list[int] = []
+    thread = threading.Thread(target=lambda: result.append(counted.collect().item()))
+    thread.start()
+    thread.join(5)
+    assert result == [3]
+    assert len(newer.collect("pandas")) == 2
@@ -0,0 +1,92 @@
+"""
+The data sources' async methods return what their blocking ones do.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pandas as pd
+import pytest
+
+from querychat.datasource import DataFrameSource, SQLAlchemySource
+
+QUERY = "SELECT beach, SUM(enterococci) AS total FROM samples WHERE enterococci > 5 GROUP BY beach ORDER BY beach"
+
+
+@pytest.fixture
+def samples() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "beach": ["Bondi", "Bondi", "Coogee", "Manly", "Manly", "Manly"],
+            "enterococci": [4, 40, 12, 0, 130, 9],
+        }
+    )
+
+
+@pytest.fixture
+def database(tmp_path, samples):
+    sqlalchemy = pytest.importorskip("sqlalchemy")
+    path = tmp_path / "samples.db"
+    engine = sqlalchemy.create_engine(f"sqlite:///{path}")
+    samples.to_sql("samples", engine, index=False)
+    yield path, engine
+    engine.dispose()
+
+
+def test_dataframe_source(samples):
+    source = DataFrameSource(samples, "samples")
+
+    async def run():
+        # Concurrent queries, each on a cursor of its own
+        return await asyncio.gather(
+            source.execute_query_async(QUERY),
+            source.execute_query_async("SELECT * FROM samples WHERE beach = $beach", {"beach": "Manly"}),
+            source.get_data_async(),
+        )
+
+    grouped, manly, data = asyncio.run(run())
+    pd.testing.assert_frame_equal(grouped, source.execute_query(QUERY))
+    assert len(manly) == 3
+    pd.testing.assert_frame_equal(data, samples)
+
+
+def test_sqlalchemy_source_without_async_engine(database):
+    _, engine = database
+    source = SQLAlchemySource(engine, "samples")
+
+    grouped = asyncio.run(source.execute_query_async(QUERY))
+    pd.testing.assert_frame_equal(grouped, source.execute_query(QUERY))
+
+
+def test_sqlalchemy_source_with_async_engine(database, samples, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    pytest.importorskip("greenlet")
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    path, engine = database
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    source = SQLAlchemySource(engine, "samples", async_engine=async_engine)
+    schema = source.get_schema(categorical_threshold=5)
+    # Nothing falls back to the blocking methods
+    monkeypatch.setattr(source, "get_schema", pytest.fail)
+    monkeypatch.setattr(source, "execute_query", pytest.fail)
+
+    async def run():
+        try:
+            return await asyncio.gather(
+                source.execute_query_async(QUERY),
+                source.execute_query_async("SELECT * FROM samples WHERE beach = :beach", {"beach": "Manly"}),
+                source.get_data_async(),
+                source.get_schema_async(categorical_threshold=5),
+            )
+        finally:
+            await async_engine.dispose()
+
+    grouped, manly, data, async_schema = asyncio.run(run())
+    monkeypatch.undo()
+    pd.testing.assert_frame_equal(grouped, source.execute_query(QUERY))
+    assert len(manly) == 3
+    pd.testing.assert_frame_equal(data, samples)
+    assert async_schema == schema
+    assert "Categorical values: 'Bondi', 'Coogee', 'Manly'" in schema
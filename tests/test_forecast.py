@@ -0,0 +1,60 @@
+"""
+The forecasting model follows the data version it was trained on.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from water_quality import forecast
+from water_quality.versioning import DataVersion
+
+pytest.importorskip("sklearn")
+pytest.importorskip("joblib")
+
+
+def samples(days: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    n = days * 3
+    return pd.DataFrame(
+        {
+            "beach": np.repeat(["Bondi", "Coogee", "Manly"], days),
+            "region": "Sydney City",
+            "council": "Waverley Council",
+            "date": np.tile(pd.date_range("2024-01-01", periods=days, freq="D"), 3),
+            "enterococci": rng.gamma(2.0, 10.0, n),
+            "precipitation_mm": rng.gamma(1.0, 5.0, n),
+            "conductivity": rng.normal(50, 3, n),
+            "latitude": np.repeat([-33.89, -33.92, -33.80], days),
+            "longitude": np.repeat([151.27, 151.26, 151.29], days),
+        }
+    )
+
+
+def test_load_or_train_retrains_a_model_of_other_data(tmp_path, monkeypatch):
+    path = tmp_path / "model"
+    forecast.load_or_train(samples(60), path, data_version="v1")
+    with monkeypatch.context() as patch:
+        patch.setattr(forecast, "train", pytest.fail)
+        assert forecast.load_or_train(samples(60), path, data_version="v1").data_version == "v1"
+        # Without a data version, any readable model is used
+        assert forecast.load_or_train(samples(90), path).data_version == "v1"
+
+    second = forecast.load_or_train(samples(90, seed=1), path, data_version="v2")
+    assert second.data_version == "v2" and second.metadata["rows"] == 270
+    assert forecast.Forecaster.load(path).data_version == "v2"
+
+
+def test_retrain_if_stale_updates_in_place(tmp_path):
+    path = tmp_path / "model"
+    model = forecast.load_or_train(samples(60), path, data_version="v1")
+    fitted = model.model
+
+    forecast.retrain_if_stale(model, DataVersion.from_frame("v1", samples(60)), path)
+    assert model.model is fitted
+
+    forecast.retrain_if_stale(model, DataVersion.from_frame("v2", samples(90, seed=1)), path)
+    assert model.model is not fitted
+    assert model.data_version == "v2" and model.metadata["rows"] == 270
@@ -0,0 +1,89 @@
+"""
+Appending ingestion into the partitioned store.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from water_quality import ingest
+
+pytest.importorskip("pyarrow")
+
+STATION = (-33.85, 151.2)
+
+
+def raw_samples(start: str, days: int, sites: int = 4, seed: int = 0) -> pd.DataFrame:
+    """Raw feed rows, one per site and day, in shuffled order."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=days, freq="D")
+    rows = pd.DataFrame(
+        {
+            "region": "Sydney City",
+            "council": "Waverley Council",
+            "swim_site": np.repeat([f"Beach {i}" for i in range(sites)], days),
+            "date": np.tile(dates.strftime("%Y-%m-%d"), sites),
+            "enterococci_cfu_100ml": rng.gamma(2.0, 10.0, sites * days).round(),
+            "water_temperature_c": rng.normal(20, 2, sites * days).round(1),
+            "conductivity_ms_cm": rng.normal(50, 3, sites * days).round(1),
+            "latitude": np.repeat(STATION[0] + np.arange(sites) * 0.01, days),
+            "longitude": np.repeat(STATION[1] + np.arange(sites) * 0.01, days),
+        }
+    )
+    return rows.sample(frac=1, random_state=seed, ignore_index=True)
+
+
+def weather_for(samples: pd.DataFrame) -> pd.DataFrame:
+    dates = pd.to_datetime(samples["date"]).drop_duplicates().sort_values()
+    return pd.DataFrame(
+        {
+            "date": dates.dt.strftime("%Y-%m-%d"),
+            "precipitation_mm": np.linspace(0, 20, len(dates)).round(1),
+            "latitude": STATION[0],
+            "longitude": STATION[1],
+        }
+    )
+
+
+def test_first_run_without_weather_fits_bounds_later(tmp_path):
+    samples = raw_samples("2024-01-01", 90)
+    samples.to_csv(tmp_path / "water_quality.csv", index=False)
+    weather_for(samples).iloc[:0].to_csv(tmp_path / "weather.csv", index=False)
+    store = tmp_path / "store"
+
+    batch = ingest.ingest(store, tmp_path / "water_quality.csv", tmp_path / "weather.csv")
+    manifest = ingest.read_manifest(store)
+    assert batch["rows_in"] == len(samples) and batch["rows_out"] == 0
+    assert manifest["outlier_bounds"] is None
+    assert manifest["watermark"] is None
+
+    # Once the weather is published the samples are merged, cleaned and kept
+    weather_for(samples).to_csv(tmp_path / "weather.csv", index=False)
+    batch = ingest.ingest(store, tmp_path / "water_quality.csv", tmp_path / "weather.csv")
+    manifest = ingest.read_manifest(store)
+    assert batch["rows_out"] > 0.9 * len(samples)
+    assert all(np.isfinite(bound).all() for bound in manifest["outlier_bounds"].values())
+    assert len(ingest.load_store(store)) == batch["rows_out"]
+
+
+def test_one_file_per_partition_per_batch(tmp_path):
+    history, latest = raw_samples("2024-01-01", 120, seed=1), raw_samples("2024-05-01", 61, seed=2)
+    weather = weather_for(pd.concat([history, latest]))
+    weather.to_csv(tmp_path / "weather.csv", index=False)
+    store = tmp_path / "store"
+    kept = 0
+    for i, samples in enumerate([history, latest]):
+        feed = tmp_path / f"water_quality_{i}.csv"
+        samples.to_csv(feed, index=False)
+        # Small chunks of a shuffled feed each span many months
+        kept += ingest.ingest(store, feed, tmp_path / "weather.csv", chunksize=50)["rows_out"]
+
+    manifest = ingest.read_manifest(store)
+    assert set(manifest["partitions"]) == {f"year=2024/month={m:02d}" for m in range(1, 7)}
+    for key, partition in manifest["partitions"].items():
+        batches = {name.split("/")[-1] for name in partition["files"]}
+        assert len(partition["files"]) == len(batches) <= 2, key
+    assert len(list(store.rglob("*.parquet"))) == sum(len(p["files"]) for p in manifest["partitions"].values())
+    assert len(ingest.load_store(store)) == kept
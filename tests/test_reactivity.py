@@ -0,0 +1,168 @@
+"""
+Reactive executions the dashboard saves: `reactivity.debounce` on bursts of
+input changes, and `reactivity.background` on outputs that are hidden.
+"""
+
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from shiny import reactive
+
+from water_quality import offload, reactivity
+
+DELAY = 0.05
+
+
+async def _burst(delay: float, changes: str) -> tuple[list[str], list[str]]:
+    """
+    Change an input once per character of `changes`, faster than `delay`.
+
+    Returns:
+        The values the debounced calc computed, and the values an effect
+        reading it (as a render would) saw
+
+    """
+    council = reactive.value("start")
+    computed: list[str] = []
+    rendered: list[str] = []
+
+    @reactivity.debounce(delay)
+    def selection() -> str:
+        computed.append(council.get())
+        return council.get()
+
+    @reactive.effect
+    def _render():
+        rendered.append(selection())
+
+    await reactive.flush()
+    for value in changes:
+        council.set(value)
+        await reactive.flush()
+        await asyncio.sleep(delay / 5)
+    await asyncio.sleep(delay * 2)
+    await reactive.flush()
+    return computed, rendered
+
+
+def test_burst_renders_first_and_settled_values():
+    computed, rendered = asyncio.run(_burst(DELAY, "abcde"))
+    assert rendered == ["start", "e"]
+    # The calc itself still follows every change, so the last one is known
+    assert computed == ["start", *"abcde"]
+
+
+def test_separate_changes_each_render():
+    async def run():
+        council = reactive.value("start")
+        rendered: list[str] = []
+
+        @reactivity.debounce(DELAY)
+        def selection() -> str:
+            return council.get()
+
+        @reactive.effect
+        def _render():
+            rendered.append(selection())
+
+        await reactive.flush()
+        for value in "ab":
+            council.set(value)
+            await reactive.flush()
+            await asyncio.sleep(DELAY * 2)
+            await reactive.flush()
+        return rendered
+
+    assert asyncio.run(run()) == ["start", "a", "b"]
+
+
+def test_zero_delay_renders_every_change():
+    _, rendered = asyncio.run(_burst(0, "abcde"))
+    assert rendered == ["start", *"abcde"]
+
+
+class _Inputs(dict):
+    # Like a session's inputs: ones the browser hasn't sent read as missing
+    def __missing__(self, name):
+        self[name] = reactive.value()
+        return self[name]
+
+
+class _Session:
+    def __init__(self):
+        self.input = _Inputs()
+
+    def set_hidden(self, output_id: str, hidden: bool) -> None:
+        self.input[f".clientdata_output_{output_id}_hidden"].set(hidden)
+
+
+async def _settle() -> None:
+    for _ in range(5):
+        await reactive.flush()
+        await asyncio.sleep(0.02)
+
+
+def test_shown_reads_visibility():
+    async def run():
+        session = _Session()
+        seen = []
+
+        @reactive.effect
+        def _read():
+            seen.append(reactivity.shown(session, "chart"))
+
+        await reactive.flush()
+        session.set_hidden("chart", True)
+        await reactive.flush()
+        session.set_hidden("chart", False)
+        await reactive.flush()
+        return seen
+
+    # Not reported yet counts as hidden
+    assert asyncio.run(run()) == [False, False, True]
+
+
+@pytest.mark.skipif(offload.MODE == "off", reason="jobs run inline, as plain calcs")
+def test_background_waits_until_an_output_is_shown():
+    async def run():
+        session = _Session()
+        session.set_hidden("chart", True)
+        session.set_hidden("table", True)
+        council = reactive.value(1)
+        jobs: list[int] = []
+        rendered: list[int] = []
+
+        def work(value: int) -> int:
+            jobs.append(value)
+            return value * 10
+
+        @reactivity.background(session, outputs=["chart", "table"])
+        def result():
+            return offload.Job(work, (council.get(),), threads=True)
+
+        @reactive.effect
+        def _render():
+            rendered.append(result())
+
+        await _settle()
+        # Hidden: changes don't start jobs either
+        council.set(2)
+        await _settle()
+        steps = [(list(jobs), list(rendered))]
+
+        session.set_hidden("table", False)
+        await _settle()
+        steps.append((list(jobs), list(rendered)))
+
+        session.set_hidden("table", True)
+        council.set(3)
+        await _settle()
+        steps.append((list(jobs), list(rendered)))
+        return steps
+
+    hidden, shown, hidden_again = asyncio.run(run())
+    assert hidden == ([], [])
+    assert shown == ([2], [20])
+    assert hidden_again == ([2], [20])
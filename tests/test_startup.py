@@ -0,0 +1,29 @@
+"""
+`import app` leaves the modules it loads lazily unimported.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.startup import DEFERRED_MODULES
+from water_quality.data import ROOT
+
+
+def test_import_app_defers_heavy_modules():
+    # Without warm-ups, nothing is imported in the background meanwhile
+    env = {**os.environ, "WQ_QUERYCHAT_WARMUP": "0", "WQ_FORECAST_WARMUP": "0", "WQ_RISK_MAP_WARMUP": "0"}
+    proc = subprocess.run(
+        [sys.executable, "-c", "import app, json, sys; print(json.dumps(sorted(sys.modules)))"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    modules = set(json.loads(proc.stdout.strip().splitlines()[-1]))
+    assert [m for m in DEFERRED_MODULES if m in modules] == []
@@ -0,0 +1,4 @@
+"""
+Data, analysis and performance tooling behind the Sydney beach water quality
+dashboard (`app.py`).
+"""
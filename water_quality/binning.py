@@ -0,0 +1,113 @@
+"""
+Server-side binning of samples into fixed-size grids for plotting.
+
+Scatter plots and heatmaps of raw samples send every point to the browser.
+These functions aggregate the selection on the server instead, into grids
+whose size depends only on the number of bins, so a chart's payload stays
+the same whether ten or ten million samples match. Plot the results with
+`px.imshow`, which draws them as a single heatmap trace.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from .queries import months
+
+# Bins along x and y of the binned scatter
+SCATTER_BINS = (60, 40)
+
+# Enterococci levels labelled on the binned scatter's log axis
+ENTEROCOCCI_TICKS = [0, 10, 40, 130, 500, 2000, 10000]
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+@dataclass(frozen=True)
+class Grid:
+    """Sample counts on a regular 2D grid."""
+
+    x: np.ndarray  # bin centres along x
+    y: np.ndarray  # bin centres along y
+    counts: np.ndarray  # (len(y), len(x))
+
+    @property
+    def total(self) -> int:
+        return int(self.counts.sum())
+
+
+def log_level(enterococci: np.ndarray) -> np.ndarray:
+    """Enterococci on the binned scatter's axis: log10 of the level plus one."""
+    return np.log10(np.maximum(np.asarray(enterococci, dtype="float64"), 0.0) + 1.0)
+
+
+def heatmap_cells(values) -> np.ndarray:
+    """
+    Heatmap cell values with missing (and, for counts, empty) cells as None,
+    which heatmaps leave blank; NaN would break the widget's JSON.
+    """
+    values = np.asarray(values, dtype="float64")
+    return np.where(np.isnan(values), None, values)
+
+
+def binned_scatter(
+    df: pd.DataFrame,
+    x: str,
+    y: str = "enterococci",
+    bins: tuple[int, int] = SCATTER_BINS,
+    log_y: bool = True,
+) -> Grid:
+    """
+    Count samples on a grid of `x` against `y`.
+
+    Args:
+        df: Samples
+        x: Column along the x axis
+        y: Column along the y axis
+        bins: Number of bins along x and y
+        log_y: Bin `log_level(y)` rather than `y`, for skewed levels
+
+    Returns:
+        The grid of counts; empty if no sample has both values
+
+    """
+    xs = df[x].to_numpy(dtype="float64")
+    ys = df[y].to_numpy(dtype="float64")
+    if log_y:
+        ys = log_level(ys)
+    present = ~(np.isnan(xs) | np.isnan(ys))
+    xs, ys = xs[present], ys[present]
+    if len(xs) == 0:
+        return Grid(np.empty(0), np.empty(0), np.empty((0, 0), dtype=np.int64))
+
+    # Widen degenerate ranges so a single value still gets a bin
+    ranges = [(v.min(), v.max()) if v.max() > v.min() else (v.min() - 0.5, v.max() + 0.5) for v in (xs, ys)]
+    counts, x_edges, y_edges = np.histogram2d(xs, ys, bins=bins, range=ranges)
+    return Grid(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        counts=counts.T.astype(np.int64),
+    )
+
+
+def region_month(df: pd.DataFrame, value: str = "enterococci") -> pd.DataFrame:
+    """
+    Mean of `value` per region and calendar month.
+
+    Returns:
+        Regions by `MONTHS`, with missing combinations as NaN
+
+    """
+    return month_grid(df[value].groupby([df["region"].to_numpy(), months(df)]).mean())
+
+
+def month_grid(means: pd.Series) -> pd.DataFrame:
+    """
+    Lay out means indexed by (region, calendar month) as `region_month` does:
+    regions by `MONTHS`, with missing combinations as NaN.
+    """
+    grid = means.unstack().reindex(columns=range(1, 13))
+    grid.columns = MONTHS
+    return grid.rename_axis(index="region", columns="month")
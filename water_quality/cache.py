@@ -0,0 +1,103 @@
+"""Caches of values derived from the dashboard data, invalidated per data version."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+# Every VersionedCache, so a data swap can invalidate them all
+_CACHES: list["VersionedCache"] = []
+
+
+class VersionedCache(Generic[V]):
+    """
+    A small, thread-safe LRU cache of values derived from one data version.
+
+    Keys are `(data_version, key)`; entries for other versions are dropped by
+    `invalidate_all()` when a new data version is swapped in, so results
+    computed from old data are never served and don't pin its memory.
+    """
+
+    def __init__(self, name: str, maxsize: int = 64):
+        """
+        Args:
+            name: Name reported in memory reports
+            maxsize: Maximum number of entries kept
+
+        """
+        self.name = name
+        self.maxsize = maxsize
+        self._entries: OrderedDict[tuple[str, Hashable], V] = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by `invalidate`, which kept the entries of `_kept`
+        self._generation = 0
+        self._kept: Optional[str] = None
+        _CACHES.append(self)
+
+    def get_or_compute(self, version: str, key: Hashable, compute: Callable[[], V]) -> V:
+        """Return the cached value for `(version, key)`, computing it on a miss."""
+        full_key = (version, key)
+        with self._lock:
+            if full_key in self._entries:
+                self._entries.move_to_end(full_key)
+                return self._entries[full_key]
+            generation = self._generation
+        # Computed outside the lock; concurrent misses may compute twice
+        value = compute()
+        with self._lock:
+            # Not cached if its version was invalidated meanwhile, so a
+            # computation that outlived a swap doesn't pin the old data
+            if generation != self._generation and version != self._kept:
+                return value
+            self._put(full_key, value)
+        return value
+
+    def get(self, version: str, key: Hashable) -> Optional[V]:
+        """The cached value for `(version, key)`, or None on a miss."""
+        full_key = (version, key)
+        with self._lock:
+            if full_key not in self._entries:
+                return None
+            self._entries.move_to_end(full_key)
+            return self._entries[full_key]
+
+    def put(self, version: str, key: Hashable, value: V) -> None:
+        """Cache `value` for `(version, key)`, evicting the least recently used entries."""
+        with self._lock:
+            self._put((version, key), value)
+
+    def _put(self, full_key: tuple[str, Hashable], value: V) -> None:
+        self._entries[full_key] = value
+        self._entries.move_to_end(full_key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, keep_version: str | None = None) -> None:
+        """Drop all entries, or all but those of `keep_version`."""
+        with self._lock:
+            self._generation += 1
+            self._kept = keep_version
+            for full_key in list(self._entries):
+                if full_key[0] != keep_version:
+                    del self._entries[full_key]
+
+    def values(self) -> list[V]:
+        with self._lock:
+            return list(self._entries.values())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def all_caches() -> list[VersionedCache]:
+    """Every cache created so far."""
+    return list(_CACHES)
+
+
+def invalidate_all(keep_version: str | None = None) -> None:
+    """Drop the entries of every cache, except those of `keep_version`."""
+    for cache in _CACHES:
+        cache.invalidate(keep_version)
@@ -0,0 +1,399 @@
+"""
+The cleaning steps of `sydney_water_quality.ipynb`, as reusable functions.
+
+Raw TidyTuesday samples are renamed, joined to the day's precipitation,
+reduced to the dashboard columns, stripped of incomplete rows and of IQR
+outliers in enterococci, water temperature and conductivity.
+
+`clean` does this in memory like the notebook. `clean_csv` does it out of
+core for feeds that don't fit in memory: the raw CSV is read once in chunks,
+merged and spooled to a local Parquet file; outlier bounds are fitted from
+mergeable `QuantileSketch`es over the spool; and a single pass filters all
+three columns and writes the output. Memory is bounded by the chunk size and
+the sketches, whatever the size of the feed.
+
+Usage:
+
+    python -m water_quality.cleaning --out data/cleaned.parquet
+    python -m water_quality.cleaning --water-quality water_quality.csv --weather weather.csv --out cleaned.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .data import COLUMNS, DTYPES
+from .weather_join import join_weather
+
+WATER_QUALITY_URL = "https://raw.githubusercontent.com/rfordatascience/tidytuesday/main/data/2025/2025-05-20/water_quality.csv"
+WEATHER_URL = "https://raw.githubusercontent.com/rfordatascience/tidytuesday/main/data/2025/2025-05-20/weather.csv"
+
+# Raw column names to dashboard column names
+RENAME = {
+    "swim_site": "beach",
+    "enterococci_cfu_100ml": "enterococci",
+    "water_temperature_c": "water_temperature",
+    "conductivity_ms_cm": "conductivity",
+}
+
+# Columns filtered for outliers, in the order the notebook filters them
+OUTLIER_COLUMNS = ["enterococci", "water_temperature", "conductivity"]
+
+
+def merge_weather(water_quality: pd.DataFrame, weather: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rename raw samples and join each to its day's precipitation.
+
+    Precipitation comes from the station nearest each sample's site (see
+    `water_quality.weather_join`); with the feed's single station this is the
+    notebook's join on date. Samples on days without weather are dropped, as
+    in the notebook.
+
+    Args:
+        water_quality: Raw samples, with `date` parsed
+        weather: Raw daily weather, with `date` parsed
+
+    Returns:
+        The samples with the dashboard `COLUMNS`
+
+    """
+    samples = water_quality.rename(columns=RENAME)
+    merged = join_weather(samples, weather, windows={})
+    return merged.loc[merged["precipitation_mm"].notna(), COLUMNS]
+
+
+def iqr_bounds(values: Union[pd.Series, QuantileSketch]) -> tuple[float, float]:
+    """The 1.5 × IQR fences of `values`, or of the values a sketch summarizes."""
+    q1 = values.quantile(0.25)
+    q3 = values.quantile(0.75)
+    iqr = q3 - q1
+    return q1 - 1.5 * iqr, q3 + 1.5 * iqr
+
+
+def _round_significant(values: np.ndarray, digits: int) -> np.ndarray:
+    with np.errstate(divide="ignore"):
+        magnitude = np.floor(np.log10(np.abs(values)))
+    magnitude[~np.isfinite(magnitude)] = 0
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(values * scale) / scale
+
+
+class QuantileSketch:
+    """
+    A mergeable summary of a column's distribution, for computing quantiles.
+
+    Keeps the count of every distinct value, so quantiles equal
+    `Series.quantile`'s exactly as long as there are at most `max_values`
+    distinct values (the water quality columns have a few thousand). Beyond
+    that, values are rounded to fewer significant digits and their counts
+    merged, which bounds memory at the cost of a small relative error.
+    Sketches of separate chunks can be combined with `merge`.
+    """
+
+    def __init__(self, max_values: int = 200_000):
+        self.max_values = max_values
+        # Significant digits values are rounded to, once compacted
+        self.digits: Optional[int] = None
+        self._values = np.empty(0)
+        self._counts = np.empty(0, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        return int(self._counts.sum())
+
+    def update(self, values: Union[pd.Series, np.ndarray]) -> None:
+        """Add non-missing `values` to the sketch."""
+        values = np.asarray(values, dtype="float64")
+        values = values[~np.isnan(values)]
+        if self.digits is not None:
+            values = _round_significant(values, self.digits)
+        unique, counts = np.unique(values, return_counts=True)
+        self._add(unique, counts)
+
+    def merge(self, other: QuantileSketch) -> None:
+        """Add the values summarized by `other`."""
+        values = other._values
+        if other.digits is not None and (self.digits is None or other.digits < self.digits):
+            self._compact(other.digits)
+        if self.digits is not None:
+            values = _round_significant(values, self.digits)
+        self._add(values, other._counts)
+
+    def _add(self, values: np.ndarray, counts: np.ndarray) -> None:
+        values, inverse = np.unique(np.concatenate([self._values, values]), return_inverse=True)
+        self._values = values
+        self._counts = np.bincount(
+            inverse, weights=np.concatenate([self._counts, counts]), minlength=len(values)
+        ).astype(np.int64)
+        while len(self._values) > self.max_values:
+            self._compact((self.digits or 7) - 1)
+
+    def _compact(self, digits: int) -> None:
+        self.digits = digits
+        values, inverse = np.unique(_round_significant(self._values, digits), return_inverse=True)
+        self._values = values
+        self._counts = np.bincount(inverse, weights=self._counts, minlength=len(values)).astype(np.int64)
+
+    def quantile(self, q: float) -> float:
+        """The `q` quantile, interpolated linearly like `Series.quantile`."""
+        n = self.count
+        if n == 0:
+            return np.nan
+        rank = (n - 1) * q
+        below = int(np.floor(rank))
+        cumulative = np.cumsum(self._counts)
+        a, b = self._values[np.searchsorted(cumulative, [below, min(below + 1, n - 1)], side="right")]
+        t = rank - below
+        # numpy's lerp, for bit-identical results
+        return float(b - (b - a) * (1 - t)) if t >= 0.5 else float(a + (b - a) * t)
+
+
+def fit_outlier_bounds(
+    df: pd.DataFrame, columns: Iterable[str] = OUTLIER_COLUMNS
+) -> dict[str, tuple[float, float]]:
+    """
+    Fit outlier bounds the way the notebook does.
+
+    Each column's bounds are computed after the previous columns' outliers
+    were removed, matching the notebook's chained `remove_outliers` calls.
+    """
+    bounds = {}
+    for column in columns:
+        bounds[column] = iqr_bounds(df[column])
+        df = apply_bounds(df, {column: bounds[column]})
+    return bounds
+
+
+def fit_outlier_bounds_chunked(
+    chunks: Callable[[], Iterable[pd.DataFrame]],
+    columns: Iterable[str] = OUTLIER_COLUMNS,
+    *,
+    sequential: bool = True,
+    max_values: int = 200_000,
+) -> dict[str, tuple[float, float]]:
+    """
+    Fit outlier bounds over data that is read one chunk at a time.
+
+    Args:
+        chunks: Returns a fresh iterator over the chunks each time it's called
+        columns: Columns to fit bounds for
+        sequential: Fit each column after the previous columns' outliers are
+            removed, as the notebook does, at one pass over the chunks per
+            column. Otherwise fit all columns on the same rows in one pass;
+            the bounds of later columns then come out slightly wider than the
+            notebook's, since they include rows the earlier bounds remove.
+        max_values: Distinct values each `QuantileSketch` keeps exactly
+
+    Returns:
+        The bounds per column
+
+    """
+    bounds: dict[str, tuple[float, float]] = {}
+    if sequential:
+        for column in columns:
+            sketch = QuantileSketch(max_values)
+            for chunk in chunks():
+                sketch.update(apply_bounds(chunk, bounds)[column])
+            bounds[column] = iqr_bounds(sketch)
+        return bounds
+
+    sketches = {column: QuantileSketch(max_values) for column in columns}
+    for chunk in chunks():
+        for column, sketch in sketches.items():
+            sketch.update(chunk[column])
+    return {column: iqr_bounds(sketch) for column, sketch in sketches.items()}
+
+
+def apply_bounds(df: pd.DataFrame, bounds: dict[str, tuple[float, float]]) -> pd.DataFrame:
+    """Keep the rows whose values lie within every column's bounds."""
+    keep = pd.Series(True, index=df.index)
+    for column, (lower, upper) in bounds.items():
+        keep &= df[column].between(lower, upper)
+    return df[keep]
+
+
+def clean(df: pd.DataFrame) -> tuple[pd.DataFrame, dict[str, tuple[float, float]]]:
+    """
+    Drop incomplete rows and outliers from merged samples.
+
+    Returns:
+        The cleaned samples and the outlier bounds that were applied
+
+    """
+    df = df.dropna()
+    bounds = fit_outlier_bounds(df)
+    return apply_bounds(df, bounds), bounds
+
+
+def read_chunks(
+    source: Union[str, Path],
+    chunksize: int = 200_000,
+    since: Optional[pd.Timestamp] = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Read raw samples one chunk at a time.
+
+    Args:
+        source: URL or path of the raw `water_quality.csv`
+        chunksize: Rows parsed per chunk
+        since: Only yield samples dated after this
+
+    Yields:
+        Non-empty chunks of raw samples, with `date` parsed
+
+    """
+    for chunk in pd.read_csv(source, chunksize=chunksize):
+        chunk["date"] = pd.to_datetime(chunk["date"])
+        if since is not None:
+            chunk = chunk[chunk["date"] > since]
+        if not chunk.empty:
+            yield chunk
+
+
+def spool_merged(
+    chunks: Iterable[pd.DataFrame], weather: pd.DataFrame, path: Union[str, Path]
+) -> dict:
+    """
+    Merge raw chunks with the weather, drop incomplete rows and append to a Parquet file.
+
+    Returns:
+        `rows_in` (raw rows read), `rows` (rows spooled), the raw
+        `min_date` and `max_date`, and `max_merged_date`, the latest date
+        of a spooled row (the dates None if there were no such rows)
+
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    stats: dict = {"rows_in": 0, "rows": 0, "min_date": None, "max_date": None, "max_merged_date": None}
+    writer = None
+    try:
+        for chunk in chunks:
+            stats["rows_in"] += len(chunk)
+            lo, hi = chunk["date"].min(), chunk["date"].max()
+            stats["min_date"] = lo if stats["min_date"] is None else min(stats["min_date"], lo)
+            stats["max_date"] = hi if stats["max_date"] is None else max(stats["max_date"], hi)
+
+            merged = merge_weather(chunk, weather).dropna().astype(DTYPES)
+            if not merged.empty:
+                latest = merged["date"].max()
+                stats["max_merged_date"] = max(filter(None, [stats["max_merged_date"], latest]))
+            table = pa.Table.from_pandas(merged, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            stats["rows"] += len(merged)
+    finally:
+        if writer is not None:
+            writer.close()
+    return stats
+
+
+def iter_parquet(path: Union[str, Path], chunksize: int = 200_000) -> Iterator[pd.DataFrame]:
+    """Read a Parquet file in chunks of at most `chunksize` rows."""
+    import pyarrow.parquet as pq
+
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+        yield batch.to_pandas()
+
+
+def clean_csv(
+    water_quality: Union[str, Path],
+    weather: Union[str, Path],
+    out: Union[str, Path],
+    chunksize: int = 200_000,
+    sequential: bool = True,
+) -> dict:
+    """
+    Clean a raw feed out of core and write the result to a CSV or Parquet file.
+
+    Args:
+        water_quality: URL or path of the raw water quality CSV
+        weather: URL or path of the raw weather CSV
+        out: Output file; Parquet if it ends in `.parquet`, CSV otherwise
+        chunksize: Rows held in memory at a time
+        sequential: Fit bounds column by column like the notebook (see
+            `fit_outlier_bounds_chunked`)
+
+    Returns:
+        `rows_in`, `rows_out` and the `bounds` that were applied
+
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    weather_df = pd.read_csv(weather, parse_dates=["date"])
+    out = Path(out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=out.parent) as tmp:
+        spool = Path(tmp) / "merged.parquet"
+        stats = spool_merged(read_chunks(water_quality, chunksize), weather_df, spool)
+        if stats["rows"] == 0:
+            raise ValueError(f"No samples in {water_quality} could be merged with {weather}")
+
+        bounds = fit_outlier_bounds_chunked(
+            lambda: iter_parquet(spool, chunksize), sequential=sequential
+        )
+
+        rows_out = 0
+        writer = None
+        try:
+            for chunk in iter_parquet(spool, chunksize):
+                cleaned = apply_bounds(chunk, bounds)
+                if out.suffix == ".parquet":
+                    table = pa.Table.from_pandas(cleaned, preserve_index=False)
+                    writer = writer or pq.ParquetWriter(out, table.schema)
+                    writer.write_table(table)
+                else:
+                    cleaned.to_csv(
+                        out,
+                        mode="w" if rows_out == 0 else "a",
+                        header=rows_out == 0,
+                        index=False,
+                        date_format="%Y-%m-%d",
+                    )
+                rows_out += len(cleaned)
+        finally:
+            if writer is not None:
+                writer.close()
+    return {"rows_in": stats["rows_in"], "rows_out": rows_out, "bounds": bounds}
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--water-quality", default=WATER_QUALITY_URL)
+    parser.add_argument("--weather", default=WEATHER_URL)
+    parser.add_argument("--out", type=Path, required=True, help="Output .csv or .parquet file")
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    parser.add_argument(
+        "--single-pass-bounds",
+        action="store_true",
+        help="Fit all outlier bounds in one pass instead of column by column",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    result = clean_csv(
+        args.water_quality,
+        args.weather,
+        args.out,
+        args.chunksize,
+        sequential=not args.single_pass_bounds,
+    )
+    print(
+        f"Cleaned {result['rows_in']:,} samples into {result['rows_out']:,} rows "
+        f"in {time.perf_counter() - start:.1f}s; wrote {args.out}"
+    )
+    for column, (lower, upper) in result["bounds"].items():
+        print(f"  {column:<18} [{lower:g}, {upper:g}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,272 @@
+"""
+Rolling compliance statistics per beach.
+
+Guidelines grade beaches on their recent samples rather than all-time
+means: the 95th percentile of enterococci over the last `WINDOW` samples
+(NHMRC microbial assessment categories A to D) and the share of those
+samples above the exceedance threshold.
+
+`ComplianceEngine` keeps each beach's last `WINDOW` values, in date order,
+as a row of a NaN-padded 2D array, so the statistics of every beach come
+from vectorized reductions over the array. New samples
+are appended incrementally: only the rows of the beaches they touch are
+shifted, and history outside the windows is never revisited.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .cache import VersionedCache
+from .queries import ENTEROCOCCI_THRESHOLD
+from .versioning import DataVersion
+
+# Samples per beach that the rolling statistics cover
+WINDOW = 100
+
+# NHMRC microbial assessment categories: upper bound of the 95th percentile
+# (CFU/100mL) per grade; above the last bound is grade D
+GRADES = {"A": 40, "B": 200, "C": 500}
+
+_grades: VersionedCache[pd.DataFrame] = VersionedCache("compliance_grades", maxsize=4)
+
+
+def grade(p95: np.ndarray) -> np.ndarray:
+    """The microbial assessment grade of 95th percentiles ("" where missing)."""
+    p95 = np.asarray(p95, dtype="float64")
+    bounds = np.array(list(GRADES.values()), dtype="float64")
+    labels = np.array([*GRADES, "D"])
+    graded = labels[np.searchsorted(bounds, p95, side="left")]
+    return np.where(np.isnan(p95), "", graded)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """The engine's statistics at one point; replaced, never modified."""
+
+    beaches: np.ndarray  # beach names, one per row
+    rows: dict  # beach name to row
+    values: np.ndarray  # (beaches, window), latest last, NaN-padded on the left
+    counts: np.ndarray  # samples seen per beach, over all time
+    totals: np.ndarray  # sum of enterococci seen per beach, over all time
+    last_date: np.ndarray  # latest sample date per beach
+    region: np.ndarray
+    council: np.ndarray
+    version: Optional[str]  # data version the state was computed from
+
+
+class ComplianceEngine:
+    """Rolling per-beach statistics, updated as samples are appended."""
+
+    def __init__(self, window: int = WINDOW, threshold: float = ENTEROCOCCI_THRESHOLD):
+        self.window = window
+        self.threshold = threshold
+        # Latest sample date and number of samples processed
+        self.watermark: Optional[pd.Timestamp] = None
+        self.rows = 0
+        self._state: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+        # Held for a whole `sync`, which the app runs from several threads
+        self._sync_lock = threading.Lock()
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, window: int = WINDOW) -> ComplianceEngine:
+        engine = cls(window)
+        engine.rebuild(df)
+        return engine
+
+    @classmethod
+    def from_version(cls, version: DataVersion, window: int = WINDOW) -> ComplianceEngine:
+        engine = cls(window)
+        engine.sync(version)
+        return engine
+
+    @property
+    def version(self) -> Optional[str]:
+        """The data version the statistics were last synced to (see `sync`)."""
+        state = self._state
+        return state.version if state is not None else None
+
+    def rebuild(self, df: pd.DataFrame, version: Optional[str] = None) -> None:
+        """Compute the windows of every beach from scratch."""
+        df = df.sort_values(["beach", "date"], kind="stable")
+        tail = df.groupby("beach", observed=True, sort=False).tail(self.window)
+
+        beach_codes, beaches = pd.factorize(tail["beach"], sort=False)
+        # Position of each value from the end of its beach's window
+        from_end = tail.groupby(beach_codes).cumcount(ascending=False).to_numpy()
+        values = np.full((len(beaches), self.window), np.nan)
+        values[beach_codes, self.window - 1 - from_end] = tail["enterococci"].to_numpy(dtype="float64")
+
+        last = tail.groupby(beach_codes).agg(
+            last_date=("date", "last"), region=("region", "last"), council=("council", "last")
+        )
+        seen = df.groupby("beach", observed=True, sort=False).agg(
+            counts=("date", "size"), totals=("enterococci", "sum")
+        ).reindex(beaches)
+        state = Snapshot(
+            beaches=np.asarray(beaches, dtype=object),
+            rows={b: i for i, b in enumerate(beaches)},
+            values=values,
+            counts=seen["counts"].to_numpy(dtype=np.int64),
+            totals=seen["totals"].to_numpy(dtype="float64"),
+            last_date=last["last_date"].to_numpy(),
+            region=last["region"].to_numpy(dtype=object),
+            council=last["council"].to_numpy(dtype=object),
+            version=version,
+        )
+        with self._lock:
+            self._state = state
+            self.watermark = df["date"].max() if len(df) else None
+            self.rows = len(df)
+
+    def append(self, new: pd.DataFrame, version: Optional[str] = None) -> None:
+        """
+        Add samples dated after the watermark.
+
+        Only the windows of the beaches in `new` are touched; unknown beaches
+        get new rows. The state is replaced, not modified, so concurrent
+        readers keep a consistent snapshot.
+        """
+        if self._state is None:
+            self.rebuild(new, version)
+            return
+        if new.empty:
+            with self._lock:
+                self._state = dataclasses.replace(self._state, version=version)
+            return
+        with self._lock:
+            state = self._state
+            new = new.sort_values(["beach", "date"], kind="stable")
+            beaches = list(state.beaches)
+            rows = dict(state.rows)
+            added = [b for b in new["beach"].unique() if b not in rows]
+            for b in added:
+                rows[b] = len(beaches)
+                beaches.append(b)
+
+            pad = np.full((len(added), self.window), np.nan)
+            values = np.vstack([state.values, pad])
+            counts = np.concatenate([state.counts, np.zeros(len(added), dtype=np.int64)])
+            totals = np.concatenate([state.totals, np.zeros(len(added))])
+            last_date = np.concatenate([state.last_date, np.full(len(added), np.datetime64("NaT"))])
+            region = np.concatenate([state.region, np.empty(len(added), dtype=object)])
+            council = np.concatenate([state.council, np.empty(len(added), dtype=object)])
+
+            for beach, group in new.groupby("beach", observed=True, sort=False):
+                row = rows[beach]
+                latest = group["enterococci"].to_numpy(dtype="float64")[-self.window :]
+                k = len(latest)
+                values[row, : self.window - k] = values[row, k:]
+                values[row, self.window - k :] = latest
+                counts[row] += len(group)
+                totals[row] += group["enterococci"].sum()
+                last_date[row] = group["date"].iloc[-1]
+                region[row] = group["region"].iloc[-1]
+                council[row] = group["council"].iloc[-1]
+
+            self._state = Snapshot(
+                np.asarray(beaches, dtype=object),
+                rows,
+                values,
+                counts,
+                totals,
+                last_date,
+                region,
+                council,
+                version,
+            )
+            self.watermark = max(self.watermark, new["date"].max())
+            self.rows += len(new)
+
+    def sync(self, version: DataVersion) -> None:
+        """
+        Bring the engine up to date with a data version.
+
+        Appends the samples after the watermark if the version extends the
+        data the engine has seen (as ingestion does), and rebuilds otherwise.
+        Does nothing if the engine is already at this version.
+        """
+        with self._sync_lock:
+            if self.version == version.id:
+                return
+            df = version.df
+            if self.watermark is not None and self._extends(df):
+                self.append(df[df["date"] > self.watermark], version.id)
+            else:
+                self.rebuild(df, version.id)
+
+    def _extends(self, df: pd.DataFrame) -> bool:
+        # Whether `df`'s samples up to the watermark are the ones seen so far:
+        # the same number, and per beach the same count, latest date and
+        # enterococci total
+        state = self._state
+        seen = df[df["date"] <= self.watermark]
+        if state is None or len(seen) != self.rows:
+            return False
+        per_beach = (
+            seen.groupby("beach", observed=True, sort=False)
+            .agg(counts=("date", "size"), totals=("enterococci", "sum"), last_date=("date", "max"))
+            .reindex(state.beaches)
+        )
+        return bool(
+            (per_beach["counts"].to_numpy() == state.counts).all()
+            and (per_beach["last_date"].to_numpy() == state.last_date).all()
+            and np.allclose(per_beach["totals"].to_numpy(dtype="float64"), state.totals)
+        )
+
+    def snapshot(self) -> Optional[Snapshot]:
+        """The current statistics, consistent with `snapshot().version`."""
+        return self._state
+
+    def current(self, snapshot: Optional[Snapshot] = None) -> pd.DataFrame:
+        """
+        The statistics and grade of every beach.
+
+        Args:
+            snapshot: Statistics taken with `snapshot()`, by default the
+                current ones; `current_grades` caches the table under the
+                snapshot's version
+
+        Returns:
+            One row per beach with `region`, `council`, `grade`, `p95`,
+            `exceedance_rate`, `window_samples`, `samples` and `last_sampled`,
+            worst 95th percentile first
+
+        """
+        state = snapshot if snapshot is not None else self._state
+        if state is None or len(state.beaches) == 0:
+            return pd.DataFrame()
+        values = state.values
+        present = ~np.isnan(values)
+        window_samples = present.sum(axis=1)
+        p95 = np.nanpercentile(values, 95, axis=1)
+        exceedances = (values > self.threshold).sum(axis=1)
+        table = pd.DataFrame(
+            {
+                "beach": state.beaches,
+                "region": state.region,
+                "council": state.council,
+                "grade": grade(p95),
+                "p95": p95.round(1),
+                "exceedance_rate": (exceedances / np.maximum(window_samples, 1)).round(3),
+                "window_samples": window_samples,
+                "samples": state.counts,
+                "last_sampled": pd.to_datetime(state.last_date),
+            }
+        )
+        return table.sort_values("p95", ascending=False, ignore_index=True)
+
+
+def current_grades(engine: ComplianceEngine) -> pd.DataFrame:
+    """`engine.current()`, cached per data version the engine is synced to."""
+    snapshot = engine.snapshot()
+    if snapshot is None or snapshot.version is None:
+        return engine.current(snapshot)
+    return _grades.get_or_compute(snapshot.version, engine.window, lambda: engine.current(snapshot))
@@ -0,0 +1,150 @@
+"""
+Correlations between the numeric measurements, overall or per group.
+
+Answers whether water temperature, conductivity or rainfall move with
+enterococci. Pearson and Spearman coefficients are computed for every pair
+of `COLUMNS` and every group (swim site or season) at once: per-group sums
+of products come from `np.bincount` over the group codes, and Spearman is
+Pearson over ranks taken within each group by one grouped `rank`. Cost is a
+few passes over the rows, however many groups there are. Missing values are
+excluded pairwise, as in `DataFrame.corr`.
+"""
+
+from __future__ import annotations
+
+from typing import Hashable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .cache import VersionedCache
+from .queries import sample_seasons
+
+COLUMNS = ["enterococci", "water_temperature", "conductivity", "precipitation_mm"]
+
+# Groupings besides all samples: name to the key of each sample
+GROUPINGS = {
+    "beach": lambda df: df["beach"],
+    "season": lambda df: pd.Series(sample_seasons(df), index=df.index),
+}
+
+# Groups with fewer complete pairs than this get no coefficient
+MIN_SAMPLES = 10
+
+_correlations: VersionedCache[pd.DataFrame] = VersionedCache("correlations", maxsize=64)
+
+
+def _grouped_pearson(
+    x: np.ndarray, y: np.ndarray, codes: np.ndarray, n_groups: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Pearson's r and the number of complete pairs per group."""
+    complete = ~(np.isnan(x) | np.isnan(y))
+    weight = complete.astype("float64")
+    # Centering on the overall means keeps the sums of squares well conditioned
+    x = np.where(complete, x - np.nanmean(x) if complete.any() else x, 0.0)
+    y = np.where(complete, y - np.nanmean(y) if complete.any() else y, 0.0)
+
+    n = np.bincount(codes, weight, n_groups)
+    sx = np.bincount(codes, x, n_groups)
+    sy = np.bincount(codes, y, n_groups)
+    sxx = np.bincount(codes, x * x, n_groups)
+    syy = np.bincount(codes, y * y, n_groups)
+    sxy = np.bincount(codes, x * y, n_groups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        r = cov / np.sqrt(var_x * var_y)
+    # Constant columns have no correlation (rounding can leave a tiny variance)
+    scale = np.maximum(np.abs(sxx), np.abs(syy)) * 1e-12
+    r[(var_x <= scale) | (var_y <= scale)] = np.nan
+    return np.clip(r, -1.0, 1.0), n.astype(np.int64)
+
+
+def correlations(
+    df: pd.DataFrame,
+    by: Optional[str] = None,
+    columns: Sequence[str] = COLUMNS,
+    min_samples: int = MIN_SAMPLES,
+) -> pd.DataFrame:
+    """
+    Pearson and Spearman correlations of every pair of `columns`.
+
+    Args:
+        df: Samples
+        by: A key of `GROUPINGS` to correlate within each group, or None for
+            all samples together
+        columns: Numeric columns to correlate
+        min_samples: Fewest complete pairs for a coefficient
+
+    Returns:
+        One row per group and pair with the group (column named `by`, if
+        given), `x`, `y`, `samples`, `pearson` and `spearman`
+
+    """
+    if by is None:
+        codes = np.zeros(len(df), dtype=np.intp)
+        groups = pd.Index([None])
+    else:
+        codes, groups = pd.factorize(GROUPINGS[by](df), sort=True)
+    n_groups = len(groups)
+    values = df[list(columns)].to_numpy(dtype="float64")
+
+    # Within-group ranks of every column at once; pairs with missing values
+    # are re-ranked over their complete rows
+    ranked = pd.DataFrame(values).groupby(codes).rank(method="average").to_numpy()
+    complete_columns = ~np.isnan(values).any(axis=0)
+
+    frames = []
+    for i, x in enumerate(columns):
+        for j in range(i + 1, len(columns)):
+            pearson, samples = _grouped_pearson(values[:, i], values[:, j], codes, n_groups)
+            if complete_columns[i] and complete_columns[j]:
+                rx, ry = ranked[:, i], ranked[:, j]
+            else:
+                pair = values[:, [i, j]].copy()
+                pair[np.isnan(pair).any(axis=1)] = np.nan
+                rx, ry = pd.DataFrame(pair).groupby(codes).rank(method="average").to_numpy().T
+            spearman, _ = _grouped_pearson(rx, ry, codes, n_groups)
+            too_few = samples < min_samples
+            pearson[too_few] = np.nan
+            spearman[too_few] = np.nan
+            frames.append(
+                pd.DataFrame(
+                    {
+                        "x": x,
+                        "y": columns[j],
+                        "samples": samples,
+                        "pearson": pearson,
+                        "spearman": spearman,
+                    }
+                )
+            )
+            if by is not None:
+                frames[-1].insert(0, by, groups)
+    return pd.concat(frames, ignore_index=True)
+
+
+def cached_correlations(
+    version: str, selection: Hashable, df: pd.DataFrame, by: Optional[str] = None
+) -> pd.DataFrame:
+    """`correlations` of a selection's samples, cached per data version and selection."""
+    return _correlations.get_or_compute(version, (selection, by), lambda: correlations(df, by))
+
+
+def drivers(table: pd.DataFrame, target: str = "enterococci") -> pd.DataFrame:
+    """
+    The rows of a `correlations` table that involve `target`.
+
+    Returns:
+        The table with `x` replaced by `variable`, the other column of each
+        pair, strongest Spearman correlation first within each group
+
+    """
+    involved = table[(table["x"] == target) | (table["y"] == target)]
+    variable = involved["y"].where(involved["x"] == target, involved["x"])
+    out = involved.drop(columns=["x", "y"]).assign(variable=variable.to_numpy())
+    group = [c for c in out.columns if c in GROUPINGS]
+    out = out.assign(_strength=out["spearman"].abs())
+    out = out.sort_values([*group, "_strength"], ascending=[True] * len(group) + [False])
+    return out.drop(columns="_strength")[[*group, "variable", "samples", "pearson", "spearman"]]
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# The cleaned, merged dataset produced by `sydney_water_quality.ipynb`
+DEFAULT_DATA_PATH = ROOT / "data" / "cleaned_merged_water_quality_weather.csv"
+
+# Dataset the dashboard serves; override to run the app on e.g. synthetic data
+DATA_PATH = Path(os.environ.get("WQ_DATA_PATH", DEFAULT_DATA_PATH))
+
+# Column order of the cleaned dataset; every producer of dashboard data
+# (notebook, synthetic generator, ingestion) writes exactly these columns.
+COLUMNS = [
+    "date",
+    "beach",
+    "council",
+    "region",
+    "enterococci",
+    "water_temperature",
+    "conductivity",
+    "latitude",
+    "longitude",
+    "precipitation_mm",
+]
+
+# Dtypes of the non-date columns, so every file written has the same schema
+DTYPES = {
+    "beach": "str",
+    "council": "str",
+    "region": "str",
+    "enterococci": "float64",
+    "water_temperature": "float64",
+    "conductivity": "float64",
+    "latitude": "float64",
+    "longitude": "float64",
+    "precipitation_mm": "float64",
+}
+
+# Dtypes of the frame the app keeps in memory (see `compact`). Names repeat
+# across millions of samples, so they are dictionary-encoded; the
+# measurements are recorded to at most a few significant digits, well within
+# float32's seven. Coordinates stay float64: float32 would move sites by
+# up to a metre.
+COMPACT_DTYPES = {
+    "beach": "category",
+    "council": "category",
+    "region": "category",
+    "enterococci": "float32",
+    "water_temperature": "float32",
+    "conductivity": "float32",
+    "precipitation_mm": "float32",
+}
+
+# Calendar fields `compact` derives from `date`, so aggregations by year or
+# month don't each extract them again
+CALENDAR_DTYPES = {"year": "int16", "month": "int8"}
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The in-memory form of the dataset: `COMPACT_DTYPES`, plus the
+    `CALENDAR_DTYPES` fields.
+
+    Columns already in their compact dtype are kept as they are, so compacting
+    a frame twice (or one attached from a compact shared file) copies nothing.
+
+    Returns:
+        A new frame with the columns of `df`, followed by `year` and `month`
+
+    """
+    columns = {}
+    for name in df.columns:
+        dtype = COMPACT_DTYPES.get(name)
+        column = df[name]
+        columns[name] = column if dtype is None or column.dtype == dtype else column.astype(dtype)
+    dates = df["date"]
+    if "year" not in columns:
+        columns["year"] = dates.dt.year.to_numpy(dtype=np.int16)
+    if "month" not in columns:
+        columns["month"] = dates.dt.month.to_numpy(dtype=np.int8)
+    return pd.DataFrame(columns, copy=False)
+
+
+def load_dataset(path: Union[str, Path, None] = None) -> pd.DataFrame:
+    """
+    Load the cleaned water quality dataset.
+
+    Args:
+        path: Path to a CSV or Parquet file with the `COLUMNS` schema, or to a
+            store directory written by `water_quality.ingest`; defaults to
+            `DATA_PATH` (the `WQ_DATA_PATH` environment variable, or the
+            cleaned dataset in `data/`)
+
+    Returns:
+        The dataset with `date` parsed as datetime
+
+    """
+    path = Path(path or DATA_PATH)
+    if path.is_dir():
+        from .ingest import load_store
+
+        return load_store(path)
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path)
+    df["date"] = pd.to_datetime(df["date"])
+    return df
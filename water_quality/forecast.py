@@ -0,0 +1,425 @@
+"""
+Enterococci forecasts from the notebook's gradient boosting model.
+
+The notebook fits a `GradientBoostingRegressor` on precipitation,
+conductivity, month and coordinates and discards it. Here the model is
+trained once and persisted as a versioned artifact: the fitted model
+(`<path>.joblib`) plus JSON metadata (`<path>.json`) recording the artifact
+format, the feature schema, training data and metrics. Loading checks the
+schema, so a model trained on different features is never scored, and the
+app retrains the model when the data version it was trained on is replaced
+(`retrain_if_stale`).
+
+Forecasts score every site for each of the coming days in one `predict`
+call over a sites × days feature matrix. Future conductivity and rain are
+not observed, so each site uses the median of its recent conductivity
+samples, and each day a rain scenario: a supplied forecast, or by default
+the median daily rainfall of that calendar month in the data. Forecasts are
+cached per data version.
+
+Usage:
+
+    python -m water_quality.forecast train
+    python -m water_quality.forecast predict --days 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .cache import VersionedCache
+from .data import ROOT
+from .queries import ENTEROCOCCI_THRESHOLD
+
+if TYPE_CHECKING:
+    from sklearn.ensemble import GradientBoostingRegressor
+
+    from .versioning import DataVersion
+
+logger = logging.getLogger(__name__)
+
+# Model inputs, in the order the model expects them
+FEATURES = ["precipitation_mm", "conductivity", "month", "latitude", "longitude"]
+TARGET = "enterococci"
+
+# Bumped when the artifact layout or the meaning of FEATURES changes
+ARTIFACT_FORMAT = 1
+
+# Where the app keeps its model; `.joblib` and `.json` are added
+MODEL_PATH = Path(os.environ.get("WQ_MODEL_PATH", ROOT / "models" / "enterococci_gbr"))
+
+# Levels the beach map colours by; predictions above the threshold are high risk
+RISK_LEVELS = {"Low": 40, "Moderate": ENTEROCOCCI_THRESHOLD}
+
+# Recent samples per site whose median conductivity a forecast assumes
+RECENT_SAMPLES = 10
+
+_forecasts: VersionedCache[pd.DataFrame] = VersionedCache("forecasts", maxsize=16)
+
+
+def features(df: pd.DataFrame) -> np.ndarray:
+    """The `FEATURES` matrix of samples with a parsed `date`."""
+    return np.column_stack(
+        [
+            df["precipitation_mm"].to_numpy(dtype="float64"),
+            df["conductivity"].to_numpy(dtype="float64"),
+            df["date"].dt.month.to_numpy(dtype="float64"),
+            df["latitude"].to_numpy(dtype="float64"),
+            df["longitude"].to_numpy(dtype="float64"),
+        ]
+    )
+
+
+@dataclass
+class Forecaster:
+    """A trained model and the metadata of its artifact."""
+
+    model: GradientBoostingRegressor
+    metadata: dict
+
+    @property
+    def version(self) -> str:
+        return self.metadata["version"]
+
+    @property
+    def data_version(self) -> Optional[str]:
+        """Identifier of the data the model was trained on, if recorded."""
+        return self.metadata.get("data_version")
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Predicted enterococci (CFU/100mL) for a `FEATURES` matrix, clipped at 0."""
+        return np.clip(self.model.predict(X), 0, None)
+
+    def save(self, path: Union[str, Path] = MODEL_PATH) -> Path:
+        """
+        Write the model and its metadata next to each other.
+
+        Each file is written under a name of this process's and renamed into
+        place, so workers training at once never leave (or load) a partial
+        file.
+        """
+        import joblib
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        model_path, metadata_path = path.with_suffix(".joblib"), path.with_suffix(".json")
+        tmp = model_path.with_name(f".{model_path.name}.{os.getpid()}.tmp")
+        joblib.dump(self.model, tmp)
+        os.replace(tmp, model_path)
+        # Metadata last: its presence marks a complete artifact
+        tmp = metadata_path.with_name(f".{metadata_path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(self.metadata, indent=2))
+        os.replace(tmp, metadata_path)
+        return path
+
+    @classmethod
+    def load(cls, path: Union[str, Path] = MODEL_PATH) -> Forecaster:
+        """
+        Load a saved model.
+
+        Raises:
+            FileNotFoundError: If there is no artifact at `path`
+            ValueError: If the artifact's format or features don't match
+                this version of the code, or it was saved by another
+                version of scikit-learn, whose pickles aren't compatible
+
+        """
+        import joblib
+        import sklearn
+
+        path = Path(path)
+        metadata = json.loads(path.with_suffix(".json").read_text())
+        if metadata.get("format") != ARTIFACT_FORMAT or metadata.get("features") != FEATURES:
+            raise ValueError(
+                f"Model at {path} has format {metadata.get('format')} and features "
+                f"{metadata.get('features')}; expected format {ARTIFACT_FORMAT} and "
+                f"features {FEATURES}. Retrain it."
+            )
+        if metadata.get("sklearn_version") != sklearn.__version__:
+            raise ValueError(
+                f"Model at {path} was saved by scikit-learn {metadata.get('sklearn_version')}; "
+                f"this is {sklearn.__version__}. Retrain it."
+            )
+        return cls(joblib.load(path.with_suffix(".joblib")), metadata)
+
+
+def train(
+    df: pd.DataFrame,
+    *,
+    max_rows: Optional[int] = 200_000,
+    test_size: float = 0.2,
+    random_state: int = 42,
+    data_version: Optional[str] = None,
+) -> Forecaster:
+    """
+    Train the model the way the notebook does, and evaluate it on a holdout.
+
+    Args:
+        df: Cleaned samples
+        max_rows: Train on a random sample of at most this many rows, which
+            keeps training to seconds on large datasets (None for all)
+        test_size: Fraction of rows held out for the metrics
+        random_state: Seed for sampling, the split and the model
+        data_version: Identifier of the data, recorded in the metadata
+
+    Returns:
+        The trained model and its metadata
+
+    """
+    import sklearn
+    from sklearn.ensemble import GradientBoostingRegressor
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.model_selection import train_test_split
+
+    data = df.dropna(subset=["date", TARGET, *[f for f in FEATURES if f != "month"]])
+    if max_rows is not None and len(data) > max_rows:
+        data = data.sample(max_rows, random_state=random_state)
+
+    X, y = features(data), data[TARGET].to_numpy(dtype="float64")
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=test_size, random_state=random_state
+    )
+    started = time.perf_counter()
+    model = GradientBoostingRegressor(random_state=random_state).fit(X_train, y_train)
+    trained_at = datetime.now(timezone.utc)
+    y_pred = model.predict(X_test)
+
+    metadata = {
+        "format": ARTIFACT_FORMAT,
+        "version": trained_at.strftime("%Y%m%dT%H%M%SZ"),
+        "trained_at": trained_at.isoformat(timespec="seconds"),
+        "model": "GradientBoostingRegressor",
+        "sklearn_version": sklearn.__version__,
+        "features": FEATURES,
+        "target": TARGET,
+        "data_version": data_version,
+        "rows": len(data),
+        "date_range": [data["date"].min().date().isoformat(), data["date"].max().date().isoformat()],
+        "train_seconds": round(time.perf_counter() - started, 2),
+        "metrics": {
+            "mse": float(mean_squared_error(y_test, y_pred)),
+            "r2": float(r2_score(y_test, y_pred)),
+        },
+    }
+    return Forecaster(model, metadata)
+
+
+def load_or_train(
+    df: pd.DataFrame, path: Union[str, Path] = MODEL_PATH, data_version: Optional[str] = None
+) -> Forecaster:
+    """
+    Load the model at `path`, or train and save one if it's missing, stale or
+    unreadable.
+
+    With `data_version`, a model trained on other data counts as stale too.
+    """
+    try:
+        forecaster = Forecaster.load(path)
+        if data_version is None or forecaster.data_version == data_version:
+            return forecaster
+        logger.info(
+            "Model at %s was trained on data version %s; retraining it on %s",
+            path,
+            forecaster.data_version,
+            data_version,
+        )
+    except FileNotFoundError:
+        pass
+    except Exception:
+        # Stale (see `Forecaster.load`), or a file that doesn't unpickle
+        logger.warning("Can't use the model at %s; retraining it", path, exc_info=True)
+    forecaster = train(df, data_version=data_version)
+    forecaster.save(path)
+    return forecaster
+
+
+def retrain_if_stale(forecaster: Forecaster, version: DataVersion, path: Union[str, Path] = MODEL_PATH) -> None:
+    """
+    Bring `forecaster` up to date with a data version, in place.
+
+    Does nothing if it was trained on `version`; otherwise takes the model at
+    `path` if another worker already retrained it, or trains and saves one
+    (see `load_or_train`). Forecasts keep using the old model meanwhile.
+    """
+    if forecaster.data_version == version.id:
+        return
+    fresh = load_or_train(version.df, path, data_version=version.id)
+    # The model before the metadata: a forecast made in between is cached
+    # under the old model's version, which nothing reads any more
+    forecaster.model = fresh.model
+    forecaster.metadata = fresh.metadata
+
+
+def site_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Per site: coordinates and the median conductivity of its recent samples."""
+    recent = df.sort_values("date", kind="stable").groupby("beach", observed=True).tail(RECENT_SAMPLES)
+    sites = recent.groupby("beach", observed=True, sort=True).agg(
+        latitude=("latitude", "first"),
+        longitude=("longitude", "first"),
+        conductivity=("conductivity", "median"),
+    )
+    return sites.reset_index()
+
+
+def rain_climatology(df: pd.DataFrame) -> pd.Series:
+    """Median daily rainfall per calendar month, over the sampled days."""
+    daily = df.drop_duplicates("date")
+    return daily.groupby(daily["date"].dt.month)["precipitation_mm"].median()
+
+
+def risk(predicted: np.ndarray) -> np.ndarray:
+    """Risk level of predicted enterococci, using the beach map's colour levels."""
+    return np.where(
+        predicted <= RISK_LEVELS["Low"],
+        "Low",
+        np.where(predicted <= RISK_LEVELS["Moderate"], "Moderate", "High"),
+    )
+
+
+def forecast(
+    forecaster: Forecaster,
+    df: pd.DataFrame,
+    days: int = 3,
+    start: Optional[pd.Timestamp] = None,
+    rain: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """
+    Forecast enterococci at every site for each of the coming days.
+
+    Args:
+        forecaster: A trained model
+        df: Cleaned samples, for the sites and their recent conductivity
+        days: Number of days to forecast
+        start: First forecast day; defaults to today
+        rain: Expected rainfall (mm) per forecast day, indexed by date;
+            defaults to the month's median from `rain_climatology`
+
+    Returns:
+        One row per site and day with `beach`, `date`, `predicted` and `risk`
+
+    """
+    sites = site_features(df)
+    start = pd.Timestamp.today().normalize() if start is None else pd.Timestamp(start)
+    dates = pd.date_range(start, periods=days, freq="D")
+    if rain is None:
+        climatology = rain_climatology(df)
+        rain_by_day = climatology.reindex(dates.month).fillna(0.0).to_numpy()
+    else:
+        rain_by_day = rain.reindex(dates).fillna(0.0).to_numpy(dtype="float64")
+
+    # Sites × days, site-major, scored in a single call
+    n_sites = len(sites)
+    X = np.column_stack(
+        [
+            np.tile(rain_by_day, n_sites),
+            np.repeat(sites["conductivity"].to_numpy(dtype="float64"), days),
+            np.tile(dates.month.to_numpy(dtype="float64"), n_sites),
+            np.repeat(sites["latitude"].to_numpy(dtype="float64"), days),
+            np.repeat(sites["longitude"].to_numpy(dtype="float64"), days),
+        ]
+    )
+    predicted = forecaster.predict(X)
+    return pd.DataFrame(
+        {
+            "beach": np.repeat(sites["beach"].to_numpy(), days),
+            "date": np.tile(dates.to_numpy(), n_sites),
+            "predicted": predicted.round(1),
+            "risk": risk(predicted),
+        }
+    )
+
+
+def cached_forecast(version: DataVersion, forecaster: Forecaster, days: int = 3) -> pd.DataFrame:
+    """`forecast` for a data version, from today, computed once per version, model and day."""
+    start = pd.Timestamp.today().normalize()
+    return _forecasts.get_or_compute(
+        version.id,
+        (forecaster.version, days, start),
+        lambda: forecast(forecaster, version.df, days=days, start=start),
+    )
+
+
+def observed_vs_forecast(samples: pd.DataFrame, predictions: pd.DataFrame) -> pd.DataFrame:
+    """
+    Observed levels of the sampled sites next to their forecast.
+
+    Args:
+        samples: The samples whose sites to show, e.g. the filtered selection
+        predictions: Output of `forecast`
+
+    Returns:
+        One row per site with its mean and latest observed enterococci and a
+        "predicted (risk)" column per forecast day, riskiest sites first
+
+    """
+    if samples.empty:
+        return pd.DataFrame()
+    observed = samples.sort_values("date", kind="stable").groupby("beach", observed=True).agg(
+        observed_mean=("enterococci", "mean"),
+        latest=("enterococci", "last"),
+        latest_date=("date", "last"),
+    )
+    predictions = predictions[predictions["beach"].isin(observed.index)]
+    labels = predictions["predicted"].map("{:.0f}".format) + " (" + predictions["risk"] + ")"
+    by_day = (
+        predictions.assign(label=labels, day=predictions["date"].dt.strftime("%a %d %b"))
+        .pivot(index="beach", columns="day", values="label")
+        .reindex(columns=predictions["date"].drop_duplicates().dt.strftime("%a %d %b"))
+    )
+    worst = predictions.groupby("beach")["predicted"].max()
+    table = observed.join(by_day, how="inner")
+    table = table.loc[worst.reindex(table.index).sort_values(ascending=False).index]
+    table["observed_mean"] = table["observed_mean"].round(1)
+    table["latest_date"] = table["latest_date"].dt.strftime("%Y-%m-%d")
+    return table.reset_index().rename(
+        columns={
+            "beach": "Swim Site",
+            "observed_mean": "Observed mean",
+            "latest": "Latest sample",
+            "latest_date": "Sampled on",
+        }
+    )
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    from .data import load_dataset
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("command", choices=["train", "predict"])
+    parser.add_argument("--data", type=Path, default=None, help="Dataset (default: WQ_DATA_PATH)")
+    parser.add_argument("--model", type=Path, default=MODEL_PATH)
+    parser.add_argument("--max-rows", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    df = load_dataset(args.data)
+    if args.command == "train":
+        forecaster = train(df, max_rows=args.max_rows)
+        forecaster.save(args.model)
+        metrics = forecaster.metadata["metrics"]
+        print(
+            f"Trained model {forecaster.version} on {forecaster.metadata['rows']:,} rows "
+            f"(MSE {metrics['mse']:.1f}, R² {metrics['r2']:.3f}); saved to {args.model}"
+        )
+    else:
+        forecaster = Forecaster.load(args.model)
+        start = time.perf_counter()
+        predictions = forecast(forecaster, df, days=args.days)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(predictions.sort_values("predicted", ascending=False).head(20).to_string(index=False))
+        print(f"{len(predictions):,} predictions in {elapsed_ms:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""
+Appending ingestion of the water quality feed into a partitioned store.
+
+Instead of re-merging and rewriting the whole cleaned CSV, each run takes
+only the samples dated after the store's watermark, cleans them with the
+notebook's steps (`water_quality.cleaning`) and appends them as new Parquet
+files in month partitions (`year=YYYY/month=MM/`). Merging, cleaning and
+writing therefore scale with the new data, not with history. Reading does
+not: the raw feed is a single CSV with no index or order to seek by, so
+every run downloads and parses all of it, and drops the rows on or before
+the watermark as it goes. It does so in chunks: the new rows are merged and
+spooled to a local Parquet file, and fitting bounds and writing partitions
+read the spool a chunk at a time, so memory stays bounded even for the
+first, full-history run.
+
+The store's `manifest.json` records the watermark, the outlier bounds fitted
+on the first (backfill) run with merged samples and reused for every later
+batch, and the files of each partition (one per batch). It is replaced atomically after a batch's files are
+written, so readers never see a partial batch.
+
+The watermark is the latest date of a sample merged with its weather, so
+samples whose weather hasn't been published yet are read again, and merged,
+by a later run. Samples that arrive late, dated on or before the watermark,
+are skipped.
+
+Usage:
+
+    python -m water_quality.ingest --store data/store
+    python -m water_quality.ingest --store data/store --water-quality new_samples.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from . import cleaning
+from .data import COLUMNS, DTYPES
+
+MANIFEST = "manifest.json"
+
+
+def read_manifest(store: Union[str, Path]) -> dict:
+    """The store's manifest, or an empty one for a new store."""
+    path = Path(store) / MANIFEST
+    if not path.exists():
+        return {
+            "version": 0,
+            "watermark": None,
+            "rows": 0,
+            "outlier_bounds": None,
+            "partitions": {},
+            "batches": [],
+        }
+    return json.loads(path.read_text())
+
+
+def _write_manifest(store: Path, manifest: dict) -> None:
+    tmp = store / f".{MANIFEST}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, store / MANIFEST)
+
+
+def read_weather(source: Union[str, Path], since: Optional[pd.Timestamp]) -> pd.DataFrame:
+    """Daily weather after `since` (the whole series if None)."""
+    weather = pd.read_csv(source, usecols=["date", "precipitation_mm", "latitude", "longitude"])
+    weather["date"] = pd.to_datetime(weather["date"])
+    if since is not None:
+        weather = weather[weather["date"] > since]
+    return weather
+
+
+class _PartitionWriter:
+    """
+    Appends a batch's samples to the store, one file per month partition.
+
+    Chunks of an unsorted feed touch many months each; every partition's
+    rows go to a single Parquet file for the whole batch, written a row
+    group per chunk, rather than to a small file per chunk.
+    """
+
+    def __init__(self, store: Path, batch: int, manifest: dict):
+        self.store = store
+        self.name = f"part-{batch:05d}.parquet"
+        self.manifest = manifest
+        self._writers: dict = {}
+
+    def write(self, df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        months = df["date"].dt.to_period("M")
+        for month, part in df.groupby(months, sort=True):
+            key = f"year={month.year:04d}/month={month.month:02d}"
+            table = pa.Table.from_pandas(part.astype(DTYPES), preserve_index=False)
+            writer = self._writers.get(key)
+            if writer is None:
+                directory = self.store / key
+                directory.mkdir(parents=True, exist_ok=True)
+                writer = self._writers[key] = pq.ParquetWriter(directory / self.name, table.schema)
+            writer.write_table(table)
+
+            partition = self.manifest["partitions"].setdefault(
+                key, {"files": [], "rows": 0, "min_date": None, "max_date": None}
+            )
+            if f"{key}/{self.name}" not in partition["files"]:
+                partition["files"].append(f"{key}/{self.name}")
+            partition["rows"] += len(part)
+            lo, hi = part["date"].min().date().isoformat(), part["date"].max().date().isoformat()
+            partition["min_date"] = min(filter(None, [partition["min_date"], lo]))
+            partition["max_date"] = max(filter(None, [partition["max_date"], hi]))
+
+    def close(self) -> None:
+        for writer in self._writers.values():
+            writer.close()
+        self._writers.clear()
+
+
+def ingest(
+    store: Union[str, Path],
+    water_quality: Union[str, Path] = cleaning.WATER_QUALITY_URL,
+    weather: Union[str, Path] = cleaning.WEATHER_URL,
+    chunksize: int = 200_000,
+) -> dict:
+    """
+    Ingest the samples newer than the store's watermark.
+
+    Args:
+        store: Store directory; created on the first run
+        water_quality: URL or path of the raw water quality CSV
+        weather: URL or path of the raw weather CSV
+        chunksize: Rows of the raw feed parsed per chunk
+
+    Returns:
+        The batch record added to the manifest (with `rows_out` 0 and no
+        files written if there was nothing new)
+
+    """
+    store = Path(store)
+    store.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(store)
+    watermark = pd.Timestamp(manifest["watermark"]) if manifest["watermark"] else None
+
+    started = time.perf_counter()
+    batch = {
+        "id": manifest["version"] + 1,
+        "ingested_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "rows_in": 0,
+        "rows_out": 0,
+    }
+    with tempfile.TemporaryDirectory(dir=store, prefix=".spool-") as tmp:
+        spool = Path(tmp) / "merged.parquet"
+        raw = cleaning.read_chunks(water_quality, chunksize, since=watermark)
+        stats = cleaning.spool_merged(raw, read_weather(weather, watermark), spool)
+        batch["rows_in"] = stats["rows_in"]
+        if stats["rows_in"] == 0:
+            return batch
+
+        def chunks():
+            return cleaning.iter_parquet(spool, chunksize)
+
+        # Nothing merged (no weather for the new samples yet): there is nothing
+        # to write, or to fit bounds on, until a later run
+        if stats["rows"] > 0:
+            if manifest["outlier_bounds"] is None:
+                # The first run with merged samples is the backfill: fit the
+                # bounds on the full history
+                fitted = cleaning.fit_outlier_bounds_chunked(chunks)
+                if not all(np.isfinite(b).all() for b in fitted.values()):
+                    raise ValueError(
+                        f"Outlier bounds fitted on {stats['rows']:,} samples aren't finite: {fitted}"
+                    )
+                manifest["outlier_bounds"] = {c: list(b) for c, b in fitted.items()}
+            bounds = {c: tuple(b) for c, b in manifest["outlier_bounds"].items()}
+
+            writer = _PartitionWriter(store, batch["id"], manifest)
+            try:
+                for chunk in chunks():
+                    cleaned = cleaning.apply_bounds(chunk, bounds).sort_values("date", kind="stable")
+                    if not cleaned.empty:
+                        writer.write(cleaned[COLUMNS])
+                        batch["rows_out"] += len(cleaned)
+            finally:
+                writer.close()
+
+    batch.update(
+        min_date=stats["min_date"].date().isoformat(),
+        max_date=stats["max_date"].date().isoformat(),
+        seconds=round(time.perf_counter() - started, 3),
+    )
+
+    # The watermark follows the merged rows, so rows rejected by the cleaning
+    # bounds aren't read again, but samples still waiting for their day's
+    # weather are
+    if stats["max_merged_date"] is not None:
+        manifest["watermark"] = stats["max_merged_date"].date().isoformat()
+    manifest["version"] = batch["id"]
+    manifest["rows"] += batch["rows_out"]
+    manifest["batches"].append(batch)
+    _write_manifest(store, manifest)
+    return batch
+
+
+def load_store(store: Union[str, Path]) -> pd.DataFrame:
+    """
+    Read every sample in the store, in date order.
+
+    Only files listed in the manifest are read, so files of an interrupted
+    ingest are ignored.
+    """
+    store = Path(store)
+    manifest = read_manifest(store)
+    files = [
+        store / f
+        for key in sorted(manifest["partitions"])
+        for f in manifest["partitions"][key]["files"]
+    ]
+    if not files:
+        return pd.DataFrame({c: pd.Series(dtype=DTYPES.get(c, "datetime64[ns]")) for c in COLUMNS})
+    df = pd.concat([pd.read_parquet(f) for f in files], ignore_index=True)
+    return df.sort_values("date", kind="stable", ignore_index=True)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--store", type=Path, default=Path("data") / "store")
+    parser.add_argument("--water-quality", default=cleaning.WATER_QUALITY_URL)
+    parser.add_argument("--weather", default=cleaning.WEATHER_URL)
+    parser.add_argument("--chunksize", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    batch = ingest(args.store, args.water_quality, args.weather, args.chunksize)
+    if batch["rows_in"] == 0:
+        print(f"No new samples since the watermark; {args.store} is up to date.")
+    else:
+        print(
+            f"Batch {batch['id']}: {batch['rows_in']:,} new samples "
+            f"({batch['min_date']} to {batch['max_date']}), {batch['rows_out']:,} kept "
+            f"after cleaning, in {batch['seconds']:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Deferred(Generic[T]):
+    """
+    A value built on first use, at most once, from any thread.
+
+    Lets expensive startup work (like profiling the data for the querychat
+    system prompt) happen when it is first needed, or in the background via
+    `warm_up()`, instead of while the app is being imported.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: Optional[str] = None):
+        """
+        Args:
+            factory: Builds the value; called at most once
+            name: Name of the warm-up thread
+
+        """
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "deferred")
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._ready = False
+
+    def get(self) -> T:
+        """Return the value, building it (or waiting for a warm-up) if needed."""
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self._value = self._factory()
+                    self._ready = True
+        return self._value  # type: ignore[return-value]
+
+    async def get_async(self) -> T:
+        """Return the value, building it (or waiting for a warm-up) in a worker thread if needed."""
+        if self._ready:
+            return self._value  # type: ignore[return-value]
+        return await asyncio.to_thread(self.get)
+
+    def update(self, fn: Callable[[T], None]) -> None:
+        """
+        Apply `fn` to the value if it has been built.
+
+        A build in progress is waited for and then updated too, so a value
+        whose inputs change while it is being built doesn't keep the old
+        ones; one not started yet will read the new inputs when it is.
+        """
+        with self._lock:
+            if self._ready:
+                fn(self._value)  # type: ignore[arg-type]
+
+    def ready(self) -> bool:
+        """Whether the value has been built."""
+        return self._ready
+
+    def warm_up(self) -> threading.Thread:
+        """Build the value on a background daemon thread."""
+        thread = threading.Thread(target=self.get, name=f"warm-up-{self._name}", daemon=True)
+        thread.start()
+        return thread
@@ -0,0 +1,165 @@
+"""
+Where the dashboard's memory goes: bytes per column of the data frame and
+per cache of derived values.
+
+    python -m water_quality.memory
+
+prints the bytes per column of the dataset as loaded from disk and in the
+compact form the app keeps (`water_quality.data.compact`). The caches are
+only filled in the running app: with `WQ_MEMORY_LOG_INTERVAL` set, it logs
+the full report every that many seconds (see `log_reports`).
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import numpy as np
+import pandas as pd
+
+from .cache import all_caches
+from .data import compact, load_dataset
+
+logger = logging.getLogger(__name__)
+
+
+def deep_bytes(value: Any, _seen: Optional[set] = None) -> int:
+    """
+    Approximate bytes held by a value, following containers and object
+    attributes; objects reached twice are counted once.
+    """
+    seen = set() if _seen is None else _seen
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if isinstance(value, pd.DataFrame) else usage)
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            deep_bytes(k, seen) + deep_bytes(v, seen) for k, v in value.items()
+        )
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(deep_bytes(v, seen) for v in value)
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return sys.getsizeof(value) + deep_bytes(vars(value), seen)
+    return sys.getsizeof(value)
+
+
+def column_bytes(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns:
+        One row per column with its `dtype` and `bytes`, largest first
+
+    """
+    usage = df.memory_usage(deep=True, index=False)
+    table = pd.DataFrame(
+        {"column": usage.index, "dtype": [str(df[c].dtype) for c in usage.index], "bytes": usage.to_numpy()}
+    )
+    return table.sort_values("bytes", ascending=False, ignore_index=True)
+
+
+def cache_bytes() -> pd.DataFrame:
+    """
+    Returns:
+        One row per `VersionedCache` with its `entries` and `bytes`, largest
+        first
+
+    """
+    rows = [
+        {"cache": cache.name, "entries": len(cache), "bytes": deep_bytes(cache.values())}
+        for cache in all_caches()
+    ]
+    table = pd.DataFrame(rows, columns=["cache", "entries", "bytes"])
+    return table.sort_values("bytes", ascending=False, ignore_index=True)
+
+
+def column_report(df: pd.DataFrame) -> pd.DataFrame:
+    """The column rows of `memory_report(df)`."""
+    columns = column_bytes(df).rename(columns={"column": "name", "dtype": "detail"})
+    return columns.assign(kind="column")[["kind", "name", "detail", "bytes"]]
+
+
+def memory_report(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bytes held by the data frame, per column, and by each cache of values
+    derived from it.
+
+    Returns:
+        One row per column (`kind` "column", `detail` its dtype) and per
+        cache (`kind` "cache", `detail` its number of entries), with `name`
+        and `bytes`
+
+    """
+    caches = cache_bytes().rename(columns={"cache": "name", "entries": "detail"})
+    caches["detail"] = caches["detail"].map(lambda n: f"{n} entries")
+    return pd.concat(
+        [column_report(df), caches.assign(kind="cache")[["kind", "name", "detail", "bytes"]]],
+        ignore_index=True,
+    )
+
+
+def summary(report: pd.DataFrame) -> str:
+    """One line of a `memory_report`: the total per kind, then each cache's bytes."""
+    mib = report.groupby("kind")["bytes"].sum() / 2**20
+    caches = report[(report["kind"] == "cache") & (report["bytes"] > 0)]
+    line = f"data {mib.get('column', 0):.1f} MiB, caches {mib.get('cache', 0):.1f} MiB"
+    if len(caches):
+        line += " (" + ", ".join(
+            f"{row.name} {row.bytes / 2**20:.1f} MiB in {row.detail}" for row in caches.itertuples()
+        ) + ")"
+    return line
+
+
+def log_reports(data: Callable[[], pd.DataFrame], interval: float) -> threading.Thread:
+    """
+    Log the `summary` of `memory_report(data())` every `interval` seconds, at
+    INFO, on a background daemon thread.
+
+    Args:
+        data: Returns the data frame the app currently serves
+
+    """
+
+    def run() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                logger.info("Memory: %s", summary(memory_report(data())))
+            except Exception:
+                logger.exception("Reporting memory use failed")
+
+    thread = threading.Thread(target=run, name="memory-report", daemon=True)
+    thread.start()
+    return thread
+
+
+def _print(title: str, report: pd.DataFrame) -> None:
+    print(f"{title}: {report['bytes'].sum() / 2**20:.1f} MiB")
+    for row in report.itertuples():
+        print(f"  {row.kind:<7} {row.name:<24} {row.detail:<16} {row.bytes / 2**20:>9.2f} MiB")
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Report the dashboard data's memory use.")
+    parser.add_argument("--data", type=Path, default=None, help="Dataset (default: WQ_DATA_PATH)")
+    args = parser.parse_args(argv)
+
+    # A fresh process has no cached values; see `log_reports` for the app's
+    df = load_dataset(args.data)
+    _print("As loaded", column_report(df))
+    _print("Compact", column_report(compact(df)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Run the dashboard's heavy computations off the event loop.
+
+Each app worker runs every session's reactive graph on one asyncio loop, so
+while one session's correlations or map sites are being computed, every
+other session on that worker waits. The dashboard describes those
+computations as `Job`s instead, which `reactivity.background` runs on a pool
+configured by `WQ_OFFLOAD`:
+
+- `thread` (default): a thread pool. Jobs use the data in place; DuckDB, and
+  much of numpy and pandas, release the GIL while they work.
+- `process`: a process pool, for work that holds the GIL. Jobs get the
+  dataset by reference (`shared`): it is published once per data version as
+  a memory-mapped Arrow file (`water_quality.shared`) that every pool
+  process attaches to read-only, rather than pickled into each call.
+- `off`: jobs run inline, as plain reactive calcs.
+
+`WQ_OFFLOAD_WORKERS` sets the pool size (default: the number of CPUs, at
+most 4). Jobs marked `threads=True` always use the thread pool: DuckDB
+queries, whose connection can't be sent to another process, and jobs
+whose results are too large to send back cheaply.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Generic, Hashable, Optional, TypeVar, Union
+
+import pandas as pd
+
+from . import correlation, queries
+from .binning import Grid, binned_scatter, region_month
+from .cache import VersionedCache
+from .shared import DEFAULT_SHARED_PATH, attach, publish
+from .spatial import SiteClusters
+
+if TYPE_CHECKING:
+    from .versioning import DataVersion
+
+T = TypeVar("T")
+
+MODE = os.environ.get("WQ_OFFLOAD", "thread")
+WORKERS = int(os.environ.get("WQ_OFFLOAD_WORKERS", 0)) or min(4, os.cpu_count() or 1)
+
+# Results of cached jobs, shared by sessions
+_results: VersionedCache[Any] = VersionedCache("offloaded", maxsize=256)
+# Selected samples per selection, in whichever process the jobs run
+_selections: VersionedCache[pd.DataFrame] = VersionedCache("offload_selections", maxsize=4)
+
+_executors: dict[str, Executor] = {}
+_executors_lock = threading.Lock()
+
+
+def executor(threads: bool = False) -> Executor:
+    """The pool jobs run on, created on first use."""
+    kind = "thread" if threads or MODE != "process" else "process"
+    with _executors_lock:
+        if kind not in _executors:
+            if kind == "process":
+                # Spawned, not forked: the app's threads and event loop aren't
+                # safe to fork
+                _executors[kind] = ProcessPoolExecutor(
+                    WORKERS, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                _executors[kind] = ThreadPoolExecutor(WORKERS, thread_name_prefix="offload")
+        return _executors[kind]
+
+
+def shutdown() -> None:
+    """Stop the pools, so no pool process outlives the app worker."""
+    with _executors_lock:
+        for pool in _executors.values():
+            pool.shutdown(cancel_futures=True)
+        _executors.clear()
+
+
+# --------------------------------------------------------------------------- shared data
+
+
+@dataclass(frozen=True, eq=False)
+class SharedFrame:
+    """
+    A data version's frame, passed to pool processes by reference.
+
+    Pickles as the path of its published Arrow file; the receiving process
+    attaches to it (once per version) and the job gets the frame.
+    """
+
+    path: Path
+    version: DataVersion
+
+    def publish(self) -> None:
+        """Write the file, unless this or another app worker already has."""
+        # `publish` renames the file into place, so racing writers are harmless
+        if not self.path.exists():
+            publish(self.version.df, self.path)
+
+    def __reduce__(self):
+        return _attached, (str(self.path),)
+
+
+_attached_frames: dict[str, pd.DataFrame] = {}
+
+
+def _attached(path: str) -> pd.DataFrame:
+    # Pool processes keep the versions they were last sent
+    if path not in _attached_frames:
+        while len(_attached_frames) >= 2:
+            _attached_frames.pop(next(iter(_attached_frames)))
+        _attached_frames[path] = attach(path)
+    return _attached_frames[path]
+
+
+def shared(version: DataVersion) -> Union[pd.DataFrame, SharedFrame]:
+    """The version's frame as jobs should receive it: in place, or by reference for processes."""
+    if MODE != "process":
+        return version.df
+    return SharedFrame(DEFAULT_SHARED_PATH.with_name(f"water_quality-{version.id}.arrow"), version)
+
+
+def discard_shared(version: DataVersion) -> None:
+    """Delete other versions' published files; processes attached to them keep their mappings."""
+    if MODE != "process":
+        return
+    for path in DEFAULT_SHARED_PATH.parent.glob("water_quality-*.arrow"):
+        if path.name != f"water_quality-{version.id}.arrow":
+            path.unlink(missing_ok=True)
+
+
+# --------------------------------------------------------------------------- jobs
+
+
+@dataclass(frozen=True, eq=False)
+class Job(Generic[T]):
+    """
+    A call to run in the background: `fn(*args)`, on the pool (or on the
+    thread pool with `threads`), its result cached under `(version, key)`
+    if a `key` is given.
+    """
+
+    fn: Callable[..., T]
+    args: tuple = ()
+    threads: bool = False
+    version: Optional[str] = None
+    key: Optional[Hashable] = None
+
+    def __call__(self) -> T:
+        """Run the job inline."""
+        return self._cached(lambda: self.fn(*self._local_args()))
+
+    async def run(self) -> T:
+        """Run the job on its pool, without blocking the event loop."""
+        hit = self._hit()
+        if hit is not None:
+            return hit
+        loop = asyncio.get_running_loop()
+        pool = executor(self.threads)
+        if isinstance(pool, ProcessPoolExecutor):
+            for arg in self.args:
+                if isinstance(arg, SharedFrame):
+                    await loop.run_in_executor(executor(threads=True), arg.publish)
+            value = await loop.run_in_executor(pool, self.fn, *self.args)
+        else:
+            value = await loop.run_in_executor(pool, self.fn, *self._local_args())
+        if self.key is not None:
+            _results.put(self.version, (self.fn.__qualname__, self.key), value)
+        return value
+
+    def _local_args(self) -> tuple:
+        return tuple(arg.version.df if isinstance(arg, SharedFrame) else arg for arg in self.args)
+
+    def _hit(self) -> Optional[T]:
+        if self.key is None:
+            return None
+        return _results.get(self.version, (self.fn.__qualname__, self.key))
+
+    def _cached(self, compute: Callable[[], T]) -> T:
+        if self.key is None:
+            return compute()
+        return _results.get_or_compute(self.version, (self.fn.__qualname__, self.key), compute)
+
+
+def selected(version: str, df: pd.DataFrame, selection: tuple) -> pd.DataFrame:
+    """The selection's samples (`queries.filter_samples`), memoized per process."""
+    regions, councils, (start_date, end_date) = selection
+    return _selections.get_or_compute(
+        version,
+        selection,
+        lambda: queries.filter_samples(df, regions, councils, start_date, end_date),
+    )
+
+
+# Pandas jobs over the whole frame and a selection, so pool processes receive
+# the shared frame by reference rather than a pickled copy of the selection
+
+def correlations(version: str, df: pd.DataFrame, selection: tuple, by: Optional[str]) -> pd.DataFrame:
+    """`correlation.correlations` of the selection."""
+    return correlation.correlations(selected(version, df, selection), by)
+
+
+def yearly_trends(version: str, df: pd.DataFrame, selection: tuple) -> pd.DataFrame:
+    """`queries.yearly_trends` of the selection."""
+    return queries.yearly_trends(selected(version, df, selection))
+
+
+def scatter(version: str, df: pd.DataFrame, selection: tuple, x: str) -> Grid:
+    """`binning.binned_scatter` of the selection."""
+    return binned_scatter(selected(version, df, selection), x)
+
+
+def region_months(version: str, df: pd.DataFrame, selection: tuple) -> pd.DataFrame:
+    """`binning.region_month` of the selection."""
+    return region_month(selected(version, df, selection))
+
+
+def site_clusters(version: str, df: pd.DataFrame, selection: tuple) -> SiteClusters:
+    """The selection's `SiteClusters`, before any zoom is clustered."""
+    return SiteClusters.from_samples(selected(version, df, selection))
@@ -0,0 +1,271 @@
+"""
+Compact Plotly figures for the dashboard, and the bytes each render sends.
+
+Every `render_plotly` output sends its whole figure widget to the browser,
+so the figures are slimmed before they are sent:
+
+- Numeric arrays become typed arrays (sent as base64 binary rather than
+  JSON lists): floats as float32 and integers in the smallest integer type,
+  since the widget serializer sends int64 as JSON.
+- 2D arrays, which always go as JSON, are rounded to `SIGNIFICANT_DIGITS`.
+- Trace properties that Plotly Express spells out at their Plotly.js
+  defaults (axes `x`/`y`, solid lines, circle markers, ...) are dropped.
+- Traces with their own copy of a colour scale share one colour axis.
+- The template keeps its layout defaults, and trace defaults only for the
+  trace types in the figure.
+- The widget's JavaScript bundle (about 5 MB, otherwise inlined in every
+  figure's state) is referenced by URL, so the browser fetches and caches it
+  once; see `figure_widget_class`.
+
+`meter` records the size of each chart's renders against `BUDGET_BYTES`
+(`WQ_PAYLOAD_BUDGET_KB`) and logs the ones over budget.
+"""
+
+from __future__ import annotations
+
+import base64
+import dataclasses
+import importlib.util
+import json
+import logging
+import os
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+logger = logging.getLogger(__name__)
+
+# Size above which a chart's render is logged
+BUDGET_BYTES = int(float(os.environ.get("WQ_PAYLOAD_BUDGET_KB", 64)) * 1024)
+
+SIGNIFICANT_DIGITS = 4
+
+# Where the app serves the figure widget's JavaScript bundle
+BUNDLE_URL = "/assets/plotly"
+
+
+def bundle_dir() -> Path:
+    """The directory holding Plotly's figure widget bundle, `widgetbundle.js`."""
+    # Found without importing plotly, which the app defers
+    spec = importlib.util.find_spec("plotly")
+    return Path(spec.submodule_search_locations[0]) / "package_data"
+
+
+def _round_significant(values: np.ndarray, digits: int = SIGNIFICANT_DIGITS) -> np.ndarray:
+    finite = np.isfinite(values) & (values != 0)
+    magnitude = np.zeros_like(values)
+    magnitude[finite] = np.floor(np.log10(np.abs(values[finite])))
+    scale = 10.0 ** (digits - 1 - magnitude)
+    return np.round(values * scale) / scale
+
+
+def _smallest_int(values: np.ndarray) -> np.ndarray:
+    if len(values) == 0:
+        return values.astype(np.int32)
+    low, high = values.min(), values.max()
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            return values.astype(dtype)
+    return values
+
+
+def _compact_array(values: np.ndarray) -> np.ndarray:
+    if values.dtype.kind == "f":
+        if values.ndim == 1:
+            return values.astype(np.float32)
+        return _round_significant(values.astype("float64"))
+    if values.dtype.kind in "iu" and values.ndim == 1:
+        return _smallest_int(values)
+    return values
+
+
+def _arrays(props: dict, path: tuple = ()):
+    """(path, array) of each numeric array in a trace's properties."""
+    for key, value in props.items():
+        if isinstance(value, dict):
+            yield from _arrays(value, (*path, key))
+        elif isinstance(value, np.ndarray) and value.dtype.kind in "fiu":
+            yield (*path, key), value
+
+
+# Plotly.js defaults that Plotly Express sets explicitly on every trace
+_TRACE_DEFAULTS = {
+    ("xaxis",): "x",
+    ("yaxis",): "y",
+    ("orientation",): "v",
+    ("showlegend",): True,
+    ("line", "dash"): "solid",
+    ("marker", "symbol"): "circle",
+}
+
+
+def _drop_defaults(trace) -> None:
+    props = trace.to_plotly_json()
+    for path, default in _TRACE_DEFAULTS.items():
+        value = props
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is not None and value == default:
+            trace[path] = None
+    # A legend group of one trace toggles like the trace itself
+    if props.get("legendgroup") is not None and props.get("legendgroup") == props.get("name"):
+        trace.legendgroup = None
+
+
+def _share_colorscales(fig: go.Figure) -> None:
+    """Point traces with the same colour scale at one colour axis."""
+    shared = fig.layout.coloraxis.colorscale
+    for trace in fig.data:
+        if "coloraxis" not in trace or trace.coloraxis or not trace.colorscale:
+            continue
+        if shared is None:
+            shared = trace.colorscale
+            fig.layout.coloraxis.colorscale = shared
+            fig.layout.coloraxis.showscale = trace.showscale
+        if trace.colorscale == shared:
+            trace.update(colorscale=None, showscale=None, coloraxis="coloraxis")
+
+
+# Template layout sections for subplot types the dashboard doesn't draw
+_UNUSED_LAYOUT = ("polar", "ternary", "scene", "geo")
+
+
+@lru_cache(maxsize=None)
+def _template_layout() -> dict:
+    import plotly.io as pio
+
+    return pio.templates[pio.templates.default].layout.to_plotly_json()
+
+
+def compact(fig: go.Figure) -> go.Figure:
+    """
+    Slim a figure for sending to the browser, in place.
+
+    Returns:
+        `fig`
+
+    """
+    import plotly.graph_objects as go
+    import plotly.io as pio
+
+    for trace in fig.data:
+        for path, values in list(_arrays(trace.to_plotly_json())):
+            compacted = _compact_array(values)
+            if compacted is not values:
+                # Plotly skips assigning equal values, which a new dtype is
+                trace[path] = None
+                trace[path] = compacted
+        _drop_defaults(trace)
+    _share_colorscales(fig)
+
+    # Only the trace types in the figure need their defaults
+    template = pio.templates[pio.templates.default]
+    types = {trace.type for trace in fig.data}
+    fig.layout.template = go.layout.Template(
+        layout={k: v for k, v in _template_layout().items() if k not in _UNUSED_LAYOUT},
+        data={t: getattr(template.data, t) for t in types if getattr(template.data, t, None)},
+    )
+    return fig
+
+
+# The URL comes from each client's address for the app, so only a few
+# classes are kept
+@lru_cache(maxsize=8)
+def figure_widget_class(esm_url: str) -> type:
+    """
+    A `FigureWidget` subclass that loads its JavaScript from `esm_url`.
+
+    The widget's front end imports an absolute http(s) URL in place of
+    inline module source; the app serves `bundle_dir()` at `BUNDLE_URL`.
+    """
+    from plotly.graph_objects import FigureWidget
+
+    # Keeps plotly's module so shinywidgets still treats it as a plotly widget
+    return type(
+        "FigureWidget", (FigureWidget,), {"_esm": esm_url, "__module__": FigureWidget.__module__}
+    )
+
+
+def state_bytes(state: Any) -> int:
+    """
+    Size of a widget's state as sent to the browser: JSON, with binary
+    buffers base64-encoded.
+    """
+    buffers = []
+
+    def default(obj):
+        if isinstance(obj, (memoryview, bytes, bytearray)):
+            buffers.append(memoryview(obj).nbytes)
+            return ""
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, np.generic):
+            return obj.item()
+        return str(obj)
+
+    text = json.dumps(state, default=default, ensure_ascii=False)
+    return len(text.encode()) + sum(len(base64.b64encode(bytes(n))) for n in buffers)
+
+
+@dataclasses.dataclass
+class _ChartStats:
+    renders: int = 0
+    last_bytes: int = 0
+    total_bytes: int = 0
+    max_bytes: int = 0
+    over_budget: int = 0
+
+
+class PayloadMeter:
+    """Bytes sent per render, per chart, as running totals."""
+
+    def __init__(self, budget: int = BUDGET_BYTES):
+        self.budget = budget
+        self._charts: dict[str, _ChartStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, nbytes: int) -> None:
+        with self._lock:
+            stats = self._charts.setdefault(name, _ChartStats())
+            stats.renders += 1
+            stats.last_bytes = nbytes
+            stats.total_bytes += nbytes
+            stats.max_bytes = max(stats.max_bytes, nbytes)
+            stats.over_budget += nbytes > self.budget
+        if nbytes > self.budget:
+            logger.warning("%s sent %.1f kB, over the %.0f kB budget", name, nbytes / 1024, self.budget / 1024)
+
+    def report(self) -> pd.DataFrame:
+        """
+        Returns:
+            One row per chart with `renders`, `last_bytes`, `mean_bytes`,
+            `max_bytes` and `over_budget` (renders above the budget)
+
+        """
+        with self._lock:
+            charts = {name: dataclasses.replace(stats) for name, stats in self._charts.items()}
+        return pd.DataFrame(
+            [
+                {
+                    "chart": name,
+                    "renders": stats.renders,
+                    "last_bytes": stats.last_bytes,
+                    "mean_bytes": round(stats.total_bytes / stats.renders),
+                    "max_bytes": stats.max_bytes,
+                    "over_budget": stats.over_budget,
+                }
+                for name, stats in charts.items()
+            ],
+            columns=["chart", "renders", "last_bytes", "mean_bytes", "max_bytes", "over_budget"],
+        )
+
+
+meter = PayloadMeter()
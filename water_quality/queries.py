@@ -0,0 +1,168 @@
+"""
+Dashboard aggregations over the water quality frame.
+
+These are the computations behind the reactive calcs in `app.py`, kept free of
+Shiny so they can be benchmarked and reused outside a session.
+"""
+
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+# Enterococci level (CFU/100mL) above which a sample counts as an exceedance
+ENTEROCOCCI_THRESHOLD = 130
+
+# Season of each calendar month (index 0 is unused), southern hemisphere
+_SEASONS = np.array(
+    [
+        "",
+        "Summer",
+        "Summer",
+        "Autumn",
+        "Autumn",
+        "Autumn",
+        "Winter",
+        "Winter",
+        "Winter",
+        "Spring",
+        "Spring",
+        "Spring",
+        "Summer",
+    ],
+    dtype=object,
+)
+
+
+def months(df: pd.DataFrame) -> np.ndarray:
+    """Calendar month of each sample, from the compact frame's `month` if it has one."""
+    return df["month"].to_numpy() if "month" in df else df["date"].dt.month.to_numpy()
+
+
+def years(df: pd.DataFrame) -> np.ndarray:
+    """Year of each sample, from the compact frame's `year` if it has one."""
+    return df["year"].to_numpy() if "year" in df else df["date"].dt.year.to_numpy()
+
+
+def sample_seasons(df: pd.DataFrame) -> np.ndarray:
+    """Season of each sample in the frame."""
+    return _SEASONS[months(df)]
+
+
+def filter_samples(
+    df: pd.DataFrame,
+    regions: Sequence[str],
+    councils: Sequence[str],
+    start_date,
+    end_date,
+) -> pd.DataFrame:
+    """
+    Filter samples to the selected regions, councils and date range.
+
+    An empty selection matches nothing, mirroring the dashboard sidebar where
+    both a region and a council must be picked before anything is shown.
+    """
+    if not councils or not regions or not start_date or not end_date:
+        return df.iloc[0:0]
+
+    start_date, end_date = pd.to_datetime(start_date), pd.to_datetime(end_date)
+    return df[
+        (df["region"].isin(regions))
+        & (df["council"].isin(councils))
+        & (df["date"].between(start_date, end_date))
+    ]
+
+
+def total_beaches(df: pd.DataFrame) -> int:
+    """Number of distinct swim sites in the frame."""
+    return df["beach"].nunique()
+
+
+def beach_means(df: pd.DataFrame) -> pd.Series:
+    """Mean enterococci level per beach."""
+    return df.groupby("beach", observed=True)["enterococci"].mean()
+
+
+def most_polluted_beach(df: pd.DataFrame) -> str:
+    """Beach with the highest mean enterococci level."""
+    if df.empty:
+        return "Please select"
+    return beach_means(df).idxmax()
+
+
+def cleanest_beach(df: pd.DataFrame) -> str:
+    """Beach with the lowest mean enterococci level."""
+    if df.empty:
+        return "Please select"
+    return beach_means(df).idxmin()
+
+
+def high_enterococci_sites(
+    df: pd.DataFrame, threshold: float = ENTEROCOCCI_THRESHOLD
+) -> pd.DataFrame:
+    """Number of exceedances per beach, most frequently polluted first."""
+    if df.empty:
+        return pd.DataFrame()
+
+    high = (
+        df[df["enterococci"] > threshold]
+        .groupby("beach", observed=True)
+        .size()
+        .reset_index(name="count")
+    )
+    if high.empty:
+        return pd.DataFrame()
+    return high.sort_values(by="count", ascending=False)
+
+
+def water_quality_by_season(df: pd.DataFrame) -> pd.DataFrame:
+    """Mean enterococci level per season, worst season first."""
+    if df.empty:
+        return pd.DataFrame()
+
+    # Sums per month (small integer keys) rolled up into seasons, rather than
+    # grouping on a season name per sample
+    return season_means(df["enterococci"].groupby(months(df)).agg(["sum", "count"]))
+
+
+def season_means(by_month: pd.DataFrame) -> pd.DataFrame:
+    """
+    Roll enterococci sums and counts per calendar month up into mean levels
+    per season, worst season first.
+    """
+    by_month = by_month.astype("float64")
+    by_season = by_month.groupby(_SEASONS[by_month.index.to_numpy()]).sum()
+    seasonal_quality = (
+        (by_season["sum"] / by_season["count"])
+        .rename("enterococci")
+        .rename_axis("season")
+        .reset_index()
+    )
+    return seasonal_quality.sort_values(by="enterococci", ascending=False)
+
+
+def yearly_trends(df: pd.DataFrame) -> pd.DataFrame:
+    """Mean enterococci level per year and beach."""
+    trends = (
+        df.groupby([pd.Series(years(df), index=df.index, name="year"), "beach"], observed=True)
+        .agg({"enterococci": "mean"})
+        .reset_index()
+    )
+    return trends.sort_values(by=["year", "enterococci"], ascending=[True, False])
+
+
+def beach_markers(df: pd.DataFrame) -> pd.DataFrame:
+    """Per-beach map markers: mean enterococci and the first known location."""
+    return (
+        df.dropna(subset=["latitude", "longitude"])
+        .groupby("beach", observed=True)
+        .agg({"enterococci": "mean", "latitude": "first", "longitude": "first"})
+        .reset_index()
+    )
+
+
+def councils_in_regions(df: pd.DataFrame, regions: Sequence[str]) -> list[str]:
+    """Sorted councils that have samples in any of the given regions."""
+    return sorted(df.loc[df["region"].isin(regions), "council"].unique())
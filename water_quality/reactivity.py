@@ -0,0 +1,153 @@
+"""
+Reactive helpers that save the dashboard work it would throw away.
+
+- `debounce` coalesces bursts of input changes (ticking five councils in a
+  row) into one update, once the inputs have been still for
+  `DEBOUNCE_SECONDS` (`WQ_DEBOUNCE_MS`; 0 turns it off).
+- `shown` reads whether an output is visible, so effects that update a
+  widget in place (which Shiny doesn't suspend, as it does hidden outputs)
+  can wait until their output is on screen.
+- `background` computes a reactive value as an `offload.Job` on a pool, so
+  one session's heavy calcs don't hold up the others on the worker.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from typing import Callable, Optional, Sequence, TypeVar
+
+from shiny import reactive, req
+from shiny.session import Session
+from shiny.types import SilentException
+
+from . import offload
+
+T = TypeVar("T")
+
+# Quiet period after the last input change before the dashboard updates
+DEBOUNCE_SECONDS = float(os.environ.get("WQ_DEBOUNCE_MS", 300)) / 1000
+
+
+def debounce(delay: Optional[float] = None) -> Callable[[Callable[[], T]], Callable[[], T]]:
+    """
+    Make a reactive calc that follows `fn` once it has settled.
+
+    The first value is passed on at once; later changes wait until `fn`'s
+    dependencies have stopped changing for `delay` seconds, and only the last
+    of them is passed on. Must be called within a session.
+
+    Args:
+        delay: Quiet period in seconds; `DEBOUNCE_SECONDS` if None
+
+    """
+
+    def wrapper(fn: Callable[[], T]) -> Callable[[], T]:
+        seconds = DEBOUNCE_SECONDS if delay is None else delay
+        if seconds <= 0:
+            return reactive.calc(fn)
+
+        current = reactive.calc(fn)
+        due = reactive.value[Optional[float]](None)
+        settled = reactive.value(0)
+        started = False
+
+        @reactive.effect(priority=1)
+        def _restart_timer():
+            nonlocal started
+            try:
+                current()
+            except SilentException:
+                pass
+            # The first value isn't held back: `debounced` reads it directly
+            if started:
+                due.set(time.monotonic() + seconds)
+            started = True
+
+        @reactive.effect
+        def _settle():
+            if due.get() is None:
+                return
+            wait = due.get() - time.monotonic()
+            if wait > 0:
+                reactive.invalidate_later(wait)
+                return
+            with reactive.isolate():
+                settled.set(settled.get() + 1)
+            due.set(None)
+
+        @reactive.calc
+        def debounced() -> T:
+            settled.get()
+            with reactive.isolate():
+                return current()
+
+        return debounced
+
+    return wrapper
+
+
+def shown(session: Session, output_id: str) -> bool:
+    """
+    Reactively read whether an output is visible in the browser.
+
+    Like Shiny, treats outputs the browser hasn't reported on as hidden.
+    """
+    try:
+        return not session.input[f".clientdata_output_{output_id}_hidden"]()
+    except SilentException:
+        return False
+
+
+def background(
+    session: Session, outputs: Sequence[str] = ()
+) -> Callable[[Callable[[], offload.Job[T]]], Callable[[], T]]:
+    """
+    Make a reactive calc whose value is computed in the background.
+
+    The decorated function reads its reactive dependencies and returns the
+    `offload.Job` that computes the value; the job runs on `offload`'s pool
+    as an extended task. Until it finishes, readers of the calc are left in
+    progress, which the browser shows as a busy placeholder over the
+    previous value. Jobs started while another runs wait their turn, and
+    any but the newest are skipped. With `WQ_OFFLOAD=off` the job runs
+    inline, as a plain calc.
+
+    Args:
+        session: The session
+        outputs: Only start jobs while one of these outputs is visible
+
+    """
+
+    def wrapper(fn: Callable[[], offload.Job[T]]) -> Callable[[], T]:
+        if offload.MODE == "off":
+            return reactive.calc(lambda: fn()())
+
+        latest = 0
+
+        @reactive.extended_task
+        async def task(job: offload.Job[T], run: int) -> tuple[int, Optional[T]]:
+            # Queued behind a run that has since been superseded
+            if run != latest:
+                return run, None
+            return run, await job.run()
+
+        @reactive.effect
+        def _start():
+            nonlocal latest
+            if outputs and not any(shown(session, output_id) for output_id in outputs):
+                return
+            job = fn()
+            latest += 1
+            task.invoke(job, latest)
+
+        @reactive.calc
+        def result() -> T:
+            run, value = task.result()
+            # A newer job is on its way
+            req(run == latest, cancel_output="progress")
+            return value  # type: ignore[return-value]
+
+        return result
+
+    return wrapper
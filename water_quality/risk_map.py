@@ -0,0 +1,183 @@
+"""
+The FAQ's high-risk map as a static asset, built once per data version.
+
+Sites are ranked by repeated exceedances of the enterococci threshold and
+written as GeoJSON plus a standalone Leaflet page that draws it. Every
+session embeds the same page, which the app serves as a static file, instead
+of building its own map widget; a new data version gets new files (named by
+the version), and the files of older versions are removed.
+
+Usage in the app: `App(..., static_assets={ASSET_URL: ASSET_DIR})`.
+"""
+
+from __future__ import annotations
+
+import html
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Union
+
+import pandas as pd
+
+from .data import ROOT
+from .queries import ENTEROCOCCI_THRESHOLD
+from .versioning import DataVersion
+
+# Where the assets are written; the app serves this directory at ASSET_URL
+ASSET_DIR = Path(os.environ.get("WQ_ASSET_DIR", ROOT / "data" / "assets"))
+ASSET_URL = "/assets/risk"
+
+# Maps of this many of the latest data versions are kept
+KEEP_VERSIONS = 2
+
+_lock = threading.Lock()
+
+_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>High-risk swim sites</title>
+<link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css"
+  integrity="sha256-p4NxAoJBhIIN+hmNHrzRCf9tD/miZyoHS5obTRR9BMY=" crossorigin="">
+<script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"
+  integrity="sha256-20nQCchB9co0qIjJZRGuk2/Z9VM+kNiyxNV1lvTlZBo=" crossorigin=""></script>
+<style>html, body, #map {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="map"></div>
+<script>
+const sites = {geojson};
+const map = L.map("map");
+L.tileLayer("https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+  attribution: "&copy; OpenStreetMap contributors"
+}}).addTo(map);
+const layer = L.geoJSON(sites, {{
+  pointToLayer: (feature, latlng) => L.circleMarker(latlng, {{
+    radius: 4 + 12 * Math.sqrt(feature.properties.exceedances / {max_exceedances}),
+    color: feature.properties.exceedance_rate > 0.1 ? "#FDE725" : "#440154",
+    fillOpacity: 0.7,
+  }}),
+  onEachFeature: (feature, marker) => marker.bindPopup(
+    `<b>#${{feature.properties.rank}} ${{feature.properties.beach_html}}</b><br>` +
+    `${{feature.properties.exceedances}} of ${{feature.properties.samples}} samples ` +
+    `above {threshold} CFU/100mL (${{(100 * feature.properties.exceedance_rate).toFixed(1)}}%)`
+  ),
+}}).addTo(map);
+if (sites.features.length) {{ map.fitBounds(layer.getBounds(), {{ padding: [20, 20] }}); }}
+else {{ map.setView([-33.86, 151.20], 10); }}
+</script>
+</body>
+</html>
+"""
+
+
+def high_risk_sites(df: pd.DataFrame, threshold: float = ENTEROCOCCI_THRESHOLD) -> pd.DataFrame:
+    """
+    Sites with exceedances, ranked by how often they exceed `threshold`.
+
+    Returns:
+        One row per site with `rank`, `beach`, `latitude`, `longitude`,
+        `exceedances`, `samples` and `exceedance_rate`
+
+    """
+    sites = (
+        df.assign(exceeds=df["enterococci"] > threshold)
+        .groupby("beach", observed=True)
+        .agg(
+            latitude=("latitude", "first"),
+            longitude=("longitude", "first"),
+            exceedances=("exceeds", "sum"),
+            samples=("exceeds", "size"),
+        )
+    )
+    sites = sites[sites["exceedances"] > 0].dropna(subset=["latitude", "longitude"])
+    sites["exceedance_rate"] = sites["exceedances"] / sites["samples"]
+    sites = sites.sort_values(["exceedances", "exceedance_rate"], ascending=False).reset_index()
+    sites.insert(0, "rank", range(1, len(sites) + 1))
+    return sites
+
+
+def to_geojson(sites: pd.DataFrame) -> dict:
+    """A GeoJSON FeatureCollection of `high_risk_sites`."""
+    return {
+        "type": "FeatureCollection",
+        "features": [
+            {
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [row.longitude, row.latitude]},
+                "properties": {
+                    "rank": int(row.rank),
+                    "beach": row.beach,
+                    # For the popup, which Leaflet inserts as HTML
+                    "beach_html": html.escape(str(row.beach)),
+                    "exceedances": int(row.exceedances),
+                    "samples": int(row.samples),
+                    "exceedance_rate": round(float(row.exceedance_rate), 4),
+                },
+            }
+            for row in sites.itertuples()
+        ],
+    }
+
+
+def _write(path: Path, text: str) -> None:
+    # Named per process: other workers may be writing the same version's files
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(text)
+    os.replace(tmp, path)
+
+
+def _mtime(path: Path) -> float:
+    # Another worker may have removed it since it was listed
+    try:
+        return path.stat().st_mtime
+    except FileNotFoundError:
+        return 0.0
+
+
+def warm_up(version: DataVersion) -> threading.Thread:
+    """Build the map of `version` on a background daemon thread."""
+    thread = threading.Thread(target=build, args=(version,), name="warm-up-risk-map", daemon=True)
+    thread.start()
+    return thread
+
+
+def build(version: DataVersion, directory: Union[str, Path] = ASSET_DIR) -> str:
+    """
+    Write the map of a data version, unless it was already written.
+
+    Args:
+        version: The data version to map
+        directory: Where to write the assets
+
+    Returns:
+        The HTML file's name within `directory`
+
+    """
+    directory = Path(directory)
+    name = f"high_risk_{version.id}"
+    page_file = directory / f"{name}.html"
+    with _lock:
+        if page_file.exists():
+            return page_file.name
+        directory.mkdir(parents=True, exist_ok=True)
+        sites = high_risk_sites(version.df)
+        geojson = json.dumps(to_geojson(sites))
+        _write(directory / f"{name}.geojson", geojson)
+        page = _PAGE.format(
+            # Inlined in a <script>, so a site name can't close it
+            geojson=geojson.replace("</", "<\\/"),
+            max_exceedances=max(int(sites["exceedances"].max()), 1) if len(sites) else 1,
+            threshold=ENTEROCOCCI_THRESHOLD,
+        )
+        _write(page_file, page)
+
+        # Keep the previous version's map for sessions (and other workers)
+        # that haven't switched yet; older ones are no longer linked
+        pages = sorted(directory.glob("high_risk_*.html"), key=_mtime)
+        for old in pages[:-KEEP_VERSIONS]:
+            old.unlink(missing_ok=True)
+            old.with_suffix(".geojson").unlink(missing_ok=True)
+    return page_file.name
@@ -0,0 +1,149 @@
+"""
+Share one copy of the dataset between app worker processes.
+
+The dataset is published once as an uncompressed Arrow IPC file (ideally on
+`/dev/shm`, so it lives in shared memory) and every worker memory-maps it
+read-only. The pandas frame each worker builds on top is zero-copy: numeric
+and datetime columns are numpy views onto the mapped buffers and string
+columns wrap the mapped Arrow arrays, so the operating system keeps a single
+copy of the data in the page cache however many workers attach.
+
+Enable it in the app by pointing `WQ_SHARED_DATA` at the file. The first
+worker to start publishes it (others wait on a lock and attach); it is
+republished when the source dataset is newer. To publish ahead of time:
+
+    python -m water_quality.shared --out /dev/shm/water_quality.arrow
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc
+
+from .data import DATA_PATH, compact, load_dataset
+
+# Shared dataset file the app attaches to, if set
+SHARED_DATA_PATH = os.environ.get("WQ_SHARED_DATA")
+
+DEFAULT_SHARED_PATH = (
+    Path("/dev/shm") if Path("/dev/shm").is_dir() else Path(tempfile.gettempdir())
+) / "water_quality.arrow"
+
+
+def publish(df: pd.DataFrame, path: Union[str, Path]) -> Path:
+    """
+    Write the dataset as a memory-mappable Arrow IPC file.
+
+    The file is written next to `path` and renamed into place, so workers
+    never map a partially written file and workers still attached to a
+    previous version keep reading it until they re-attach.
+
+    Args:
+        df: The dataset to publish
+        path: Destination file
+
+    Returns:
+        The published path
+
+    """
+    path = Path(path)
+    # A single record batch keeps every column contiguous, which is what
+    # lets `attach` hand out zero-copy views.
+    table = pa.Table.from_pandas(df, preserve_index=False).combine_chunks()
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, path)
+    return path
+
+
+def attach(path: Union[str, Path]) -> pd.DataFrame:
+    """
+    Memory-map a published dataset as a read-only, zero-copy DataFrame.
+
+    Args:
+        path: A file written by `publish`
+
+    Returns:
+        A DataFrame backed by the mapped file. Its numpy columns are not
+        writeable; operations that modify them must copy first (as pandas
+        copy-on-write does anyway).
+
+    """
+    table = pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+    columns = {}
+    for name in table.column_names:
+        chunks = table.column(name).chunks
+        array = chunks[0] if len(chunks) == 1 else pa.concat_arrays(chunks)
+        if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+            # Wraps the mapped buffers on pandas >= 3 (pyarrow-backed strings)
+            columns[name] = array.to_pandas()
+        else:
+            try:
+                columns[name] = array.to_numpy(zero_copy_only=True)
+            except pa.ArrowInvalid:
+                # Columns with nulls (or nested types) can't be viewed in place
+                columns[name] = array.to_pandas()
+    return pd.DataFrame(columns, copy=False)
+
+
+@contextmanager
+def _locked(path: Path) -> Iterator[None]:
+    with open(path.with_name(f".{path.name}.lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def load_shared(
+    path: Union[str, Path], source: Union[str, Path, None] = None
+) -> pd.DataFrame:
+    """
+    Attach to the shared dataset, publishing it first if needed.
+
+    Workers starting together serialize on a lock file next to `path`: the
+    first one publishes from `source` while the others wait, then all attach
+    to the same file.
+
+    Args:
+        path: The shared dataset file
+        source: Dataset to publish from; defaults to `water_quality.data.DATA_PATH`
+
+    Returns:
+        The zero-copy DataFrame from `attach`, in the compact form of
+        `water_quality.data.compact`
+
+    """
+    path = Path(path)
+    source = Path(source or DATA_PATH)
+    with _locked(path):
+        if not path.exists() or path.stat().st_mtime < source.stat().st_mtime:
+            publish(compact(load_dataset(source)), path)
+    return attach(path)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--data", type=Path, default=None, help="Dataset to publish")
+    parser.add_argument("--out", type=Path, default=DEFAULT_SHARED_PATH)
+    args = parser.parse_args(argv)
+
+    with _locked(args.out):
+        publish(compact(load_dataset(args.data)), args.out)
+    print(f"Published {args.out}; start the app with WQ_SHARED_DATA={args.out}")
+
+
+if __name__ == "__main__":
+    main()
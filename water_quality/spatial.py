@@ -0,0 +1,171 @@
+"""
+Server-side clustering of swim sites for the beach map.
+
+Sites are aggregated once per selection (sample count and mean enterococci
+per site) and clustered per zoom level on a grid of Web Mercator pixels:
+sites closer than about `CLUSTER_PX` screen pixels at that zoom share a
+cluster, which carries its site and sample counts, mean enterococci and
+worst site. Each zoom's clusters are computed on first use, cached, and kept
+sorted by grid column, so a viewport (bounding-box) query is a binary search
+plus a mask over the matching columns. The map then only receives markers
+for what is visible, however many sites there are.
+"""
+
+from __future__ import annotations
+
+import threading
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+TILE_SIZE = 256
+
+# Sites within about this many screen pixels of each other are clustered
+CLUSTER_PX = 48
+
+# From this zoom on, every site gets its own marker
+MAX_CLUSTER_ZOOM = 15
+
+# Fraction of the viewport's size added on each side, so small pans don't
+# reveal empty edges
+VIEW_PADDING = 0.25
+
+def mercator_pixels(
+    latitude: np.ndarray, longitude: np.ndarray, zoom: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Web Mercator world pixel coordinates at `zoom`."""
+    scale = TILE_SIZE * 2.0**zoom
+    lat = np.radians(np.clip(latitude, -85.05112878, 85.05112878))
+    x = (np.asarray(longitude) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * scale
+    return x, y
+
+
+class SiteClusters:
+    """Sites of a selection, clustered per zoom level and queryable by viewport."""
+
+    def __init__(self, sites: pd.DataFrame):
+        """
+        Args:
+            sites: One row per site with `beach`, `latitude`, `longitude`,
+                `samples` and mean `enterococci`
+
+        """
+        self.sites = sites.reset_index(drop=True)
+        self._by_zoom: dict[int, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        # Sent between processes without the lock
+        return {"sites": self.sites, "by_zoom": self._by_zoom}
+
+    def __setstate__(self, state: dict) -> None:
+        self.sites = state["sites"]
+        self._by_zoom = state["by_zoom"]
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_samples(cls, df: pd.DataFrame) -> SiteClusters:
+        """Aggregate samples per site."""
+        sites = df.groupby("beach", observed=True).agg(
+            latitude=("latitude", "first"),
+            longitude=("longitude", "first"),
+            samples=("enterococci", "size"),
+            enterococci=("enterococci", "mean"),
+        )
+        sites = sites.dropna(subset=["latitude", "longitude"])
+        return cls(sites.reset_index())
+
+    def clusters(self, zoom: int) -> pd.DataFrame:
+        """
+        The clusters at `zoom`, computed on first use.
+
+        Returns:
+            One row per cluster with `latitude`, `longitude` (the centroid),
+            `sites`, `samples`, `enterococci` (the mean over its samples),
+            `worst_beach`, `worst_enterococci` and grid `cell_x`/`cell_y`,
+            sorted by `cell_x`
+
+        """
+        zoom = int(min(max(zoom, 0), MAX_CLUSTER_ZOOM))
+        with self._lock:
+            if zoom not in self._by_zoom:
+                self._by_zoom[zoom] = self._cluster(zoom)
+            return self._by_zoom[zoom]
+
+    def _cluster(self, zoom: int) -> pd.DataFrame:
+        sites = self.sites
+        x, y = mercator_pixels(sites["latitude"].to_numpy(), sites["longitude"].to_numpy(), zoom)
+        cell_x = np.floor(x / CLUSTER_PX).astype(np.int64)
+        cell_y = np.floor(y / CLUSTER_PX).astype(np.int64)
+        if zoom >= MAX_CLUSTER_ZOOM:
+            cell = np.arange(len(sites))
+        else:
+            _, cell = np.unique(np.column_stack([cell_x, cell_y]), axis=0, return_inverse=True)
+            cell = cell.ravel()
+        n = int(cell.max()) + 1 if len(cell) else 0
+
+        samples = sites["samples"].to_numpy(dtype="float64")
+        level = sites["enterococci"].to_numpy(dtype="float64")
+        # Worst site per cluster: the first row per cell after sorting by
+        # cell, then by level descending
+        order = np.lexsort((-level, cell))
+        first = order[np.r_[True, cell[order][1:] != cell[order][:-1]]] if len(order) else order
+
+        n_sites = np.bincount(cell, minlength=n)
+        n_samples = np.bincount(cell, samples, n)
+        clusters = pd.DataFrame(
+            {
+                "latitude": np.bincount(cell, sites["latitude"].to_numpy(), n) / n_sites,
+                "longitude": np.bincount(cell, sites["longitude"].to_numpy(), n) / n_sites,
+                "sites": n_sites,
+                "samples": n_samples.astype(np.int64),
+                "enterococci": np.bincount(cell, samples * level, n) / np.maximum(n_samples, 1),
+                "worst_beach": sites["beach"].to_numpy()[first],
+                "worst_enterococci": level[first],
+                "cell_x": cell_x[first],
+                "cell_y": cell_y[first],
+            }
+        )
+        return clusters.sort_values("cell_x", kind="stable", ignore_index=True)
+
+    def in_view(
+        self,
+        zoom: int,
+        bounds: Optional[Sequence[Sequence[float]]] = None,
+        padding: float = VIEW_PADDING,
+    ) -> pd.DataFrame:
+        """
+        The clusters at `zoom` within a viewport.
+
+        Args:
+            zoom: Map zoom level
+            bounds: `((south, west), (north, east))` as reported by the map;
+                None or empty for all clusters
+            padding: Fraction of the viewport added on each side
+
+        Returns:
+            The matching rows of `clusters(zoom)`
+
+        """
+        clusters = self.clusters(zoom)
+        if not bounds or clusters.empty:
+            return clusters
+        (south, west), (north, east) = bounds
+        pad_lat, pad_lon = (north - south) * padding, (east - west) * padding
+        south, north = south - pad_lat, north + pad_lat
+        west, east = west - pad_lon, east + pad_lon
+
+        # The grid columns spanned by the viewport, then a binary search
+        zoom = int(min(max(zoom, 0), MAX_CLUSTER_ZOOM))
+        x, _ = mercator_pixels(np.array([south, north]), np.array([west, east]), zoom)
+        cx0, cx1 = np.floor(x / CLUSTER_PX).astype(np.int64)
+        cell_x = clusters["cell_x"].to_numpy()
+        start = np.searchsorted(cell_x, cx0, side="left")
+        stop = np.searchsorted(cell_x, cx1, side="right")
+        candidates = clusters.iloc[start:stop]
+        # Centroids, not cells, decide: a cluster is shown where its marker is
+        inside = candidates["latitude"].between(south, north)
+        inside &= candidates["longitude"].between(west, east)
+        return candidates[inside]
@@ -0,0 +1,376 @@
+"""
+Dashboard aggregations as parameterized DuckDB SQL.
+
+The DuckDB counterpart of `queries` (and of `binning`'s grids and the
+per-site aggregation behind `spatial`'s map clusters), used with
+`WQ_QUERY_ENGINE=duckdb`. The selection is filtered and aggregated by DuckDB
+on cursors of the query chat's `DataFrameSource`, so the dashboard and the
+chat share one engine over one copy of the data, and sessions' queries run
+in parallel rather than taking turns on the chat's connection.
+
+The value boxes, the bar and line charts, the region-by-month heatmap and
+the map's sites all come from one scan of the selection: `rollup`, its sums
+and counts per beach, region, year and month. The functions here reduce it
+further (a few thousand rows per million samples) into exactly what the
+pandas path computes. The binned scatter and the selected samples themselves
+(`filter_samples`) are queries of their own.
+
+Every query can also be drawn from the rows of another query instead of the
+whole table: the query chat's filter (`query`), composed as a subquery under
+the selection, so DuckDB pushes the sidebar's predicates into it and only the
+aggregates leave the engine.
+
+`chat_summary_tables` declares the summary tables the query chat's model
+gets alongside the samples, for the aggregates it is asked for most.
+"""
+
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Hashable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+from querychat.datasource import SummaryTable
+
+from .binning import SCATTER_BINS, Grid, month_grid
+from .cache import VersionedCache
+from .queries import ENTEROCOCCI_THRESHOLD, season_means
+from .spatial import SiteClusters
+
+if TYPE_CHECKING:
+    from querychat.datasource import DataFrameSource
+
+# "pandas" runs the dashboard's aggregations over the filtered frame
+# (`queries`), "duckdb" as SQL (this module). pandas is faster on a core for
+# the shipped data and up to about 10M rows (`benchmarks.dashboard`); DuckDB
+# uses every core, and lets the Query Chat's filter narrow the dashboard
+ENGINE = os.environ.get("WQ_QUERY_ENGINE", "pandas")
+# With a path, the samples are copied into a native DuckDB table sorted by
+# date, so date ranges skip most of it, and persisted per data version in files
+# named after it, which restarted workers open read-only; unset, DuckDB scans
+# the frame in place
+DATABASE = os.environ.get("WQ_QUERY_DATABASE") or None
+
+# The sidebar's regions, councils and (start, end) dates
+Selection = tuple[Sequence[str], Sequence[str], Sequence[Optional[str]]]
+
+_rollups: VersionedCache[pd.DataFrame] = VersionedCache("sql_rollups", maxsize=64)
+_grids: VersionedCache[Grid] = VersionedCache("sql_grids", maxsize=128)
+_clusters: VersionedCache[SiteClusters] = VersionedCache("sql_site_clusters", maxsize=128)
+
+_SELECTED = (
+    "region IN (SELECT unnest($regions)) AND council IN (SELECT unnest($councils)) "
+    "AND date BETWEEN $start AND $end"
+)
+
+_ROLLUP = """
+SELECT
+    beach,
+    CAST(region AS VARCHAR) AS region,
+    year(date) AS year,
+    month(date) AS month,
+    SUM(enterococci) AS sum,
+    COUNT(enterococci) AS count,
+    COUNT(*) AS samples,
+    COUNT(*) FILTER (WHERE enterococci > $threshold) AS high,
+    arg_min(latitude, date) FILTER (WHERE latitude IS NOT NULL) AS latitude,
+    arg_min(longitude, date) FILTER (WHERE longitude IS NOT NULL) AS longitude
+FROM samples
+GROUP BY ALL
+"""
+
+# Bin indices as `np.histogram2d` assigns them (the last bin includes its
+# upper edge), over ranges widened like `binning.binned_scatter`'s
+_BINNED_SCATTER = """
+, points AS (
+    SELECT CAST({x} AS DOUBLE) AS x, {y} AS y
+    FROM samples
+    WHERE {x} IS NOT NULL AND {y_column} IS NOT NULL
+), bounds AS (
+    SELECT min(x) AS x_lo, max(x) AS x_hi, min(y) AS y_lo, max(y) AS y_hi FROM points
+), edges AS (
+    SELECT
+        CASE WHEN x_hi > x_lo THEN x_lo ELSE x_lo - 0.5 END AS x_lo,
+        CASE WHEN x_hi > x_lo THEN x_hi ELSE x_hi + 0.5 END AS x_hi,
+        CASE WHEN y_hi > y_lo THEN y_lo ELSE y_lo - 0.5 END AS y_lo,
+        CASE WHEN y_hi > y_lo THEN y_hi ELSE y_hi + 0.5 END AS y_hi
+    FROM bounds
+)
+SELECT
+    x_lo, x_hi, y_lo, y_hi,
+    least(CAST(floor((x - x_lo) / (x_hi - x_lo) * $nx) AS INTEGER), $nx - 1) AS i,
+    least(CAST(floor((y - y_lo) / (y_hi - y_lo) * $ny) AS INTEGER), $ny - 1) AS j,
+    COUNT(*) AS n
+FROM points, edges
+GROUP BY ALL
+"""
+
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+
+class DashboardSQL:
+    """The dashboard's queries of a selection, run by DuckDB over a `DataFrameSource`."""
+
+    def __init__(self, source: DataFrameSource, table_name: str):
+        """
+        Args:
+            source: The query chat's data source
+            table_name: Its table name
+
+        """
+        self.source = source
+        self.table_name = table_name
+
+    def execute(
+        self, sql: str, selection: Selection, params: Optional[dict] = None, query: str = ""
+    ) -> pd.DataFrame:
+        """
+        Run `sql` against the selected samples, available to it as `samples`.
+
+        An empty selection matches nothing, as in `queries.filter_samples`.
+        With a `query` (a SELECT of the table returning all its columns, as
+        the chat's `update_dashboard` tool takes), the samples are selected
+        from its rows instead of the whole table.
+        """
+        regions, councils, (start_date, end_date) = selection
+        if regions and councils and start_date and end_date:
+            where = _SELECTED
+            params = {
+                **(params or {}),
+                "regions": list(regions),
+                "councils": list(councils),
+                "start": pd.to_datetime(start_date),
+                "end": pd.to_datetime(end_date),
+            }
+        else:
+            where = "false"
+        source = f"({query.strip().rstrip(';')}) AS chat" if query.strip() else _quote(self.table_name)
+        statement = f"WITH samples AS (SELECT * FROM {source} WHERE {where}) {sql}"
+        cursor = self.source.cursor()
+        try:
+            frame = cursor.execute(statement, params or None).df()
+        finally:
+            cursor.close()
+        # The frame's categoricals come back from DuckDB (as enums) ordered
+        for column in frame.select_dtypes("category"):
+            frame[column] = frame[column].cat.as_unordered()
+        return frame
+
+    def filter_samples(self, selection: Selection, query: str = "") -> pd.DataFrame:
+        """The selected samples, like `queries.filter_samples` (with a fresh index)."""
+        return self.execute("SELECT * FROM samples", selection, query=query)
+
+    def rollup(
+        self, selection: Selection, threshold: float = ENTEROCOCCI_THRESHOLD, query: str = ""
+    ) -> pd.DataFrame:
+        """
+        Sums and counts of the selection per beach, region, year and month.
+
+        Returns:
+            One row per combination with samples: enterococci `sum` and
+            `count` (of samples with a level), all `samples`, the number
+            `high` above `threshold`, and the beach's `latitude` and
+            `longitude` at its earliest sample with them
+
+        """
+        return self.execute(_ROLLUP, selection, {"threshold": threshold}, query)
+
+    def binned_scatter(
+        self,
+        selection: Selection,
+        x: str,
+        y: str = "enterococci",
+        bins: tuple[int, int] = SCATTER_BINS,
+        log_y: bool = True,
+        query: str = "",
+    ) -> Grid:
+        """`binning.binned_scatter` of the selection, binned by DuckDB."""
+        y_expr = f"CAST({_quote(y)} AS DOUBLE)"
+        if log_y:
+            y_expr = f"log10(greatest({y_expr}, 0) + 1)"
+        cells = self.execute(
+            _BINNED_SCATTER.format(x=_quote(x), y=y_expr, y_column=_quote(y)),
+            selection,
+            {"nx": bins[0], "ny": bins[1]},
+            query,
+        )
+        if cells.empty:
+            return Grid(np.empty(0), np.empty(0), np.empty((0, 0), dtype=np.int64))
+
+        counts = np.zeros((bins[1], bins[0]), dtype=np.int64)
+        counts[cells["j"].to_numpy(), cells["i"].to_numpy()] = cells["n"].to_numpy()
+        bounds = cells.iloc[0]
+        x_edges = np.linspace(bounds["x_lo"], bounds["x_hi"], bins[0] + 1)
+        y_edges = np.linspace(bounds["y_lo"], bounds["y_hi"], bins[1] + 1)
+        return Grid(x=(x_edges[:-1] + x_edges[1:]) / 2, y=(y_edges[:-1] + y_edges[1:]) / 2, counts=counts)
+
+
+def _means(rollup: pd.DataFrame, by: list[str]) -> pd.Series:
+    sums = rollup.groupby(by, observed=True)[["sum", "count"]].sum()
+    return (sums["sum"] / sums["count"]).rename("enterococci")
+
+
+def total_beaches(rollup: pd.DataFrame) -> int:
+    """Number of distinct swim sites in the selection."""
+    return rollup["beach"].nunique()
+
+
+def beach_means(rollup: pd.DataFrame) -> pd.Series:
+    """Mean enterococci level per beach."""
+    return _means(rollup, ["beach"])
+
+
+def most_polluted_beach(rollup: pd.DataFrame) -> str:
+    """Beach with the highest mean enterococci level."""
+    if rollup.empty:
+        return "Please select"
+    return beach_means(rollup).idxmax()
+
+
+def cleanest_beach(rollup: pd.DataFrame) -> str:
+    """Beach with the lowest mean enterococci level."""
+    if rollup.empty:
+        return "Please select"
+    return beach_means(rollup).idxmin()
+
+
+def high_enterococci_sites(rollup: pd.DataFrame) -> pd.DataFrame:
+    """Number of exceedances per beach, most frequently polluted first."""
+    high = rollup.groupby("beach", observed=True)["high"].sum()
+    high = high[high > 0].rename("count").reset_index()
+    if high.empty:
+        return pd.DataFrame()
+    return high.sort_values(by="count", ascending=False)
+
+
+def water_quality_by_season(rollup: pd.DataFrame) -> pd.DataFrame:
+    """Mean enterococci level per season, worst season first."""
+    if rollup.empty:
+        return pd.DataFrame()
+    return season_means(rollup.groupby("month")[["sum", "count"]].sum())
+
+
+def yearly_trends(rollup: pd.DataFrame) -> pd.DataFrame:
+    """Mean enterococci level per year and beach."""
+    trends = _means(rollup, ["year", "beach"]).reset_index()
+    return trends.sort_values(by=["year", "enterococci"], ascending=[True, False])
+
+
+def region_month(rollup: pd.DataFrame) -> pd.DataFrame:
+    """`binning.region_month` of the selection."""
+    return month_grid(_means(rollup, ["region", "month"]))
+
+
+def sites(rollup: pd.DataFrame) -> pd.DataFrame:
+    """The selection's sites, as `SiteClusters` takes them, located at their earliest sample."""
+    by_beach = rollup.sort_values(["year", "month"], kind="stable").groupby("beach", observed=True)
+    sites = by_beach.agg(latitude=("latitude", "first"), longitude=("longitude", "first"), samples=("samples", "sum"))
+    sites["enterococci"] = beach_means(rollup)
+    return sites.dropna(subset=["latitude", "longitude"]).reset_index()
+
+
+def cached_rollup(
+    version: str, key: Hashable, sql: DashboardSQL, selection: Selection, query: str = ""
+) -> pd.DataFrame:
+    """
+    `DashboardSQL.rollup` of a selection, cached per data version and
+    selection (`key`, which must tell apart the queries it is drawn from).
+    """
+    return _rollups.get_or_compute(version, key, lambda: sql.rollup(selection, query=query))
+
+
+def cached_binned_scatter(
+    version: str, key: Hashable, sql: DashboardSQL, selection: Selection, x: str, query: str = ""
+) -> Grid:
+    """`DashboardSQL.binned_scatter` of a selection, cached like `cached_rollup`."""
+    return _grids.get_or_compute(version, (key, x), lambda: sql.binned_scatter(selection, x, query=query))
+
+
+def site_clusters(version: str, key: Hashable, rollup: pd.DataFrame) -> SiteClusters:
+    """The `SiteClusters` of a selection's rollup, cached per data version and selection."""
+    return _clusters.get_or_compute(version, key, lambda: SiteClusters(sites(rollup)))
+
+
+# Southern hemisphere season of a sample, as `queries.sample_seasons`
+_SEASON = (
+    "CASE WHEN month(date) IN (12, 1, 2) THEN 'Summer' WHEN month(date) IN (3, 4, 5) THEN 'Autumn' "
+    "WHEN month(date) IN (6, 7, 8) THEN 'Winter' ELSE 'Spring' END"
+)
+
+
+def chat_summary_tables(table_name: str, threshold: float = ENTEROCOCCI_THRESHOLD) -> list[SummaryTable]:
+    """
+    Summary tables of the samples for the query chat (see
+    `querychat.datasource.SummaryTable`): per beach and month, per council,
+    and per region and season.
+    """
+    table = _quote(table_name)
+    high = f"COUNT(*) FILTER (WHERE enterococci > {threshold})"
+    return [
+        SummaryTable(
+            "beach_month_stats",
+            f"""
+            SELECT
+                CAST(beach AS VARCHAR) AS beach,
+                CAST(council AS VARCHAR) AS council,
+                CAST(region AS VARCHAR) AS region,
+                year(date) AS year,
+                month(date) AS month,
+                COUNT(*) AS samples,
+                AVG(enterococci) AS mean_enterococci,
+                MAX(enterococci) AS max_enterococci,
+                {high} AS exceedances,
+                AVG(precipitation_mm) AS mean_precipitation_mm,
+                AVG(water_temperature) AS mean_water_temperature
+            FROM {table}
+            GROUP BY ALL
+            ORDER BY beach, year, month
+            """,
+            f"One row per swim site, year and month with samples. `exceedances` counts "
+            f"samples with enterococci above {threshold} CFU/100mL.",
+        ),
+        SummaryTable(
+            "council_stats",
+            f"""
+            SELECT
+                CAST(council AS VARCHAR) AS council,
+                CAST(region AS VARCHAR) AS region,
+                COUNT(DISTINCT beach) AS beaches,
+                COUNT(*) AS samples,
+                AVG(enterococci) AS mean_enterococci,
+                {high} AS exceedances,
+                {high} / COUNT(*) AS exceedance_rate,
+                MIN(date) AS first_sample,
+                MAX(date) AS last_sample
+            FROM {table}
+            GROUP BY ALL
+            ORDER BY council
+            """,
+            f"One row per council, over all its samples. `exceedance_rate` is the share of "
+            f"samples with enterococci above {threshold} CFU/100mL.",
+        ),
+        SummaryTable(
+            "season_stats",
+            f"""
+            SELECT
+                CAST(region AS VARCHAR) AS region,
+                {_SEASON} AS season,
+                COUNT(*) AS samples,
+                AVG(enterococci) AS mean_enterococci,
+                {high} AS exceedances,
+                {high} / COUNT(*) AS exceedance_rate,
+                AVG(precipitation_mm) AS mean_precipitation_mm,
+                AVG(water_temperature) AS mean_water_temperature,
+                corr(precipitation_mm, enterococci) AS rainfall_enterococci_correlation
+            FROM {table}
+            GROUP BY ALL
+            ORDER BY region, season
+            """,
+            "One row per region and (southern hemisphere) season, over all years. "
+            "`rainfall_enterococci_correlation` is the Pearson correlation of a sample's "
+            "rainfall with its enterococci level.",
+        ),
+    ]
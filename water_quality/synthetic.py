@@ -0,0 +1,226 @@
+"""
+Synthetic water quality data at arbitrary scale.
+
+Generates samples with the same schema as the cleaned dataset (see
+`water_quality.data.COLUMNS`) so dashboard code can be exercised at 1M, 10M
+or 50M rows. Sites are spread along the NSW coastline and grouped into
+councils and regions; enterococci levels follow a zero-inflated, heavy-tailed
+distribution that rises after rain, and water temperature and conductivity
+follow the seasons and rainfall like the real samples do.
+
+Usage:
+
+    python -m water_quality.synthetic --rows 10000000 --out data/synthetic_10m.parquet
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .data import COLUMNS
+
+# Common benchmark sizes
+SIZES = {"1m": 1_000_000, "10m": 10_000_000, "50m": 50_000_000}
+
+# Latitude span of the NSW coastline, north to south
+_COAST_LAT = (-28.2, -37.5)
+
+# Roughly how many samples a site collects over the generated history
+_SAMPLES_PER_SITE = 2_000
+
+
+def _sites(n_sites: int, rng: np.random.Generator) -> pd.DataFrame:
+    """Swim sites along the coast, grouped into councils and regions."""
+    n_councils = max(1, n_sites // 6)
+    n_regions = max(1, n_councils // 4)
+
+    # Sites are ordered north to south, so consecutive sites share a council
+    # and consecutive councils share a region, as they do geographically.
+    latitude = np.sort(rng.uniform(*_COAST_LAT[::-1], n_sites))[::-1]
+    # The coast runs from ~153.6E in the north to ~150.0E in the south
+    coast_lon = np.interp(latitude, [-37.5, -33.9, -28.2], [150.0, 151.3, 153.6])
+    longitude = coast_lon - rng.exponential(0.02, n_sites)
+
+    council_idx = np.arange(n_sites) * n_councils // n_sites
+    region_idx = council_idx * n_regions // n_councils
+
+    return pd.DataFrame(
+        {
+            "beach": [f"Beach {i:05d}" for i in range(n_sites)],
+            "council": [f"Council {i:04d}" for i in council_idx],
+            "region": [f"Region {i:03d}" for i in region_idx],
+            "latitude": latitude.round(6),
+            "longitude": longitude.round(6),
+            # Chronically polluted sites have a higher baseline
+            "baseline": rng.lognormal(mean=0.5, sigma=0.8, size=n_sites),
+            "region_idx": region_idx,
+        }
+    )
+
+
+def generate(
+    n_rows: int,
+    *,
+    n_sites: Optional[int] = None,
+    end_date: str = "2025-04-28",
+    seed: int = 42,
+) -> pd.DataFrame:
+    """
+    Generate a synthetic water quality dataset.
+
+    Args:
+        n_rows: Number of samples to generate
+        n_sites: Number of swim sites; defaults to one site per ~2000 samples
+            (and at least the 70 sites of the real dataset)
+        end_date: Date of the most recent sample
+        seed: Random seed, so a given size always produces the same data
+
+    Returns:
+        A DataFrame with the `water_quality.data.COLUMNS` schema, sorted by
+        date
+
+    """
+    rng = np.random.default_rng(seed)
+    n_sites = n_sites or max(70, n_rows // _SAMPLES_PER_SITE)
+    sites = _sites(n_sites, rng)
+    n_regions = int(sites["region_idx"].max()) + 1
+
+    # History long enough that each site is sampled at most about once a day
+    n_days = max(365, int(np.ceil(n_rows / n_sites)) * 2)
+    dates = pd.date_range(end=end_date, periods=n_days, freq="D")
+
+    # Daily rainfall per region: dry most days, heavy-tailed when it rains
+    wet = rng.random((n_regions, n_days)) < 0.3
+    rain = np.where(wet, rng.gamma(0.6, 9.0, (n_regions, n_days)), 0.0).round(1)
+    # Rain lingers in catchments; bacteria respond to the last few days
+    antecedent = rain.copy()
+    for lag, weight in ((1, 0.6), (2, 0.3)):
+        antecedent[:, lag:] += weight * rain[:, :-lag]
+
+    site = rng.integers(0, n_sites, n_rows)
+    day = rng.integers(0, n_days, n_rows)
+    region = sites["region_idx"].to_numpy()[site]
+
+    precipitation = rain[region, day]
+    wetness = antecedent[region, day]
+
+    month = dates.month.to_numpy()[day]
+    # Warmest in February, coolest in August; cooler further south
+    season = np.cos((month - 2) / 12 * 2 * np.pi)
+    latitude = sites["latitude"].to_numpy()[site]
+    water_temperature = (
+        19.5 + 3.5 * season + 0.4 * (latitude + 33.8) + rng.normal(0, 1.2, n_rows)
+    ).round(0)
+
+    conductivity = (
+        54_000 - 120 * wetness + rng.normal(0, 900, n_rows)
+    ).clip(20_000, 60_000).round(-2)
+
+    mean_level = sites["baseline"].to_numpy()[site] * (1 + 0.15 * wetness)
+    enterococci = np.where(
+        rng.random(n_rows) < 0.3,
+        0.0,
+        np.floor(rng.lognormal(np.log(mean_level) + 0.8, 1.1)),
+    )
+
+    df = pd.DataFrame(
+        {
+            "date": dates.to_numpy()[day],
+            "beach": sites["beach"].to_numpy()[site],
+            "council": sites["council"].to_numpy()[site],
+            "region": sites["region"].to_numpy()[site],
+            "enterococci": enterococci,
+            "water_temperature": water_temperature,
+            "conductivity": conductivity,
+            "latitude": latitude,
+            "longitude": sites["longitude"].to_numpy()[site],
+            "precipitation_mm": precipitation,
+        },
+        columns=COLUMNS,
+    )
+    return df.sort_values("date", kind="stable", ignore_index=True)
+
+
+def generate_weather(
+    n_stations: int,
+    *,
+    start_date: str = "1991-01-01",
+    end_date: str = "2025-04-28",
+    seed: int = 42,
+) -> pd.DataFrame:
+    """
+    Generate daily weather for stations along the coast.
+
+    Returns:
+        One row per station and day with the raw `weather.csv` columns used
+        for joining: `date`, `precipitation_mm`, `latitude` and `longitude`
+
+    """
+    rng = np.random.default_rng(seed)
+    latitude = rng.uniform(*_COAST_LAT[::-1], n_stations)
+    coast_lon = np.interp(latitude, [-37.5, -33.9, -28.2], [150.0, 151.3, 153.6])
+    # Stations sit a little inland
+    longitude = coast_lon - rng.exponential(0.1, n_stations)
+    dates = pd.date_range(start_date, end_date, freq="D")
+    wet = rng.random((n_stations, len(dates))) < 0.3
+    rain = np.where(wet, rng.gamma(0.6, 9.0, wet.shape), 0.0).round(1)
+    return pd.DataFrame(
+        {
+            "date": np.tile(dates.to_numpy(), n_stations),
+            "precipitation_mm": rain.ravel(),
+            "latitude": np.repeat(latitude.round(6), len(dates)),
+            "longitude": np.repeat(longitude.round(6), len(dates)),
+        }
+    )
+
+
+def write(df: pd.DataFrame, path: Union[str, Path]) -> Path:
+    """
+    Write a generated dataset as CSV or Parquet, depending on the extension.
+
+    Parquet is recommended beyond a few million rows; `water_quality.data.load_dataset`
+    reads either.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False, date_format="%Y-%m-%d")
+    return path
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--rows",
+        default="1m",
+        help=f"Number of rows, or one of {', '.join(SIZES)} (default: 1m)",
+    )
+    parser.add_argument("--sites", type=int, default=None, help="Number of swim sites")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--out",
+        type=Path,
+        default=None,
+        help="Output .csv or .parquet file (default: data/synthetic_<rows>.parquet)",
+    )
+    args = parser.parse_args(argv)
+
+    n_rows = SIZES.get(args.rows.lower()) or int(args.rows)
+    out = args.out or Path("data") / f"synthetic_{args.rows.lower()}.parquet"
+
+    start = time.perf_counter()
+    df = generate(n_rows, n_sites=args.sites, seed=args.seed)
+    write(df, out)
+    print(f"Wrote {len(df):,} rows to {out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
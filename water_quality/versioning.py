@@ -0,0 +1,165 @@
+"""
+Hot reload of the dashboard data.
+
+`DataVersionService` holds the current `DataVersion` (the frame plus the
+values derived from it that the UI needs), watches the data source for
+changes, loads a new version in the background and swaps it in with a
+single reference assignment, so readers see either the old or the new
+version and never a mix. Sessions pick the new version up through a reactive
+poll of `version_id()`; caches are invalidated and other listeners (such as
+querychat's DuckDB registration) are updated on swap.
+
+While a new version loads, the old one stays in memory; after the swap the
+old frame is released as soon as in-flight renders finish with it, so the
+peak of two copies lasts only for the load and swap.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+import pandas as pd
+
+from . import cache
+
+logger = logging.getLogger(__name__)
+
+
+def fingerprint(path: Union[str, Path]) -> str:
+    """
+    A cheap identifier of a data file's or store's current contents.
+
+    Uses the modification time and size of the file, or of an ingestion
+    store's manifest, which is replaced once per ingested batch.
+    """
+    path = Path(path)
+    if path.is_dir():
+        path = path / "manifest.json"
+    stat = path.stat()
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+
+@dataclass(frozen=True)
+class DataVersion:
+    """One immutable version of the dashboard data."""
+
+    id: str
+    df: pd.DataFrame = field(repr=False)
+    min_date: pd.Timestamp
+    max_date: pd.Timestamp
+    regions: list[str]
+    councils: list[str]
+    loaded_at: datetime
+
+    @classmethod
+    def from_frame(cls, id: str, df: pd.DataFrame) -> "DataVersion":  # noqa: A002
+        return cls(
+            id=id,
+            df=df,
+            min_date=df["date"].min(),
+            max_date=df["date"].max(),
+            regions=df["region"].unique().tolist(),
+            councils=df["council"].unique().tolist(),
+            loaded_at=datetime.now(timezone.utc),
+        )
+
+
+class DataVersionService:
+    """Owns the current data version and reloads it when the source changes."""
+
+    def __init__(
+        self,
+        load: Callable[[], pd.DataFrame],
+        fingerprint: Callable[[], str],
+        interval: float = 30,
+    ):
+        """
+        Load the initial version.
+
+        Args:
+            load: Loads the dataset
+            fingerprint: Identifies the source's current contents; a change
+                triggers a reload
+            interval: Seconds between checks by the background watcher
+
+        """
+        self._load = load
+        self._fingerprint = fingerprint
+        self.interval = interval
+        self._listeners: list[Callable[[DataVersion], None]] = []
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        version_id = fingerprint()
+        self._current = DataVersion.from_frame(version_id, load())
+
+    @property
+    def current(self) -> DataVersion:
+        """The current data version."""
+        return self._current
+
+    def version_id(self) -> str:
+        """Id of the current version; poll this to notice swaps."""
+        return self._current.id
+
+    def on_swap(self, listener: Callable[[DataVersion], None]) -> None:
+        """
+        Call `listener` with each new version, once it is current.
+
+        Listeners run on the thread doing the reload, one after the other;
+        one raising is logged, and neither undoes the swap nor stops the
+        others.
+        """
+        self._listeners.append(listener)
+
+    def reload(self, force: bool = False) -> bool:
+        """
+        Load and swap in a new version if the source changed.
+
+        Args:
+            force: Reload even if the fingerprint is unchanged
+
+        Returns:
+            Whether a new version was swapped in
+
+        """
+        with self._reload_lock:
+            version_id = self._fingerprint()
+            if version_id == self._current.id and not force:
+                return False
+
+            version = DataVersion.from_frame(version_id, self._load())
+            # Readers hold on to whichever version they already have; this
+            # single assignment is the swap.
+            self._current = version
+            cache.invalidate_all(keep_version=version.id)
+            logger.info("Swapped in data version %s (%d rows)", version.id, len(version.df))
+            for listener in self._listeners:
+                try:
+                    listener(version)
+                except Exception:
+                    logger.exception("Updating %r for data version %s failed", listener, version.id)
+            return True
+
+    def start(self) -> None:
+        """Watch the source for changes on a background thread."""
+        if self._thread is not None or self.interval <= 0:
+            return
+        self._thread = threading.Thread(target=self._watch, name="data-version-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.reload()
+            except Exception:
+                logger.exception("Reloading the data failed; keeping version %s", self._current.id)